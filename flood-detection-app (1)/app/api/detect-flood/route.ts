@@ -1,9 +1,24 @@
 import { type NextRequest, NextResponse } from "next/server"
+import { callFloodWorker, floodWorkerUrl, FloodWorkerBusyError } from "@/lib/flood-worker"
+import { formatElapsed } from "@/lib/utils"
 
 export async function POST(request: NextRequest) {
+  const startedAt = performance.now()
   try {
     const { location, date } = await request.json()
 
+    if (floodWorkerUrl()) {
+      const response = await callFloodWorker("/detect-flood", { location, date })
+      const { originalImage, overlayImage, metadata } = await response.json()
+
+      return NextResponse.json({
+        originalImage,
+        overlayImage,
+        floodedAreas: generateFloodedAreas(),
+        metadata: { ...metadata, confidence: 0.87 },
+      })
+    }
+
     // Simulate processing delay
     await new Promise((resolve) => setTimeout(resolve, 2000))
 
@@ -11,11 +26,7 @@ export async function POST(request: NextRequest) {
     const originalImage = "/placeholder.svg?height=400&width=600&text=Satellite+Image"
 
     // Simulate flood detection results
-    const floodedAreas = [
-      { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.8 },
-      { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.6 },
-      { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.4 },
-    ]
+    const floodedAreas = generateFloodedAreas()
 
     // Create overlay image with flood detection
     const overlayImage = await generateFloodOverlay()
@@ -27,16 +38,30 @@ export async function POST(request: NextRequest) {
       metadata: {
         location,
         date,
-        processingTime: "2.3s",
+        processingTime: formatElapsed(startedAt),
         confidence: 0.87,
       },
     })
   } catch (error) {
+    if (error instanceof FloodWorkerBusyError) {
+      return NextResponse.json(
+        { error: "Flood detection is busy, please retry" },
+        { status: 503, headers: error.retryAfter ? { "Retry-After": error.retryAfter } : undefined },
+      )
+    }
     console.error("Flood detection error:", error)
     return NextResponse.json({ error: "Failed to process flood detection" }, { status: 500 })
   }
 }
 
+function generateFloodedAreas() {
+  return [
+    { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.8 },
+    { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.6 },
+    { lat: 29.7604 + (Math.random() - 0.5) * 0.1, lng: -95.3698 + (Math.random() - 0.5) * 0.1, severity: 0.4 },
+  ]
+}
+
 async function generateFloodOverlay(): Promise<string> {
   // In a real implementation, this would use PIL/OpenCV to create the overlay
   // For now, we'll return a placeholder that simulates the red overlay
@@ -1,8 +1,20 @@
 import { type NextRequest, NextResponse } from "next/server"
+import { callFloodWorker, floodWorkerUrl, FloodWorkerBusyError } from "@/lib/flood-worker"
 
 export async function POST(request: NextRequest) {
   try {
-    const { baseImage, location } = await request.json()
+    const { baseImage, location, severity } = await request.json()
+
+    if (floodWorkerUrl()) {
+      const response = await callFloodWorker("/generate-flood-overlay", { baseImage, location, severity })
+
+      return new NextResponse(await response.blob(), {
+        headers: {
+          "Content-Type": "image/png",
+          "Cache-Control": "no-cache",
+        },
+      })
+    }
 
     // Simulate processing delay
     await new Promise((resolve) => setTimeout(resolve, 2000))
@@ -94,6 +106,12 @@ export async function POST(request: NextRequest) {
       },
     })
   } catch (error) {
+    if (error instanceof FloodWorkerBusyError) {
+      return NextResponse.json(
+        { error: "Flood overlay generation is busy, please retry" },
+        { status: 503, headers: error.retryAfter ? { "Retry-After": error.retryAfter } : undefined },
+      )
+    }
     console.error("Error generating flood overlay:", error)
     return NextResponse.json({ error: "Failed to generate flood overlay" }, { status: 500 })
   }
@@ -12,6 +12,7 @@ import { CalendarIcon, Download, MapPin, Satellite, Loader2, AlertTriangle, Drop
 import { format } from "date-fns"
 import IndiaMap from "@/components/india-map"
 import FloodVisualization from "@/components/flood-visualization"
+import type { OverlayTiles } from "@/lib/flood-tiles"
 
 interface FloodResults {
   originalImage: string
@@ -34,6 +35,7 @@ interface FloodResults {
     state: string
     district: string
   }
+  overlayTiles?: OverlayTiles
 }
 
 const INDIAN_CITIES = [
@@ -1,6 +1,7 @@
 "use client"
 
 import { useEffect, useRef, useCallback } from "react"
+import type { OverlayTiles } from "@/lib/flood-tiles"
 
 interface FloodArea {
   lat: number
@@ -17,6 +18,7 @@ interface FloodResults {
     state: string
     district: string
   }
+  overlayTiles?: OverlayTiles
 }
 
 interface IndiaMapProps {
@@ -241,6 +243,23 @@ export default function IndiaMap({ floodResults, selectedLocation, isProcessing
           console.warn("Error adding rivers:", riverError)
         }
 
+        // Add the rendered flood overlay as a tile layer; Leaflet only fetches
+        // tiles inside the scene bounds at the current zoom
+        if (floodResults?.overlayTiles && mounted) {
+          try {
+            const { url, bounds, minZoom, maxZoom } = floodResults.overlayTiles
+            L.tileLayer(url, {
+              bounds: L.latLngBounds(bounds),
+              minZoom,
+              maxNativeZoom: maxZoom,
+              maxZoom: 18,
+              opacity: 0.85,
+            }).addTo(map)
+          } catch (tileError) {
+            console.warn("Error adding flood overlay tiles:", tileError)
+          }
+        }
+
         // Add location marker if results exist
         if (floodResults?.location && mounted) {
           try {
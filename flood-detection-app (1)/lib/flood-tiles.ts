@@ -0,0 +1,38 @@
+// Lookup for flood overlay tile pyramids exported by scripts/tile_pyramid.py
+// into public/tiles/<location slug>/tilejson.json.
+
+import { readFile } from "fs/promises"
+import path from "path"
+
+export interface OverlayTiles {
+  url: string
+  bounds: [[number, number], [number, number]]
+  minZoom: number
+  maxZoom: number
+}
+
+export function locationSlug(location: string): string {
+  return location
+    .toLowerCase()
+    .replace(/[^a-z0-9]+/g, "-")
+    .replace(/^-+|-+$/g, "")
+}
+
+export async function findOverlayTiles(location: string): Promise<OverlayTiles | undefined> {
+  const tilejsonPath = path.join(process.cwd(), "public", "tiles", locationSlug(location), "tilejson.json")
+  try {
+    const tilejson = JSON.parse(await readFile(tilejsonPath, "utf8"))
+    const [west, south, east, north] = tilejson.bounds
+    return {
+      url: tilejson.tiles[0],
+      bounds: [
+        [south, west],
+        [north, east],
+      ],
+      minZoom: tilejson.minzoom,
+      maxZoom: tilejson.maxzoom,
+    }
+  } catch {
+    return undefined
+  }
+}
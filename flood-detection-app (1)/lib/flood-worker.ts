@@ -0,0 +1,36 @@
+// Client for the long-lived Python inference worker (scripts/inference_worker.py).
+// Routes fall back to their simulated responses when FLOOD_WORKER_URL is unset.
+
+const WORKER_TIMEOUT_MS = 120_000
+
+export function floodWorkerUrl(): string | undefined {
+  return process.env.FLOOD_WORKER_URL?.replace(/\/$/, "")
+}
+
+export class FloodWorkerBusyError extends Error {
+  constructor(public retryAfter: string | null) {
+    super("Flood inference worker is at capacity")
+  }
+}
+
+export async function callFloodWorker(path: string, body: unknown): Promise<Response> {
+  const baseUrl = floodWorkerUrl()
+  if (!baseUrl) {
+    throw new Error("FLOOD_WORKER_URL is not configured")
+  }
+
+  const response = await fetch(`${baseUrl}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+    signal: AbortSignal.timeout(WORKER_TIMEOUT_MS),
+  })
+
+  if (response.status === 503) {
+    throw new FloodWorkerBusyError(response.headers.get("Retry-After"))
+  }
+  if (!response.ok) {
+    throw new Error(`Flood worker ${path} failed with status ${response.status}`)
+  }
+  return response
+}
@@ -4,3 +4,9 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Wall time since a performance.now() reading, in the "1.234s" form the
+// Python pipeline reports as processingTime
+export function formatElapsed(startedAt: number): string {
+  return `${((performance.now() - startedAt) / 1000).toFixed(3)}s`
+}
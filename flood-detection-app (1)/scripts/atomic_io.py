@@ -0,0 +1,44 @@
+import contextlib
+import json
+import os
+import tempfile
+
+@contextlib.contextmanager
+def atomic_output(path):
+    """Yield a temporary path that is renamed over ``path`` on success
+
+    The temporary file lives in the destination directory so the final
+    ``os.replace`` is atomic; readers never observe a half-written file.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    root, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{root}.', suffix=f'.tmp{ext}', dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def atomic_save_image(img, path, format=None, **params):
+    """Save a PIL image atomically"""
+    with atomic_output(path) as tmp_path:
+        img.save(tmp_path, format or _format_for(path), **params)
+
+def atomic_write_bytes(data, path):
+    """Write raw bytes atomically"""
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+def atomic_write_json(data, path, indent=2):
+    """Write JSON atomically"""
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=indent)
+
+def _format_for(path):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    return {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'tif': 'TIFF', 'tiff': 'TIFF'}.get(ext, 'PNG')
@@ -0,0 +1,273 @@
+from PIL import Image
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import time
+import traceback
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+from encoding import DEFAULT_ENCODING, ENCODINGS, BackgroundEncoder, encode_image, encoding_extension
+from water_detection import DETECTION_MODES
+from overlay_cache import OverlayCache, DEFAULT_MAX_BYTES
+from india_flood_simulation import INDIAN_CITY_COORDS
+from report_store import ReportStore, run_id
+from seeding import scene_seed
+
+PIPELINES = ('overlay', 'india', 'simulate')
+SEVERITIES = ('mild', 'moderate', 'severe')
+DEFAULT_BASE_IMAGE = 'public/mumbai_satellite.webp'
+
+def load_manifest(path):
+    """Load batch jobs from a CSV or JSON manifest
+
+    Each job needs ``location``, ``date`` and ``severity``; ``base_image`` and
+    ``pipeline`` (overlay, india or simulate) are optional.
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            data = json.load(f)
+            rows = data['jobs'] if isinstance(data, dict) else data
+        else:
+            rows = list(csv.DictReader(f))
+    jobs = [normalize_job(row) for row in rows]
+    stems = {}
+    for job in jobs:
+        other = stems.setdefault((job['pipeline'], job_stem(job)), job)
+        if other is not job:
+            raise ValueError(f"Manifest rows {other} and {job} would write the same outputs")
+    return jobs
+
+def normalize_job(row):
+    """Fill in defaults and validate a manifest row"""
+    job = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if v not in (None, '')}
+    missing = [k for k in ('location', 'date') if k not in job]
+    if missing:
+        raise ValueError(f"Manifest row {row} is missing {', '.join(missing)}")
+    job.setdefault('severity', 'moderate')
+    job.setdefault('pipeline', 'overlay')
+    job.setdefault('base_image', DEFAULT_BASE_IMAGE)
+    if job['severity'] not in SEVERITIES:
+        raise ValueError(f"Unknown severity {job['severity']!r}")
+    if job['pipeline'] not in PIPELINES:
+        raise ValueError(f"Unknown pipeline {job['pipeline']!r}")
+    return job
+
+def city_matrix_jobs(dates, severities, pipeline='overlay', base_image=DEFAULT_BASE_IMAGE):
+    """Build jobs for every city in INDIAN_CITY_COORDS x dates x severities"""
+    jobs = []
+    for key, city in INDIAN_CITY_COORDS.items():
+        # Named by the lookup key so get_city_info resolves every location
+        location = f"{key.title()}, {city['state']}"
+        for date in dates:
+            for severity in severities:
+                jobs.append(normalize_job({
+                    'location': location, 'date': date, 'severity': severity,
+                    'pipeline': pipeline, 'base_image': base_image,
+                }))
+    return jobs
+
+def image_tag(path):
+    """Short hash of a base image path, so scenes of one city and date stay apart"""
+    return hashlib.sha256(path.encode()).hexdigest()[:8]
+
+def job_seed(job, base_seed=0):
+    """Deterministic per-job seed, independent of worker count and job order"""
+    return scene_seed(job['pipeline'], job['location'], job['date'], job['severity'],
+                      image_tag(job['base_image']), base_seed=base_seed)
+
+def job_stem(job):
+    """Filesystem-safe output name for a job (location, date, severity, base image)"""
+    slug = re.sub(r'[^a-z0-9]+', '-', job['location'].lower()).strip('-')
+    return f"{slug}_{job['date']}_{job['severity']}_{image_tag(job['base_image'])}"
+
+def run_jobs(jobs, output_dir, seeds, verbose=False, cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES,
+             population_raster=None, encoding=DEFAULT_ENCODING, detection='simulated', report_store=None):
+    """Run a chunk of jobs in one worker process and return their outcome records
+
+    Each scene is encoded and written on a background thread while the
+    next one renders; a job's ``seconds`` run until its last output is on disk.
+    Reports are also appended to the columnar ``report_store`` directory
+    when one is given.
+    """
+    cache = OverlayCache(cache_dir, cache_bytes) if cache_dir else None
+    store = ReportStore(report_store) if report_store else None
+    records = []
+    with BackgroundEncoder() as encoder:
+        for job, seed in zip(jobs, seeds):
+            start = time.perf_counter()
+            writes = {}
+            log = None if verbose else io.StringIO()
+            try:
+                with contextlib.redirect_stdout(log) if log is not None else contextlib.nullcontext():
+                    writes = _run_pipeline(job, output_dir, seed, encoder, cache, population_raster,
+                                           encoding, detection, store)
+                status, error = 'ok', None
+            except Exception:
+                status, error = 'failed', traceback.format_exc()
+            records.append(({
+                'job': job,
+                'seed': seed,
+                'status': status,
+                'seconds': round(time.perf_counter() - start, 3),
+                'outputs': list(writes),
+                'error': error,
+            }, start, writes))
+
+    results = []
+    for record, start, writes in records:
+        try:
+            finished = [future.result() for future in writes.values()]
+            if finished:
+                record['seconds'] = round(max(finished) - start, 3)
+        except Exception:
+            record['status'], record['error'] = 'failed', traceback.format_exc()
+        results.append(record)
+    return results
+
+def _write_output(path, data):
+    """Write one output (bytes, a Future of bytes, an image or a report); returns the finish time"""
+    if isinstance(data, Future):
+        data = data.result()
+    if isinstance(data, Image.Image):
+        data = encode_image(data, 'png')
+    if isinstance(data, dict):
+        atomic_write_json(data, path)
+    else:
+        atomic_write_bytes(data, path)
+    return time.perf_counter()
+
+def _run_pipeline(job, output_dir, seed, encoder, cache=None, population_raster=None,
+                  encoding=DEFAULT_ENCODING, detection='simulated', store=None):
+    directory = os.path.join(output_dir, job['pipeline'])
+    stem = os.path.join(directory, job_stem(job))
+
+    if job['pipeline'] == 'overlay':
+        import generate_flood_overlay
+        data, report, cache_hit = generate_flood_overlay.create_cached_flood_map(
+            job['base_image'], job['location'], job['severity'], seed, cache,
+            population_raster=population_raster, encoding=encoding, encoder=encoder, detection=detection)
+        report = dict(report, analysis_date=job['date'])
+        outputs = {f'{stem}_overlay.{encoding_extension(encoding)}': data}
+    elif job['pipeline'] == 'india':
+        import india_flood_simulation
+        files, report, cache_hit = india_flood_simulation.run_cached_flood_simulation(
+            job['location'], job['date'], job['severity'], seed, cache,
+            population_raster=population_raster, detection=detection)
+        outputs = {f'{stem}_satellite.png': files['satellite.png'], f'{stem}_overlay.png': files['overlay.png']}
+        if 'flood_zones.geojson' in files:
+            outputs[f'{stem}_zones.geojson'] = files['flood_zones.geojson']
+    else:
+        import simulate_flood_detection
+        original, overlay = simulate_flood_detection.simulate_ml_inference(job['location'], job['date'],
+                                                                                detection)
+        report = None
+        outputs = {f'{stem}_satellite.png': original, f'{stem}_overlay.png': overlay}
+
+    if report is not None:
+        outputs[f'{stem}_report.json'] = report
+        # A cache hit is a run the store already holds; reruns without a
+        # cache share the run id, so aggregates count them once
+        if store is not None and not cache_hit:
+            store.append(report, job['severity'], run_id(job['pipeline'], job['location'], job['date'],
+                                                         job['severity'], job['base_image'], detection, seed))
+    return {path: encoder.submit(_write_output, path, data) for path, data in outputs.items()}
+
+def run_batch(jobs, output_dir, workers=None, base_seed=0, verbose=False,
+              cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES, population_raster=None,
+              encoding=DEFAULT_ENCODING, chunk_size=None, detection='simulated', report_store=None):
+    """Fan chunks of jobs out over a process pool and collect outcomes in job order"""
+    workers = workers or os.cpu_count() or 1
+    # Chunks let each process overlap encoding with rendering; keep them
+    # small enough that every worker still gets several
+    chunk_size = chunk_size or max(1, min(4, math.ceil(len(jobs) / (workers * 2))))
+    results = [None] * len(jobs)
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for first in range(0, len(jobs), chunk_size):
+            chunk = list(range(first, min(first + chunk_size, len(jobs))))
+            futures[pool.submit(run_jobs, [jobs[i] for i in chunk], output_dir,
+                                [job_seed(jobs[i], base_seed) for i in chunk], verbose,
+                                cache_dir, cache_bytes, population_raster, encoding, detection,
+                                report_store)] = chunk
+        for future in as_completed(futures):
+            for i, record in zip(futures[future], future.result()):
+                results[i] = record
+                done += 1
+                mark = '✅' if record['status'] == 'ok' else '❌'
+                print(f"{mark} [{done}/{len(jobs)}] {job_stem(jobs[i])} "
+                      f"({jobs[i]['pipeline']}) {record['seconds']:.2f}s")
+    return results
+
+def print_summary(results, wall_seconds):
+    """Print per-job timing and any failures"""
+    failed = [r for r in results if r['status'] != 'ok']
+    job_seconds = [r['seconds'] for r in results]
+
+    print("\n📊 BATCH SUMMARY:")
+    print(f"🧮 Jobs: {len(results)} ({len(results) - len(failed)} ok, {len(failed)} failed)")
+    print(f"⏱️  Wall time: {wall_seconds:.2f}s")
+    if job_seconds:
+        print(f"⏱️  Per job: min {min(job_seconds):.2f}s, "
+              f"mean {sum(job_seconds) / len(job_seconds):.2f}s, max {max(job_seconds):.2f}s")
+    for r in failed:
+        print(f"\n❌ {job_stem(r['job'])} ({r['job']['pipeline']}):")
+        print('   ' + r['error'].strip().replace('\n', '\n   '))
+
+def main():
+    """Batch flood overlay generation over a manifest of scenes"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('manifest', nargs='?', help='CSV or JSON manifest of jobs')
+    parser.add_argument('--all-cities', action='store_true',
+                        help='Generate jobs for every city in INDIAN_CITY_COORDS')
+    parser.add_argument('--dates', nargs='+', default=['2024-01-15'])
+    parser.add_argument('--severities', nargs='+', default=list(SEVERITIES), choices=SEVERITIES)
+    parser.add_argument('--pipeline', default='overlay', choices=PIPELINES)
+    parser.add_argument('--base-image', default=DEFAULT_BASE_IMAGE)
+    parser.add_argument('--output-dir', default='public/batch')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Base seed for per-job seeds')
+    parser.add_argument('--cache-dir', help='Reuse overlays from this content-addressed cache')
+    parser.add_argument('--cache-bytes', type=int, default=DEFAULT_MAX_BYTES, help='Cache size budget')
+    parser.add_argument('--population-raster', default=os.environ.get('FLOOD_POPULATION_RASTER'),
+                        help='Population density GeoTIFF or .npy for affected-population estimates')
+    parser.add_argument('--detection', default='simulated', choices=DETECTION_MODES,
+                        help="'spectral' classifies water in the imagery instead of simulating zones")
+    parser.add_argument('--encoding', default=DEFAULT_ENCODING, choices=list(ENCODINGS),
+                        help='Output format for overlay jobs')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Jobs per worker task; encoding overlaps rendering within a chunk')
+    parser.add_argument('--report-store', default=os.environ.get('FLOOD_REPORT_STORE'),
+                        help='Also append every report to this columnar store (see report_store.py)')
+    parser.add_argument('--summary', help='Write per-job results as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline output from workers')
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest) if args.manifest else []
+    if args.all_cities:
+        jobs += city_matrix_jobs(args.dates, args.severities, args.pipeline, args.base_image)
+    if not jobs:
+        parser.error('Provide a manifest or --all-cities')
+
+    print(f"🛰️  Batch Flood Processing: {len(jobs)} jobs, {args.workers or os.cpu_count()} workers")
+    print("=" * 50)
+    start = time.perf_counter()
+    results = run_batch(jobs, args.output_dir, args.workers, args.seed, args.verbose,
+                        args.cache_dir, args.cache_bytes, args.population_raster,
+                        args.encoding, args.chunk_size, args.detection, args.report_store)
+    print_summary(results, time.perf_counter() - start)
+
+    if args.summary:
+        atomic_write_json(results, args.summary)
+        print(f"\n💾 Summary saved to: {args.summary}")
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+from PIL import Image, ImageEnhance
+import numpy as np
+import argparse
+import contextlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from compositing import enhance
+from generate_flood_overlay import COLOR_FACTOR, CONTRAST_FACTOR, generate_realistic_flood_overlay
+
+METHODS = ('pil', 'compositing')
+# Enhancement factors checked against ImageEnhance, around and well beyond the pipeline's
+CHECK_FACTORS = (0.0, 0.5, 0.8, 0.95, 1.0, 1.05, 1.1, 1.3, 2.0, 3.0)
+DEFAULT_SIZES = ('1600x900', '4000x3000', '8000x6000')
+
+def _current_rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so only the measured stage counts"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def make_inputs(base_image_path, width, height, seed=7):
+    """Scale the bundled scene to the target size and render a seeded overlay"""
+    base = Image.open(base_image_path).convert('RGBA').resize((width, height), Image.BILINEAR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        overlay, _ = generate_realistic_flood_overlay(base, 'severe', seed)
+    return base, overlay
+
+def run_pil(base, overlay):
+    result = Image.alpha_composite(base, overlay)
+    result = ImageEnhance.Contrast(result).enhance(CONTRAST_FACTOR)
+    result = ImageEnhance.Color(result).enhance(COLOR_FACTOR)
+    return result
+
+def run_compositing(base, overlay):
+    result = Image.alpha_composite(base, overlay)
+    result, _ = enhance(result, contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR)
+    return result
+
+def check_enhance(base, overlay, factors=CHECK_FACTORS):
+    """Largest per-channel difference between :func:`compositing.enhance` and ImageEnhance
+
+    Every contrast/saturation pair in ``factors`` is compared on the
+    composited scene; returns ``{(contrast, saturation): max_diff}``.
+    """
+    composite = Image.alpha_composite(base, overlay)
+    contrasted = {c: ImageEnhance.Contrast(composite).enhance(c) for c in factors}
+    diffs = {}
+    for c in factors:
+        for s in factors:
+            expected = np.asarray(ImageEnhance.Color(contrasted[c]).enhance(s), dtype=np.int16)
+            actual = np.asarray(enhance(composite.copy(), contrast=c, saturation=s)[0], dtype=np.int16)
+            diffs[c, s] = int(np.abs(actual - expected).max())
+    return diffs
+
+def measure(method, base_image_path, width, height, repeats):
+    """Time one method in this process and report its extra peak RSS"""
+    base, overlay = make_inputs(base_image_path, width, height)
+    runner = {
+        'pil': run_pil,
+        'compositing': run_compositing,
+    }[method]
+
+    timings = []
+    for _ in range(repeats):
+        baseline = _current_rss_kb()
+        exact = _reset_peak_rss()
+        start = time.perf_counter()
+        result = runner(base, overlay)
+        timings.append(time.perf_counter() - start)
+        peak = _peak_rss_kb()
+        del result
+
+    return {
+        'method': method,
+        'size': f'{width}x{height}',
+        'megapixels': round(width * height / 1e6, 2),
+        'best_ms': round(min(timings) * 1000, 1),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 1),
+        'peak_extra_mb': round((peak - baseline) / 1024, 1),
+        'peak_exact': exact,
+    }
+
+def main():
+    """Benchmark the stock PIL chain vs compositing.py for speed and peak RSS"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--base-image', default='public/mumbai_satellite.webp')
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='WIDTHxHEIGHT')
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=METHODS)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', help='Also write results to this JSON file')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check enhance() against ImageEnhance over a range of factors')
+    parser.add_argument('--child', nargs=3, metavar=('METHOD', 'WIDTH', 'HEIGHT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        method, width, height = args.child[0], int(args.child[1]), int(args.child[2])
+        print(json.dumps(measure(method, args.base_image, width, height, args.repeats)))
+        return
+
+    if args.check:
+        width, height = (int(v) for v in args.sizes[0].lower().split('x'))
+        print(f"🔎 enhance() vs ImageEnhance at {width}x{height}")
+        diffs = check_enhance(*make_inputs(args.base_image, width, height))
+        worst = max(diffs, key=diffs.get)
+        print(f"   {len(diffs)} factor pairs, max difference {diffs[worst]} (contrast {worst[0]}, saturation {worst[1]})")
+        if diffs[worst]:
+            sys.exit(1)
+        return
+
+    print("⏱️  Compositing Benchmark (each run in a fresh process)")
+    print("=" * 72)
+    print(f"{'size':>11} {'method':>16} {'best ms':>9} {'mean ms':>9} {'peak +MB':>9}")
+    results = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split('x'))
+        for method in args.methods:
+            out = subprocess.run(
+                [sys.executable, __file__, '--base-image', args.base_image, '--repeats', str(args.repeats),
+                 '--child', method, str(width), str(height)],
+                capture_output=True, text=True, check=True)
+            row = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(row)
+            print(f"{row['size']:>11} {row['method']:>16} {row['best_ms']:>9} "
+                  f"{row['mean_ms']:>9} {row['peak_extra_mb']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
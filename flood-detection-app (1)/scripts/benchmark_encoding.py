@@ -0,0 +1,60 @@
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from encoding import ENCODINGS, encode_image
+from generate_flood_overlay import create_flood_map
+
+def render_scene(base_image_path, severity, seed=7):
+    """Seeded composite and flood overlay of the bundled scene"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        composite, _, _, overlay = create_flood_map(base_image_path, severity, rng=seed)
+    return composite, overlay
+
+def measure(encoding, composite, overlay, repeats):
+    """Encode one scene ``repeats`` times and report size and timings"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        data = encode_image(composite, encoding, overlay)
+        timings.append(time.perf_counter() - start)
+    layer, fmt, _, _ = ENCODINGS[encoding]
+    return {
+        'encoding': encoding,
+        'layer': layer,
+        'format': fmt,
+        'bytes': len(data),
+        'best_ms': round(min(timings) * 1000, 1),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 1),
+    }
+
+def main():
+    """Benchmark overlay output encodings for size and encode time"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--base-image', default='public/mumbai_satellite.webp')
+    parser.add_argument('--severity', default='severe', choices=['mild', 'moderate', 'severe'])
+    parser.add_argument('--encodings', nargs='+', default=list(ENCODINGS), choices=list(ENCODINGS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    composite, overlay = render_scene(args.base_image, args.severity)
+    print(f"⏱️  Encoding Benchmark ({composite.width}x{composite.height} {composite.mode})")
+    print("=" * 64)
+    print(f"{'encoding':>14} {'layer':>10} {'bytes':>11} {'best ms':>9} {'mean ms':>9}")
+    results = []
+    for encoding in args.encodings:
+        row = measure(encoding, composite, overlay, args.repeats)
+        results.append(row)
+        print(f"{row['encoding']:>14} {row['layer']:>10} {row['bytes']:>11,} "
+              f"{row['best_ms']:>9} {row['mean_ms']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
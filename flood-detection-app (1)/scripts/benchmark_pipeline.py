@@ -0,0 +1,245 @@
+from PIL import Image
+import numpy as np
+import PIL
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmark_compositing import _current_rss_kb, _peak_rss_kb, _reset_peak_rss
+from seeding import scene_seed, spawn_rngs
+
+PIPELINES = ('simulate', 'india', 'overlay')
+SEVERITIES = ('mild', 'moderate', 'severe')
+DEFAULT_SIZES = ('600x400', '1600x900', '4000x3000', '8000x6000', '16000x16000')
+# Scenes this large are rendered once whatever --repeats says
+SINGLE_RUN_MEGAPIXELS = 50
+# A stage only counts as regressed when it is slower than the baseline by
+# the relative tolerance *and* by this much, so tiny stages don't flap
+MIN_DELTA_MS = 5.0
+MIN_DELTA_MB = 16.0
+
+class StageTimer:
+    """Wall time, CPU time and extra peak RSS of each named pipeline stage"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        baseline = _current_rss_kb()
+        exact = _reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = _peak_rss_kb()
+        self.stages.setdefault(name, []).append((wall, cpu, max(0, peak - baseline), exact))
+
+    def summary(self):
+        rows = []
+        for name, runs in self.stages.items():
+            walls = [run[0] for run in runs]
+            rows.append({
+                'stage': name,
+                'best_ms': round(min(walls) * 1000, 2),
+                'mean_ms': round(sum(walls) / len(walls) * 1000, 2),
+                'cpu_ms': round(sum(run[1] for run in runs) / len(runs) * 1000, 2),
+                'peak_extra_mb': round(max(run[2] for run in runs) / 1024, 1),
+                'peak_exact': all(run[3] for run in runs),
+            })
+        return rows
+
+def run_simulate(timer, width, height, severity, seed):
+    from encoding import encode_image
+    from simulate_flood_detection import apply_flood_overlay, create_satellite_image
+
+    with timer.stage('create_satellite_image'):
+        satellite_img = create_satellite_image(width, height)
+    with timer.stage('flood_overlay'):
+        result_img = apply_flood_overlay(satellite_img)
+    with timer.stage('png_encode'):
+        encode_image(result_img, 'png')
+
+def run_india(timer, width, height, severity, seed):
+    from encoding import encode_image
+    from india_flood_simulation import (create_india_satellite_image, generate_analysis_report,
+                                        simulate_flood_detection)
+
+    terrain_rng, flood_rng = spawn_rngs(seed, 2)
+    with timer.stage('create_india_satellite_image'):
+        satellite_img = create_india_satellite_image(width, height, rng=terrain_rng)
+    with timer.stage('simulate_flood_detection'):
+        flood_result, flood_zones, stats = simulate_flood_detection(satellite_img, severity, rng=flood_rng)
+    with timer.stage('report'):
+        generate_analysis_report('Mumbai, Maharashtra', '2024-01-15', flood_zones, stats)
+    with timer.stage('png_encode'):
+        encode_image(flood_result, 'png')
+
+def run_overlay(timer, width, height, severity, seed, base_img):
+    from compositing import enhance
+    from encoding import encode_image
+    from flood_stats import compute_flood_statistics
+    from generate_flood_overlay import (COLOR_FACTOR, CONTRAST_FACTOR, FloodShapes, blur_flood_overlay,
+                                        create_flood_analysis_report, generate_flood_geometry)
+
+    with timer.stage('flood_geometry'):
+        flood_zones, shapes = generate_flood_geometry(width, height, severity, seed)
+    with timer.stage('draw_overlay'):
+        overlay = Image.fromarray(FloodShapes(shapes).render((0, 0, width, height)), 'RGBA')
+    with timer.stage('gaussian_blur'):
+        blur_flood_overlay(overlay, shapes)
+    with timer.stage('flood_statistics'):
+        stats = compute_flood_statistics(overlay, [zone['polygon'] for zone in flood_zones])
+    with timer.stage('composite'):
+        result_img = Image.alpha_composite(base_img, overlay)
+    with timer.stage('enhance'):
+        enhance(result_img, contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR)
+    del overlay
+    with timer.stage('png_encode'):
+        encode_image(result_img, 'png')
+    with timer.stage('report'):
+        create_flood_analysis_report(flood_zones, 'Mumbai, Maharashtra', 'benchmark', stats)
+
+def measure(pipeline, width, height, severity, seed, repeats, base_image_path):
+    """Run one pipeline configuration ``repeats`` times in this process"""
+    if width * height / 1e6 > SINGLE_RUN_MEGAPIXELS:
+        repeats = 1
+    base_img = None
+    if pipeline == 'overlay':
+        # Input preparation is not part of the measured pipeline
+        base_img = Image.open(base_image_path).convert('RGBA').resize((width, height), Image.BILINEAR)
+
+    timer = StageTimer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            if pipeline == 'simulate':
+                run_simulate(timer, width, height, severity, seed)
+            elif pipeline == 'india':
+                run_india(timer, width, height, severity, seed)
+            else:
+                run_overlay(timer, width, height, severity, seed, base_img)
+    return timer.summary()
+
+def run_key(run, stage=None):
+    key = f"{run['pipeline']}/{run['size']}/{run['severity'] or '-'}"
+    return f"{key}/{stage['stage']}" if stage else key
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Stages that got slower or hungrier than ``baseline``; returns a list of messages"""
+    previous = {}
+    for run in baseline.get('runs', []):
+        for stage in run.get('stages', []):
+            previous[run_key(run, stage)] = stage
+
+    regressions = []
+    for run in results['runs']:
+        for stage in run.get('stages', []):
+            key = run_key(run, stage)
+            old = previous.get(key)
+            if old is None:
+                continue
+            if (stage['best_ms'] > old['best_ms'] * (1 + tolerance)
+                    and stage['best_ms'] - old['best_ms'] > MIN_DELTA_MS):
+                regressions.append(f"{key}: {old['best_ms']} ms -> {stage['best_ms']} ms")
+            if (stage['peak_extra_mb'] > old['peak_extra_mb'] * (1 + tolerance)
+                    and stage['peak_extra_mb'] - old['peak_extra_mb'] > MIN_DELTA_MB):
+                regressions.append(f"{key}: {old['peak_extra_mb']} MB -> {stage['peak_extra_mb']} MB peak")
+    return regressions
+
+def main():
+    """Benchmark every stage of the flood pipelines across image sizes and severities"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--pipelines', nargs='+', default=list(PIPELINES), choices=PIPELINES)
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='WIDTHxHEIGHT')
+    parser.add_argument('--severities', nargs='+', default=list(SEVERITIES), choices=SEVERITIES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7, help='Base seed for every scene')
+    parser.add_argument('--base-image', default='public/mumbai_satellite.webp')
+    parser.add_argument('--timeout', type=float, default=None, help='Seconds allowed per configuration')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this results file and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown/memory growth against the baseline')
+    parser.add_argument('--child', nargs=5, metavar=('PIPELINE', 'WIDTH', 'HEIGHT', 'SEVERITY', 'SEED'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        pipeline, width, height, severity, seed = args.child
+        stages = measure(pipeline, int(width), int(height), None if severity == '-' else severity,
+                         int(seed), args.repeats, args.base_image)
+        print(json.dumps(stages))
+        return
+
+    print("⏱️  Flood Pipeline Benchmark (each configuration in a fresh process)")
+    print("=" * 80)
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'cpu_count': os.cpu_count(),
+        'repeats': args.repeats,
+        'seed': args.seed,
+        'runs': [],
+    }
+    for pipeline in args.pipelines:
+        # The simple simulation has no severity setting
+        severities = [None] if pipeline == 'simulate' else args.severities
+        for size in args.sizes:
+            width, height = (int(v) for v in size.lower().split('x'))
+            for severity in severities:
+                seed = scene_seed(pipeline, size, severity, base_seed=args.seed)
+                run = {'pipeline': pipeline, 'size': f'{width}x{height}', 'severity': severity,
+                       'megapixels': round(width * height / 1e6, 2), 'seed': seed}
+                try:
+                    out = subprocess.run(
+                        [sys.executable, __file__, '--base-image', args.base_image,
+                         '--repeats', str(args.repeats),
+                         '--child', pipeline, str(width), str(height), severity or '-', str(seed)],
+                        capture_output=True, text=True, timeout=args.timeout)
+                    if out.returncode == 0:
+                        run['status'] = 'ok'
+                        run['stages'] = json.loads(out.stdout.strip().splitlines()[-1])
+                    else:
+                        lines = out.stderr.strip().splitlines()
+                        run['status'] = 'failed'
+                        run['error'] = lines[-1] if lines else f'exit status {out.returncode}'
+                except subprocess.TimeoutExpired:
+                    run['status'] = 'failed'
+                    run['error'] = f'timed out after {args.timeout}s'
+                results['runs'].append(run)
+
+                print(f"\n📐 {run_key(run)}")
+                if run['status'] != 'ok':
+                    print(f"   ❌ {run['error']}")
+                    continue
+                print(f"   {'stage':<30} {'best ms':>10} {'mean ms':>10} {'cpu ms':>10} {'peak +MB':>9}")
+                for stage in run['stages']:
+                    print(f"   {stage['stage']:<30} {stage['best_ms']:>10} {stage['mean_ms']:>10} "
+                          f"{stage['cpu_ms']:>10} {stage['peak_extra_mb']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"   • {message}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
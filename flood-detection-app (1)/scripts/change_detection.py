@@ -0,0 +1,319 @@
+from PIL import Image
+import numpy as np
+import argparse
+import hashlib
+import os
+import time
+import zlib
+
+from atomic_io import atomic_save_image, atomic_write_json
+from compositing import enhance
+from flood_stats import DEFAULT_GSD_M, compute_flood_statistics
+from georef import pixel_area_km2
+from overlay_cache import OverlayCache
+from population import location_population
+from tiled_overlay import _halo_box, iter_tiles
+from tracing import image_attrs, span, trace_from_env
+from water_detection import (ALPHA_RANGE, INDEX_LEVELS, MAX_ZONES, MIN_WATER_INDEX, MIN_ZONE_PIXELS,
+                             MORPHOLOGY_RADIUS, WATER_COLOR, band_runs, clean_mask, concat_runs,
+                             index_to_level, mask_components, quantized_index)
+
+# Bump when the per-tile change computation changes so cached tiles are invalidated
+CHANGE_VERSION = 1
+DEFAULT_TILE_CACHE_DIR = '.cache/change'
+TILE_SIZE = 256
+# A pixel only counts as new water when its index rose by at least this much
+MIN_INDEX_RISE = 0.15
+# Phase correlation runs on a central crop at most this large
+ALIGN_WINDOW = 1024
+
+def estimate_shift(pre, post, window=ALIGN_WINDOW):
+    """Integer ``(dy, dx)`` translation of ``post`` relative to ``pre`` by phase correlation
+
+    Both scenes are (height, width, bands) arrays of the same size; a
+    post-event pixel at ``(y, x)`` shows the ground the pre-event scene has
+    at ``(y - dy, x - dx)``.
+    """
+    height, width = post.shape[:2]
+    size_y, size_x = min(window, height), min(window, width)
+    y0, x0 = (height - size_y) // 2, (width - size_x) // 2
+    taper = np.outer(np.hanning(size_y), np.hanning(size_x)).astype(np.float32)
+
+    spectra = []
+    for scene in (pre, post):
+        gray = scene[y0:y0 + size_y, x0:x0 + size_x, :3].astype(np.float32).mean(axis=2)
+        gray -= gray.mean()
+        spectra.append(np.fft.rfft2(gray * taper))
+    cross = spectra[1] * np.conj(spectra[0])
+    cross /= np.maximum(np.abs(cross), 1e-9)
+    correlation = np.fft.irfft2(cross, s=(size_y, size_x))
+    dy, dx = np.unravel_index(int(np.argmax(correlation)), correlation.shape)
+    # Peaks past the midpoint are negative shifts
+    return (int(dy - size_y if dy > size_y // 2 else dy),
+            int(dx - size_x if dx > size_x // 2 else dx))
+
+def _shifted_window(pixels, box, shift):
+    """``box`` of the pre-event scene as seen from the post-event grid
+
+    Returns ``(window, valid)``; pixels the shift moves outside the scene
+    are zero and not valid.
+    """
+    x0, y0, x1, y1 = box
+    dy, dx = shift
+    height, width = pixels.shape[:2]
+    window = np.zeros((y1 - y0, x1 - x0, pixels.shape[2]), dtype=pixels.dtype)
+    valid = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+    sy0, sx0 = y0 - dy, x0 - dx
+    cy0, cx0 = max(sy0, 0), max(sx0, 0)
+    cy1, cx1 = min(sy0 + y1 - y0, height), min(sx0 + x1 - x0, width)
+    if cy0 < cy1 and cx0 < cx1:
+        window[cy0 - sy0:cy1 - sy0, cx0 - sx0:cx1 - sx0] = pixels[cy0:cy1, cx0:cx1]
+        valid[cy0 - sy0:cy1 - sy0, cx0 - sx0:cx1 - sx0] = True
+    return window, valid
+
+def change_tile(pre, valid, post, crop, index='rgb', bands=None, radius=MORPHOLOGY_RADIUS,
+                min_rise=MIN_INDEX_RISE):
+    """New-water alpha for one tile, from its pre/post windows including the halo
+
+    A pixel is new water when the post-event index is above the water floor,
+    the pre-event index is not, and the index rose by ``min_rise``; the mask
+    is cleaned with the same opening/closing as :func:`water_detection.detect_water`
+    (the halo makes that match a whole-scene run). The floor is fixed rather
+    than Otsu's so a tile's result depends on its own pixels only.
+
+    Returns ``(alpha, permanent_pixels)`` for the ``crop`` = (x0, y0, x1, y1)
+    of the window: a uint8 alpha in ``ALPHA_RANGE`` growing with the
+    post-event index, and the count of pixels that were water on both dates.
+    """
+    floor = index_to_level(MIN_WATER_INDEX)
+    rise = int(round(min_rise / 2.0 * (INDEX_LEVELS - 1)))
+    pre_levels = quantized_index(pre.astype(np.float32), index, bands)
+    post_levels = quantized_index(post.astype(np.float32), index, bands)
+    post_water = post_levels > floor
+    pre_water = pre_levels > floor
+    changed = (post_water & ~pre_water & valid
+               & (post_levels.astype(np.int16) - pre_levels >= rise))
+    x0, y0, x1, y1 = crop
+    mask = clean_mask(changed, radius)[y0:y1, x0:x1]
+    permanent = int((post_water & pre_water & valid)[y0:y1, x0:x1].sum())
+
+    low, high = ALPHA_RANGE
+    alpha = post_levels[y0:y1, x0:x1].astype(np.float32)
+    alpha -= floor
+    alpha *= (high - low) / max(INDEX_LEVELS - 1 - floor, 1)
+    alpha += low
+    np.clip(alpha, low, high, out=alpha)
+    alpha[~mask] = 0
+    return alpha.astype(np.uint8), permanent
+
+def _tile_digest(pre, valid, post, crop, params):
+    """Content hash of a tile's inputs; independent of where the tile sits"""
+    h = hashlib.sha256()
+    h.update(repr((pre.shape, post.shape, crop, params)).encode())
+    for part in (pre, np.packbits(valid), post):
+        h.update(np.ascontiguousarray(part).data)
+    return h.hexdigest()
+
+def detect_changes(pre, post, cache=None, tile_size=TILE_SIZE, shift=None, index='rgb', bands=None,
+                   radius=MORPHOLOGY_RADIUS, min_rise=MIN_INDEX_RISE,
+                   min_zone_pixels=MIN_ZONE_PIXELS, max_zones=MAX_ZONES):
+    """Map water that appeared between two co-located scenes, tile by tile
+
+    ``pre`` and ``post`` are PIL images or (height, width, bands) arrays of
+    the same size. The post-event scene is aligned to the pre-event one by
+    ``shift`` (estimated with :func:`estimate_shift` when None). Each tile's
+    result is cached under the hash of its input pixels, so re-running with
+    an updated post-event scene only recomputes tiles whose pixels changed.
+
+    Returns ``(overlay, zones, info)`` like :func:`water_detection.detect_water`;
+    ``info`` counts recomputed and cached tiles.
+    """
+    pre = np.asarray(pre)
+    post = np.asarray(post)
+    if pre.shape != post.shape:
+        raise ValueError(f"Scene shapes differ: {pre.shape} vs {post.shape}")
+    height, width = post.shape[:2]
+    if shift is None:
+        with span('estimate_shift'):
+            shift = estimate_shift(pre, post)
+
+    params = (CHANGE_VERSION, index, sorted((bands or {}).items()), radius, min_rise)
+    halo = 4 * radius
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    permanent = recomputed = cached = 0
+    for box in iter_tiles(width, height, tile_size):
+        hx0, hy0, hx1, hy1 = halo_box = _halo_box(box, width, height, halo)
+        x0, y0, x1, y1 = box
+        crop = (x0 - hx0, y0 - hy0, x1 - hx0, y1 - hy0)
+        pre_window, valid = _shifted_window(pre, halo_box, shift)
+        post_window = post[hy0:hy1, hx0:hx1]
+
+        key = hit = None
+        if cache is not None:
+            key = cache.make_key(version=CHANGE_VERSION,
+                                 tile=_tile_digest(pre_window, valid, post_window, crop, params))
+            hit = cache.get(key)
+        if hit is not None:
+            files, entry = hit
+            tile = np.frombuffer(zlib.decompress(files['alpha']), dtype=np.uint8).reshape(y1 - y0, x1 - x0)
+            tile_permanent = entry['permanent']
+            cached += 1
+        else:
+            tile, tile_permanent = change_tile(pre_window, valid, post_window, crop, index, bands,
+                                               radius, min_rise)
+            if key is not None:
+                cache.put(key, {'alpha': zlib.compress(tile.tobytes(), 1)},
+                          {'permanent': tile_permanent}, evict=False)
+            recomputed += 1
+        alpha[y0:y1, x0:x1] = tile
+        permanent += tile_permanent
+    if cache is not None and recomputed:
+        cache.evict()
+
+    runs = concat_runs([band_runs(alpha[y0:y0 + tile_size] > 0, alpha[y0:y0 + tile_size], y0)
+                        for y0 in range(0, height, tile_size)])
+    zones, count = mask_components(runs, width, min_zone_pixels, max_zones)
+    low, high = ALPHA_RANGE
+    for zone in zones:
+        mean_alpha = zone.pop('mean')
+        zone['opacity'] = int(round(mean_alpha))
+        zone['confidence'] = round(min(0.99, 0.5 + 0.5 * (mean_alpha - low) / (high - low)), 2)
+
+    overlay = np.zeros((height, width, 4), dtype=np.uint8)
+    overlay[..., :3] = WATER_COLOR
+    overlay[..., 3] = alpha
+    new_pixels = int((runs[2] - runs[1]).sum())
+    info = {
+        'method': 'change',
+        'index': index,
+        'shift': list(shift),
+        'tiles': recomputed + cached,
+        'recomputed_tiles': recomputed,
+        'cached_tiles': cached,
+        'new_water_pixels': new_pixels,
+        'new_water_fraction': round(new_pixels / max(width * height, 1), 4),
+        'permanent_water_pixels': permanent,
+        'water_bodies': count,
+    }
+    return Image.fromarray(overlay, 'RGBA'), zones, info
+
+def change_severity(new_water_fraction):
+    """Severity label for the share of the scene that newly went under water"""
+    if new_water_fraction > 0.10:
+        return 'severe'
+    if new_water_fraction > 0.03:
+        return 'moderate'
+    return 'mild'
+
+def create_change_map(pre_image_path, post_image_path, location=None, gsd_m=DEFAULT_GSD_M, cache=None,
+                      tile_size=TILE_SIZE, population_raster=None, shift=None):
+    """Load both dates, map new water, then composite and enhance the post-event scene
+
+    Returns ``(result_img, flood_zones, stats)`` like
+    :func:`generate_flood_overlay.create_flood_map`, with the change summary
+    in ``stats['change_detection']``.
+    """
+    from generate_flood_overlay import COLOR_FACTOR, CONTRAST_FACTOR, load_satellite_image
+
+    print("1. Loading pre- and post-event imagery...")
+    with span('load_satellite_image') as sp:
+        pre_img = load_satellite_image(pre_image_path)
+        post_img = load_satellite_image(post_image_path)
+        if pre_img is None or post_img is None:
+            raise ValueError("Both pre- and post-event images are needed for change detection")
+        if pre_img.size != post_img.size:
+            print(f"↔️  Resampling pre-event scene {pre_img.size} to {post_img.size}")
+            pre_img = pre_img.resize(post_img.size, Image.BILINEAR)
+        sp.set(**image_attrs(post_img))
+
+    print("2. Detecting new water (pre/post change)...")
+    with span('detect_changes') as sp:
+        flood_overlay, water_zones, change = detect_changes(pre_img, post_img, cache, tile_size, shift)
+        sp.set(tiles=change['tiles'], recomputed=change['recomputed_tiles'],
+               new_water_pixels=change['new_water_pixels'])
+    del pre_img
+    print(f"🧭 Alignment shift (dy, dx): {tuple(change['shift'])}")
+    print(f"🧩 {change['recomputed_tiles']} of {change['tiles']} tiles recomputed, "
+          f"{change['cached_tiles']} from cache")
+    print(f"💧 New water: {change['new_water_fraction']:.1%} of the scene in {change['water_bodies']} bodies")
+
+    severity = change_severity(change['new_water_fraction'])
+    flood_zones = [{
+        'center': zone['center'],
+        'area': zone['pixels'] * pixel_area_km2(gsd_m),
+        'severity': severity,
+        'opacity': zone['opacity'],
+        'confidence': zone['confidence'],
+        'polygon': zone['polygon'],
+    } for zone in water_zones]
+    population = None
+    if population_raster and location:
+        with span('scene_population'):
+            population = location_population(population_raster, location, *post_img.size, gsd_m)
+    with span('flood_statistics') as sp:
+        stats = compute_flood_statistics(flood_overlay, [zone['polygon'] for zone in flood_zones], gsd_m,
+                                         population=population)
+        sp.set(flooded_pixels=stats['flooded_pixels'])
+    stats['change_detection'] = change
+
+    print("3. Combining post-event image with change overlay...")
+    with span('composite'):
+        result_img = Image.alpha_composite(post_img, flood_overlay)
+        del post_img
+
+    print("4. Enhancing final image...")
+    with span('enhance'):
+        result_img, _ = enhance(result_img, contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR)
+    return result_img, flood_zones, stats
+
+def main():
+    """Flood mapping from a pre-event and a post-event scene"""
+    from generate_flood_overlay import create_flood_analysis_report
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('pre_image', help='Scene before the event')
+    parser.add_argument('post_image', help='Scene after the event')
+    parser.add_argument('--location', default='Mumbai, Maharashtra')
+    parser.add_argument('--gsd', type=float, default=DEFAULT_GSD_M, help='Ground sampling distance (m/pixel)')
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--no-align', action='store_true', help='Assume the scenes are already co-registered')
+    parser.add_argument('--cache-dir', default=os.environ.get('FLOOD_CHANGE_CACHE_DIR', DEFAULT_TILE_CACHE_DIR))
+    parser.add_argument('--no-cache', action='store_true', help='Recompute every tile')
+    parser.add_argument('--population-raster', default=os.environ.get('FLOOD_POPULATION_RASTER'))
+    parser.add_argument('--output', default='public/flood_change_overlay.png')
+    parser.add_argument('--report', help='Save the analysis report (JSON) here')
+    args = parser.parse_args()
+
+    print("🛰️  Flood Change Detection - Pre/Post Event")
+    print("=" * 50)
+    trace_from_env()
+    start = time.perf_counter()
+    cache = None if args.no_cache else OverlayCache(args.cache_dir)
+    result_img, flood_zones, stats = create_change_map(
+        args.pre_image, args.post_image, args.location, args.gsd, cache, args.tile_size,
+        args.population_raster, shift=(0, 0) if args.no_align else None)
+
+    print("5. Generating analysis report...")
+    with span('report'):
+        report = create_flood_analysis_report(flood_zones, args.location, args.post_image, stats)
+        report['pre_event_image'] = args.pre_image
+        report['processing_time'] = f'{time.perf_counter() - start:.3f}s'
+
+    print("6. Saving change overlay image...")
+    with span('save_output'):
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        atomic_save_image(result_img, args.output)
+        if args.report:
+            atomic_write_json(report, args.report)
+
+    print(f"\n🌊 New Flooded Area: {report['flood_summary']['total_flooded_area_km2']} km²")
+    print(f"🎯 Number of Flood Zones: {report['flood_summary']['number_of_flood_zones']}")
+    print(f"⚠️  Risk Level: {report['flood_summary']['risk_level']}")
+    print(f"⏱️  Processing Time: {report['processing_time']}")
+    print(f"\n💾 Output saved to: {args.output}")
+    if args.report:
+        print(f"📄 Report saved to: {args.report}")
+    return report
+
+if __name__ == "__main__":
+    main()
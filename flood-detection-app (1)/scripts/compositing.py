@@ -0,0 +1,135 @@
+from PIL import Image
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 64
+
+def _row_chunks(height, chunk_rows):
+    step = chunk_rows or height or 1
+    for y0 in range(0, height, step):
+        yield slice(y0, min(y0 + step, height))
+
+def image_to_array(img, chunk_rows=DEFAULT_CHUNK_ROWS * 16):
+    """Copy a PIL image into a new writable uint8 array, one row band at a time
+
+    ``np.array(img)`` goes through a full-size ``tobytes()`` buffer first, so
+    it briefly needs twice the image size; this keeps the extra to one band.
+    """
+    width, height = img.size
+    bands = len(img.getbands())
+    pixels = np.empty((height, width, bands) if bands > 1 else (height, width), dtype=np.uint8)
+    for rows in _row_chunks(height, chunk_rows):
+        pixels[rows] = np.asarray(img.crop((0, rows.start, width, rows.stop)))
+    return pixels
+
+def _div255(values):
+    """Rounded division of a uint16 array by 255, in place"""
+    values += 128
+    values += values >> 8
+    values >>= 8
+    return values
+
+def _blend_chunk(dst, src):
+    """Porter-Duff "over" of an RGBA uint8 chunk onto an RGB(A) uint8 chunk, in place"""
+    alpha = src[..., 3]
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if cols.size == 0:
+        return
+    # Only the columns the overlay actually touches need blending
+    window = slice(cols[0], cols[-1] + 1)
+    dst, src, alpha = dst[:, window], src[:, window], alpha[:, window]
+
+    if dst.shape[-1] == 4 and (dst[..., 3] != 255).any():
+        src_a = alpha[..., None].astype(np.float32) * (1.0 / 255.0)
+        dst_a = dst[..., 3:4].astype(np.float32) * (1.0 / 255.0)
+        out_a = src_a + dst_a * (1.0 - src_a)
+        safe_a = np.where(out_a > 0, out_a, 1.0)
+        color = (src[..., :3] * src_a + dst[..., :3] * (dst_a * (1.0 - src_a))) / safe_a
+        dst[..., 3:4] = np.rint(out_a * 255.0)
+        dst[..., :3] = np.rint(color)
+        return
+
+    # Opaque destination: out = (src * a + dst * (255 - a)) / 255 in 16-bit integers
+    a = alpha[..., None].astype(np.uint16)
+    color = src[..., :3] * a
+    color += dst[..., :3] * (255 - a)
+    dst[..., :3] = _div255(color)
+
+def luminance_sum(img):
+    """Sum of PIL's 8-bit luminance (``convert('L')``) over an image
+
+    Sums add up across tiles, so a tiled pre-pass gets exactly the pivot
+    :func:`contrast_mean` finds on the whole scene.
+    """
+    return sum(level * count for level, count in enumerate(img.convert('L').histogram()))
+
+def contrast_mean(img):
+    """Rounded mean luminance, the pivot ImageEnhance.Contrast blends towards"""
+    width, height = img.size
+    return int(luminance_sum(img) / max(width * height, 1) + 0.5)
+
+def alpha_blend(base, overlay, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Composite an RGBA ``overlay`` onto ``base`` in place and return ``base``
+
+    ``base`` is an RGB or RGBA uint8 array and is overwritten row band by
+    row band, so no full-size intermediate is allocated. Used through
+    :func:`blend_image` by the India and simulate pipelines, which keep
+    their scenes as arrays; the PIL-image pipelines use
+    ``Image.alpha_composite``.
+    """
+    for rows in _row_chunks(base.shape[0], chunk_rows):
+        _blend_chunk(base[rows], overlay[rows])
+    return base
+
+def blend_image(base, overlay_img, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Alpha-blend a PIL RGBA overlay onto the ``base`` array in place
+
+    Only the overlay's non-transparent bounding box is converted and
+    blended, which for flood overlays is usually a fraction of the scene.
+    """
+    bbox = overlay_img.getbbox()
+    if bbox is None:
+        return base
+    x0, y0, x1, y1 = bbox
+    alpha_blend(base[y0:y1, x0:x1], image_to_array(overlay_img.crop(bbox)), chunk_rows)
+    return base
+
+def _contrast_lut(mean, contrast):
+    """Per-value contrast table; PIL's blend truncates towards zero and clips"""
+    values = mean + contrast * (np.arange(256, dtype=np.float32) - mean)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+def _enhance_band(band, table, saturation):
+    if table is not None:
+        band = band.point(table)
+    if saturation != 1.0:
+        # ImageEnhance.Color's grey image, from one L conversion instead of LA and back
+        gray = band.convert('L')
+        bands = [gray] * 3 + ([band.getchannel('A')] if band.mode == 'RGBA' else [])
+        band = Image.blend(Image.merge(band.mode, bands), band, saturation)
+    return band
+
+def enhance(img, contrast=1.0, saturation=1.0, mean=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """``ImageEnhance.Contrast`` then ``ImageEnhance.Color`` on an RGB(A) image, in place
+
+    The output is identical to PIL's, and every stage stays in PIL's C
+    code, but the image is enhanced one row band at a time and pasted
+    back, so temporaries are band-sized rather than full-frame. Contrast
+    is one ``point`` table lookup instead of a blend with a grey image.
+    Its pivot is the image's own mean luminance unless ``mean`` is given
+    (e.g. from a tiled pre-pass or a fixed animation background).
+    Returns ``(img, mean)``.
+    """
+    table = None
+    if contrast != 1.0:
+        if mean is None:
+            mean = contrast_mean(img)
+        lut = _contrast_lut(mean, contrast).tolist()
+        identity = list(range(256))
+        table = [v for band in img.getbands() for v in (identity if band == 'A' else lut)]
+    if table is None and saturation == 1.0:
+        return img, mean
+    width, height = img.size
+    for rows in _row_chunks(height, chunk_rows):
+        box = (0, rows.start, width, rows.stop)
+        img.paste(_enhance_band(img.crop(box), table, saturation), box)
+    return img, mean
@@ -0,0 +1,82 @@
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import io
+import threading
+
+PALETTE_COLORS = 64
+
+# name -> (layer, PIL format, file extension, save params). The composite is
+# the enhanced scene; "overlay" and "mask" encode the flood layer on its own.
+ENCODINGS = {
+    'png': ('composite', 'PNG', 'png', {'compress_level': 3}),
+    'png-small': ('composite', 'PNG', 'png', {'compress_level': 9}),
+    'webp-lossless': ('composite', 'WEBP', 'webp', {'lossless': True, 'quality': 0, 'method': 0}),
+    'webp': ('composite', 'WEBP', 'webp', {'quality': 80, 'method': 2}),
+    'png-palette': ('overlay', 'PNG', 'png', {'compress_level': 6}),
+    'mask': ('mask', 'PNG', 'png', {'compress_level': 6}),
+}
+DEFAULT_ENCODING = 'png'
+
+def encoding_extension(encoding):
+    return ENCODINGS[encoding][2]
+
+def encoding_layer(encoding):
+    return ENCODINGS[encoding][0]
+
+def prepare_image(composite, encoding, overlay=None):
+    """The image an encoding actually writes
+
+    Opaque composites drop their alpha channel (a quarter fewer bytes to
+    filter and deflate); overlay encodings need the flood ``overlay`` layer.
+    """
+    layer = encoding_layer(encoding)
+    if layer == 'composite':
+        if composite.mode == 'RGBA' and composite.getextrema()[3] == (255, 255):
+            return composite.convert('RGB')
+        return composite
+    if overlay is None:
+        raise ValueError(f"Encoding {encoding!r} needs the flood overlay layer")
+    if layer == 'overlay':
+        return overlay.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    return overlay.getchannel('A')
+
+def encode_image(composite, encoding=DEFAULT_ENCODING, overlay=None):
+    """Encode one pipeline output to bytes with the named encoding"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding!r}; choose from {', '.join(ENCODINGS)}")
+    _, fmt, _, params = ENCODINGS[encoding]
+    buffer = io.BytesIO()
+    prepare_image(composite, encoding, overlay).save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+class BackgroundEncoder:
+    """Run encode/write tasks on a background thread while the caller renders on
+
+    PIL releases the GIL while compressing, so encoding scene N overlaps
+    rendering scene N+1. ``max_pending`` bounds the queued tasks (and the
+    images they hold); ``submit`` blocks once it is reached.
+    """
+
+    def __init__(self, workers=1, max_pending=2):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='encoder')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self):
+        """Wait for queued tasks and stop the thread"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,373 @@
+from PIL import Image, ImageFilter
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import collections
+import os
+import time
+
+from atomic_io import atomic_output, atomic_save_image, atomic_write_json
+from compositing import contrast_mean, enhance
+from encoding import ENCODINGS
+from flood_stats import DEFAULT_GSD_M, MASK_ALPHA_THRESHOLD, overlay_alpha
+from generate_flood_overlay import (
+    BLUR_HALO, BLUR_RADIUS, COLOR_FACTOR, CONTRAST_FACTOR, FloodShapes,
+    create_synthetic_base_image, generate_flood_geometry, load_satellite_image
+)
+from georef import pixel_area_km2
+from png_stream import StreamingAPNGWriter, deflate_rows
+from seeding import scene_seed
+from tiled_overlay import _halo_box
+from water_detection import detect_water
+
+DEFAULT_FRAMES = 12
+FRAME_DURATION_MS = 500
+ANIMATION_FORMATS = ('apng', 'webp', 'frames')
+SEVERITY_STAGES = ('mild', 'moderate', 'severe')
+# Zones switch on one after another over this first part of the series
+ZONE_ONSET_SPAN = 0.5
+# A zone appears at this fraction of its final size and opacity, then grows
+MIN_ZONE_SCALE = 0.3
+MIN_ZONE_OPACITY = 0.5
+# Frames allowed to wait for the writer beyond the one each worker renders
+MAX_PENDING_FRAMES = 2
+APNG_COMPRESS_LEVEL = 3
+
+def severity_at(progress):
+    """Severity label of a point in [0, 1] of the series: mild, then moderate, then severe"""
+    return SEVERITY_STAGES[min(int(progress * len(SEVERITY_STAGES)), len(SEVERITY_STAGES) - 1)]
+
+def series_progress(index, count):
+    return index / (count - 1) if count > 1 else 1.0
+
+def shapes_box(shapes, width, height):
+    """Box (x0, y0, x1, y1) the blurred overlay of ``shapes`` can reach, or None"""
+    if not shapes:
+        return None
+    box = (min(b[0] for _, b, _, _ in shapes), min(b[1] for _, b, _, _ in shapes),
+           max(b[2] for _, b, _, _ in shapes) + 1, max(b[3] for _, b, _, _ in shapes) + 1)
+    x0, y0, x1, y1 = _halo_box(box, width, height, BLUR_HALO)
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+def union_box(a, b):
+    if a is None or b is None:
+        return a or b
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+class FloodRamp:
+    """One severe flood grown over a time series of frames
+
+    The zones of a severe scene switch on one after another over the first
+    ``ZONE_ONSET_SPAN`` of the series and each grows about its centre (and
+    fades in) until the last frame, which draws exactly the severe scene.
+    Frame shapes are a pure function of the geometry and the frame's
+    progress, so frames can be rendered in any order.
+    """
+
+    def __init__(self, width, height, rng=None):
+        self.width, self.height = width, height
+        self.flood_zones, self.shapes = generate_flood_geometry(width, height, 'severe', rng)
+        count = len(self.flood_zones)
+        self.onsets = ZONE_ONSET_SPAN * np.arange(count) / max(count, 1)
+        # Each zone drew an outer and an inner polygon; flow ellipses follow
+        self.flow_steps = (len(self.shapes) - 2 * count) // (count - 1) if count > 1 else 0
+
+    def growth(self, progress):
+        """Per-zone ``(active, growth)``: whether each zone is on, and how far grown in [0, 1]"""
+        active = progress >= self.onsets
+        growth = np.clip((progress - self.onsets) / (1.0 - self.onsets), 0.0, 1.0)
+        return active, np.where(active, growth, 0.0)
+
+    def shapes_at(self, progress):
+        """``(kind, bbox, coords, fill)`` shapes of the flood at ``progress``, in draw order"""
+        active, growth = self.growth(progress)
+        scale = MIN_ZONE_SCALE + (1.0 - MIN_ZONE_SCALE) * growth
+        fade = MIN_ZONE_OPACITY + (1.0 - MIN_ZONE_OPACITY) * growth
+        count = len(self.flood_zones)
+        shapes = []
+        for i in np.flatnonzero(active).tolist():
+            cx, cy = self.flood_zones[i]['center']
+            for kind, _, coords, fill in self.shapes[2 * i:2 * i + 2]:
+                points = np.asarray(coords)
+                xs = cx + ((points[:, 0] - cx) * scale[i]).astype(int)
+                ys = cy + ((points[:, 1] - cy) * scale[i]).astype(int)
+                bbox = (int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))
+                shapes.append((kind, bbox, list(zip(xs.tolist(), ys.tolist())),
+                               fill[:3] + (int(fill[3] * fade[i]),)))
+        for j in range(count - 1):
+            # A flow between two zones fades in as the later of them grows
+            strength = min(growth[j], growth[j + 1]) if active[j] and active[j + 1] else 0.0
+            start = 2 * count + j * self.flow_steps
+            for kind, bbox, coords, fill in self.shapes[start:start + self.flow_steps]:
+                alpha = int(fill[3] * strength)
+                if alpha:
+                    shapes.append((kind, bbox, coords, fill[:3] + (alpha,)))
+        return shapes
+
+    def active_zones(self, progress):
+        return int(self.growth(progress)[0].sum())
+
+def render_overlay(shapes, box):
+    """Blurred RGBA overlay of ``shapes`` inside ``box`` as an array
+
+    ``box`` is the shapes' :func:`shapes_box`, the same window
+    :func:`generate_flood_overlay.blur_flood_overlay` blurs, so the pixels
+    match a full-scene render exactly.
+    """
+    overlay = Image.fromarray(FloodShapes(shapes).render(box, workers=1), 'RGBA')
+    return np.asarray(overlay.filter(ImageFilter.GaussianBlur(radius=BLUR_RADIUS)))
+
+class FrameCompositor:
+    """Composite changing flood overlays onto one fixed scene
+
+    The scene is decoded and enhanced once; a frame is the enhanced scene
+    with only the overlay's box re-blended from the original pixels and
+    re-enhanced (both stages are per-pixel). The contrast pivot is the
+    scene's own mean luminance, held fixed across frames so the background
+    does not flicker as the flood grows.
+    """
+
+    def __init__(self, base_img):
+        self.base = base_img.convert('RGBA')
+        self.width, self.height = self.base.size
+        self.mean = contrast_mean(self.base)
+        enhanced, _ = enhance(self.base.copy(), contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR,
+                              mean=self.mean)
+        self.enhanced = np.asarray(enhanced.convert('RGB'))
+
+    def render(self, overlay, overlay_box, box=None):
+        """RGB pixels of ``box`` (default: the whole frame) with ``overlay`` composited
+
+        ``overlay`` covers ``overlay_box``, which must lie inside ``box``.
+        """
+        x0, y0, x1, y1 = box or (0, 0, self.width, self.height)
+        pixels = self.enhanced[y0:y1, x0:x1].copy()
+        if overlay is not None:
+            ox0, oy0, ox1, oy1 = overlay_box
+            region = self.base.crop(overlay_box)
+            region.alpha_composite(Image.fromarray(overlay, 'RGBA'))
+            region, _ = enhance(region, contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR, mean=self.mean)
+            pixels[oy0 - y0:oy1 - y0, ox0 - x0:ox1 - x0] = np.asarray(region.convert('RGB'))
+        return pixels
+
+def flooded_area_km2(overlay, gsd_m):
+    if overlay is None:
+        return 0.0
+    return round(int(np.count_nonzero(overlay_alpha(overlay) >= MASK_ALPHA_THRESHOLD)) * pixel_area_km2(gsd_m), 3)
+
+def ramp_frames(base_img, count, rng=None, gsd_m=DEFAULT_GSD_M):
+    """Frame renderer for a simulated mild-to-severe ramp over one scene
+
+    Returns ``(size, render)``; ``render(k, partial)`` gives ``(box, pixels,
+    info)`` for frame k. With ``partial`` the box is only the part of the
+    canvas that differs from frame k - 1 (the union of both overlay boxes).
+    """
+    compositor = FrameCompositor(base_img)
+    width, height = compositor.width, compositor.height
+    ramp = FloodRamp(width, height, rng)
+
+    def frame_box(k):
+        return shapes_box(ramp.shapes_at(series_progress(k, count)), width, height)
+
+    def render(k, partial=False):
+        progress = series_progress(k, count)
+        shapes = ramp.shapes_at(progress)
+        overlay_box = shapes_box(shapes, width, height)
+        overlay = render_overlay(shapes, overlay_box) if overlay_box else None
+        box = None
+        if partial and k > 0:
+            # An unchanged frame still needs a (one pixel) rectangle
+            box = union_box(overlay_box, frame_box(k - 1)) or (0, 0, 1, 1)
+        info = {'severity': severity_at(progress), 'progress': round(progress, 3),
+                'active_zones': ramp.active_zones(progress),
+                'flooded_area_km2': flooded_area_km2(overlay, gsd_m)}
+        return box or (0, 0, width, height), compositor.render(overlay, overlay_box, box), info
+
+    return (width, height), render
+
+def scene_frames(scene_paths, gsd_m=DEFAULT_GSD_M):
+    """Frame renderer for a series of real scenes, water classified in each
+
+    All scenes must share the first one's size; its mean luminance is the
+    contrast pivot for every frame. Every frame covers the whole canvas,
+    since the scene itself changes.
+    """
+    first = load_satellite_image(scene_paths[0])
+    if first is None:
+        raise ValueError(f"Could not load scene {scene_paths[0]}")
+    size = first.size
+    mean = contrast_mean(first)
+    del first
+
+    def render(k, partial=False):
+        scene = load_satellite_image(scene_paths[k])
+        if scene is None:
+            raise ValueError(f"Could not load scene {scene_paths[k]}")
+        if scene.size != size:
+            raise ValueError(f"Scene {scene_paths[k]} is {scene.size}, expected {size}")
+        overlay, zones, detection = detect_water(scene)
+        scene = Image.alpha_composite(scene, overlay)
+        scene, _ = enhance(scene, contrast=CONTRAST_FACTOR, saturation=COLOR_FACTOR, mean=mean)
+        pixels = np.asarray(scene.convert('RGB'))
+        del scene
+        info = {'scene': scene_paths[k], 'water_bodies': detection['water_bodies'],
+                'water_fraction': detection['water_fraction'],
+                'flooded_area_km2': flooded_area_km2(overlay, gsd_m)}
+        return (0, 0) + size, pixels, info
+
+    return size, render
+
+def ordered_map(fn, count, workers, max_pending=MAX_PENDING_FRAMES):
+    """Yield ``fn(k)`` for k in range(count) in order, computing ahead on a thread pool
+
+    At most ``workers + max_pending`` results are in flight or waiting, so
+    memory is bounded by that many frames however long the series is.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='animation') as pool:
+        pending = collections.deque()
+        for k in range(count):
+            pending.append(pool.submit(fn, k))
+            if len(pending) >= workers + max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+class _FrameSequence(Image.Image):
+    """Multi-frame image whose frames are pulled from an iterator one at a time
+
+    Lets PIL's animated WebP encoder take frames as it goes instead of a
+    list of every frame up front. Frames stream past once: seeking back is
+    ignored.
+    """
+
+    def __init__(self, frames, size, count):
+        super().__init__()
+        self._frames = iter(frames)
+        self._count = count
+        self._mode = 'RGB'
+        self._size = size
+        self._frame = -1
+        self.seek(0)
+
+    @property
+    def n_frames(self):
+        return self._count
+
+    @property
+    def is_animated(self):
+        return self._count > 1
+
+    def seek(self, frame):
+        if frame <= self._frame:
+            return
+        if frame != self._frame + 1:
+            raise EOFError("Frames can only be read in order")
+        self.im = Image.fromarray(next(self._frames), 'RGB').im
+        self._frame = frame
+
+    def tell(self):
+        return self._frame
+
+def write_animation(render, size, count, output, fmt='apng', duration_ms=FRAME_DURATION_MS, workers=None):
+    """Render ``count`` frames on a thread pool and write them in order
+
+    ``render(k, partial)`` is a frame renderer from :func:`ramp_frames` or
+    :func:`scene_frames`. ``apng`` streams each frame (only the changed
+    rectangle after the first) into one animated PNG, ``frames`` writes a
+    directory of PNGs and ``webp`` an animated WebP. Frames are rendered
+    and, for APNG, deflated on the workers. Returns the per-frame info.
+    """
+    if fmt not in ANIMATION_FORMATS:
+        raise ValueError(f"Unknown animation format {fmt!r}; choose from {', '.join(ANIMATION_FORMATS)}")
+    workers = workers or os.cpu_count() or 1
+    timeline = []
+
+    if fmt == 'apng':
+        def encode(k):
+            box, pixels, info = render(k, partial=True)
+            return box, deflate_rows(pixels, APNG_COMPRESS_LEVEL), info
+
+        with atomic_output(output) as tmp_path:
+            with StreamingAPNGWriter(tmp_path, *size, count, bands=3, delay_ms=duration_ms) as writer:
+                for box, data, info in ordered_map(encode, count, workers):
+                    writer.write_deflated(data, box)
+                    timeline.append(info)
+    elif fmt == 'frames':
+        def save(k):
+            _, pixels, info = render(k)
+            atomic_save_image(Image.fromarray(pixels, 'RGB'), os.path.join(output, f'frame_{k:04d}.png'),
+                              compress_level=APNG_COMPRESS_LEVEL)
+            return info
+
+        os.makedirs(output, exist_ok=True)
+        timeline.extend(ordered_map(save, count, workers))
+    else:
+        def frame_pixels():
+            for _, pixels, info in ordered_map(render, count, workers):
+                timeline.append(info)
+                yield pixels
+
+        # libwebp keeps each encoded frame until the file is assembled; the
+        # decoded frames still pass through one at a time
+        params = ENCODINGS['webp'][3]
+        with atomic_output(output) as tmp_path:
+            _FrameSequence(frame_pixels(), size, count).save(tmp_path, 'WEBP', save_all=True,
+                                                             duration=duration_ms, loop=0, **params)
+    return timeline
+
+def main():
+    """Time-series flood animation: a simulated severity ramp or a series of scenes"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--base-image', default='public/mumbai_satellite.webp',
+                        help='Scene for the simulated ramp')
+    parser.add_argument('--scenes', nargs='+', help='Animate these same-size scenes instead (one frame each)')
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES, help='Frames in the simulated ramp')
+    parser.add_argument('--location', default='Mumbai, Maharashtra')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for the simulated zones (default: derived from the location)')
+    parser.add_argument('--gsd', type=float, default=DEFAULT_GSD_M, help='Ground sampling distance (m/pixel)')
+    parser.add_argument('--format', default='apng', choices=ANIMATION_FORMATS)
+    parser.add_argument('--duration', type=int, default=FRAME_DURATION_MS, help='Milliseconds per frame')
+    parser.add_argument('--workers', type=int, default=None, help='Render threads (default: all CPUs)')
+    parser.add_argument('--output', default=None,
+                        help='Output file, or directory for --format frames (default: under public/)')
+    parser.add_argument('--timeline', help='Save the per-frame flood figures (JSON) here')
+    args = parser.parse_args()
+
+    print("🛰️  Flood Animation - Time Series")
+    print("=" * 50)
+    start = time.perf_counter()
+    output = args.output or {'apng': 'public/flood_animation.png', 'webp': 'public/flood_animation.webp',
+                             'frames': 'public/flood_frames'}[args.format]
+    if args.scenes:
+        print(f"1. Classifying water in {len(args.scenes)} scenes...")
+        count = len(args.scenes)
+        size, render = scene_frames(args.scenes, args.gsd)
+    else:
+        if args.frames < 1:
+            parser.error('--frames must be at least 1')
+        print(f"1. Preparing a {args.frames}-frame mild → severe ramp...")
+        base_img = load_satellite_image(args.base_image)
+        if base_img is None:
+            print("❌ Failed to load base image. Creating synthetic image...")
+            base_img = create_synthetic_base_image()
+        count = args.frames
+        seed = scene_seed(args.location, 'animation') if args.seed is None else args.seed
+        size, render = ramp_frames(base_img, count, seed, args.gsd)
+        del base_img
+
+    print(f"2. Rendering and encoding {count} frames ({args.format})...")
+    timeline = write_animation(render, size, count, output, args.format, args.duration, args.workers)
+    if args.timeline:
+        atomic_write_json({'location': args.location, 'frames': timeline}, args.timeline)
+
+    for k, info in enumerate(timeline):
+        label = info.get('severity') or os.path.basename(info['scene'])
+        print(f"   🖼️  Frame {k:>3}: {label:<12} {info['flooded_area_km2']:>8} km²")
+    print(f"\n💾 Animation saved to: {output}")
+    print(f"📏 Frame size: {size}")
+    print(f"⏱️  Processing Time: {time.perf_counter() - start:.3f}s")
+    return timeline
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from PIL import Image
+import numpy as np
+
+from rasterize import PolygonSet, center_to_corner
+
+# 10 m/pixel matches the original ``pixels / 10000`` km² convention
+DEFAULT_GSD_M = 10.0
+# Overlay alpha at or above this counts as flooded; drops faint blur tails
+MASK_ALPHA_THRESHOLD = 20
+HISTOGRAM_BINS = 10
+
+def overlay_alpha(overlay):
+    """Alpha channel of an RGBA overlay (PIL image or array) as uint8"""
+    if isinstance(overlay, Image.Image):
+        return np.asarray(overlay.getchannel('A'))
+    return overlay[..., 3]
+
+def _polygon_window(points, width, height):
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    x0, y0 = max(0, int(min(xs))), max(0, int(min(ys)))
+    x1, y1 = min(width, int(max(xs)) + 1), min(height, int(max(ys)) + 1)
+    clipped = min(xs) < 0 or min(ys) < 0 or max(xs) >= width or max(ys) >= height
+    return (x0, y0, x1, y1), clipped
+
+def rasterize_polygon(points, window):
+    """Boolean coverage of a polygon inside ``window``, same rules as the overlay rasterizer"""
+    return PolygonSet([center_to_corner(points)]).labels(window, workers=1) > 0
+
+class FloodStatsAccumulator:
+    """Pixel-accurate flood statistics, accumulated over one or more tiles
+
+    Each tile contributes its overlay alpha and the zone polygons that touch
+    it. Zones are rasterized once into a coverage count and a label raster
+    (last zone drawn wins, like the overlay itself); per-zone figures then
+    come from ``bincount`` reductions over those rasters. With a
+    ``population`` grid (see :mod:`population`) the people under the flood
+    mask and under each zone are summed in the same pass.
+
+    Tiles are expected in row-major order (see
+    :func:`tiled_overlay.iter_tiles`): a zone's coverage is dropped after
+    the tile holding its bottom-right corner, so memory stays bounded by
+    the zones still ahead of the pass. Other orders stay correct but may
+    rasterize a zone more than once.
+    """
+
+    def __init__(self, width, height, zone_polygons, gsd_m=DEFAULT_GSD_M,
+                 threshold=MASK_ALPHA_THRESHOLD, population=None):
+        self.width = width
+        self.height = height
+        self.zone_polygons = zone_polygons
+        self.gsd_m = gsd_m
+        self.threshold = threshold
+        self.population = population
+        n = len(zone_polygons)
+        self.flooded_pixels = 0
+        self.alpha_histogram = np.zeros(256, dtype=np.int64)
+        self.union_pixels = 0
+        self.overlap_pixels = 0
+        self.zone_pixels = np.zeros(n, dtype=np.int64)
+        self.zone_overlap_pixels = np.zeros(n, dtype=np.int64)
+        self.zone_visible_pixels = np.zeros(n, dtype=np.int64)
+        self.zone_alpha_sum = np.zeros(n, dtype=np.float64)
+        self.scene_people = 0.0
+        self.flooded_people = 0.0
+        self.zone_people = np.zeros(n, dtype=np.float64)
+        self.zone_clipped = np.zeros(n, dtype=bool)
+        self._windows = []
+        self._coverage = {}
+        for i, points in enumerate(zone_polygons):
+            window, clipped = _polygon_window(points, width, height)
+            self._windows.append(window)
+            self.zone_clipped[i] = clipped
+
+    def add_tile(self, alpha, box=None):
+        """Accumulate statistics for the overlay alpha covering ``box``"""
+        x0, y0, x1, y1 = box or (0, 0, self.width, self.height)
+        mask = alpha >= self.threshold
+        self.flooded_pixels += int(np.count_nonzero(mask))
+        self.alpha_histogram += np.bincount(alpha[mask], minlength=256)
+        people = None
+        if self.population is not None:
+            people = self.population.read((x0, y0, x1, y1))
+            self.scene_people += float(people.sum(dtype=np.float64))
+            self.flooded_people += float(people[mask].sum(dtype=np.float64))
+
+        # Slice each zone touching this tile out of its rasterized coverage
+        hits = []
+        for i, (wx0, wy0, wx1, wy1) in enumerate(self._windows):
+            window = max(x0, wx0), max(y0, wy0), min(x1, wx1), min(y1, wy1)
+            if window[0] < window[2] and window[1] < window[3]:
+                coverage = self._zone_coverage(i)[window[1] - wy0:window[3] - wy0,
+                                                   window[0] - wx0:window[2] - wx0]
+                self.zone_pixels[i] += int(np.count_nonzero(coverage))
+                hits.append((i, window, coverage))
+                if wx1 <= x1 and wy1 <= y1:
+                    # No later row-major tile touches this zone
+                    self._coverage.pop(i, None)
+        if not hits:
+            return
+
+        # Coverage count and label rasters only span the zones' union box
+        ux0, uy0 = min(w[0] for _, w, _ in hits), min(w[1] for _, w, _ in hits)
+        ux1, uy1 = max(w[2] for _, w, _ in hits), max(w[3] for _, w, _ in hits)
+        # Sized so a pixel under every hit zone cannot wrap back to 0
+        count = np.zeros((uy1 - uy0, ux1 - ux0),
+                         dtype=np.uint8 if len(hits) < 256 else np.uint16 if len(hits) < 65536 else np.uint32)
+        labels = np.zeros(count.shape, dtype=np.uint16 if len(self.zone_polygons) < 65535 else np.uint32)
+        for i, (wx0, wy0, wx1, wy1), coverage in hits:
+            rows, cols = slice(wy0 - uy0, wy1 - uy0), slice(wx0 - ux0, wx1 - ux0)
+            count[rows, cols] += coverage
+            labels[rows, cols][coverage] = i + 1
+
+        covered = count > 0
+        shared = count > 1
+        shared_pixels = int(np.count_nonzero(shared))
+        self.union_pixels += int(np.count_nonzero(covered))
+        self.overlap_pixels += shared_pixels
+
+        # Labelled-region pass: one bincount per quantity over the label raster
+        n = len(self.zone_polygons)
+        flat = labels[covered]
+        union_alpha = alpha[uy0 - y0:uy1 - y0, ux0 - x0:ux1 - x0]
+        self.zone_visible_pixels += np.bincount(flat, minlength=n + 1)[1:]
+        self.zone_alpha_sum += np.bincount(flat, weights=union_alpha[covered], minlength=n + 1)[1:]
+        if people is not None:
+            union_people = people[uy0 - y0:uy1 - y0, ux0 - x0:ux1 - x0]
+            self.zone_people += np.bincount(flat, weights=union_people[covered], minlength=n + 1)[1:]
+        if shared_pixels:
+            for i, (wx0, wy0, wx1, wy1), coverage in hits:
+                window_shared = shared[wy0 - uy0:wy1 - uy0, wx0 - ux0:wx1 - ux0]
+                self.zone_overlap_pixels[i] += int(np.count_nonzero(coverage & window_shared))
+
+    def _zone_coverage(self, i):
+        # Rasterize whole zones once; every tile they touch slices the result
+        if i not in self._coverage:
+            self._coverage[i] = rasterize_polygon(self.zone_polygons[i], self._windows[i])
+        return self._coverage[i]
+
+    def pixels_to_km2(self, pixels):
+        return float(pixels) * self.gsd_m * self.gsd_m / 1e6
+
+    def result(self):
+        """Summary dict with flooded area, per-zone areas, overlap and intensity"""
+        km2 = self.pixels_to_km2
+        flooded_alpha = self.alpha_histogram
+        total_alpha = float((flooded_alpha * np.arange(256)).sum())
+        bins = np.add.reduceat(flooded_alpha, np.linspace(0, 256, HISTOGRAM_BINS + 1)[:-1].astype(int))
+
+        zones = []
+        for i in range(len(self.zone_polygons)):
+            visible = int(self.zone_visible_pixels[i])
+            zones.append({
+                'zone': i,
+                'pixels': int(self.zone_pixels[i]),
+                'area_km2': round(km2(self.zone_pixels[i]), 4),
+                'overlap_km2': round(km2(self.zone_overlap_pixels[i]), 4),
+                'clipped': bool(self.zone_clipped[i]),
+                'mean_intensity': round(float(self.zone_alpha_sum[i]) / visible / 255 * 100, 1) if visible else 0.0,
+            })
+            if self.population is not None:
+                zones[-1]['population'] = int(round(self.zone_people[i]))
+
+        result = {
+            'ground_sampling_distance_m': self.gsd_m,
+            'image_size': [self.width, self.height],
+            'flooded_pixels': int(self.flooded_pixels),
+            'flooded_area_km2': round(km2(self.flooded_pixels), 4),
+            'zone_union_area_km2': round(km2(self.union_pixels), 4),
+            'zone_overlap_area_km2': round(km2(self.overlap_pixels), 4),
+            'average_intensity': round(total_alpha / self.flooded_pixels / 255 * 100, 1)
+            if self.flooded_pixels else 0.0,
+            'intensity_histogram': [int(v) for v in bins],
+            'zones': zones,
+        }
+        if self.population is not None:
+            result['scene_population'] = int(round(self.scene_people))
+            result['population_in_flood'] = int(round(self.flooded_people))
+        return result
+
+def compute_flood_statistics(overlay, zone_polygons, gsd_m=DEFAULT_GSD_M,
+                             threshold=MASK_ALPHA_THRESHOLD, population=None):
+    """Pixel-accurate statistics for a rendered full-scene overlay"""
+    alpha = overlay_alpha(overlay)
+    height, width = alpha.shape
+    accumulator = FloodStatsAccumulator(width, height, zone_polygons, gsd_m, threshold, population)
+    accumulator.add_tile(alpha)
+    return accumulator.result()
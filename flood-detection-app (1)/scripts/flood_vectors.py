@@ -0,0 +1,367 @@
+from PIL import Image
+import numpy as np
+import argparse
+import math
+import time
+
+from atomic_io import atomic_write_json
+from flood_stats import DEFAULT_GSD_M, MASK_ALPHA_THRESHOLD, overlay_alpha
+from georef import pixel_area_km2, pixel_to_lnglat, scene_bounds
+from rasterize import PolygonSet, center_to_corner
+from water_detection import band_runs, label_runs
+
+# Douglas-Peucker tolerance in pixels; 1 px keeps the outline within one
+# ground sample of the mask while dropping most staircase vertices
+SIMPLIFY_TOLERANCE = 1.0
+# Flooded regions (and holes) smaller than this are not exported
+MIN_FEATURE_PIXELS = 20
+# 6 decimals of a degree is ~0.1 m, well below any scene's pixel size
+COORD_DECIMALS = 6
+# Boxes per leaf/node of the packed R-tree
+NODE_SIZE = 16
+
+# Crack directions E, S, W, N as (dx, dy) in image coordinates (y down)
+_STEP_X = np.array([1, 0, -1, 0])
+_STEP_Y = np.array([0, 1, 0, -1])
+# Offset from an edge's start vertex to the flooded pixel on its right
+_INSIDE_X = np.array([0, -1, -1, 0])
+_INSIDE_Y = np.array([0, 0, -1, -1])
+
+def trace_rings(mask):
+    """Boundary rings of a boolean mask as pixel-corner vertex arrays
+
+    Every crack between a flooded and a dry pixel becomes a directed edge
+    with the flooded side on its right, so outer rings have positive and
+    hole rings negative shoelace area (y down). Where two flooded pixels
+    touch only diagonally the walk turns left, joining them as
+    :func:`water_detection.label_runs` does. Edges are linked into rings and
+    ordered by pointer jumping, all in NumPy; only corner vertices are kept.
+
+    Returns ``(rings, areas, inside)``: a list of (n, 2) int arrays, their
+    signed areas in pixels and, per ring, the (x, y) of one flooded pixel
+    on its boundary.
+    """
+    height, width = mask.shape
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = mask
+    # Cracks at x=col beside pixel row ``row``: northward when the pixel on
+    # their right is flooded (a run start), southward otherwise (a run end)
+    row, col = np.divmod(np.flatnonzero(padded[1:-1, 1:] != padded[1:-1, :-1]), width + 1)
+    north = padded[row + 1, col + 1]
+    # Cracks at y=row over pixel column ``col``: eastward when the pixel
+    # below is flooded, westward otherwise
+    below_row, below_col = np.divmod(np.flatnonzero(padded[1:, 1:-1] != padded[:-1, 1:-1]), width)
+    east = padded[below_row + 1, below_col + 1]
+    x = np.concatenate([col, below_col + ~east])
+    y = np.concatenate([row + north, below_row])
+    direction = np.concatenate([np.where(north, 3, 1), np.where(east, 0, 2)])
+    n = len(x)
+    if n == 0:
+        return [], np.zeros(0), np.zeros((0, 2), dtype=np.int64)
+
+    # Link each edge to the one leaving its end vertex; saddle vertices have
+    # two, and the left turn is taken
+    stride = width + 1
+    start_key = y * stride + x
+    end_key = (y + _STEP_Y[direction]) * stride + x + _STEP_X[direction]
+    by_start = np.argsort(start_key, kind='stable')
+    sorted_keys = start_key[by_start]
+    pos = np.searchsorted(sorted_keys, end_key)
+    following = by_start[pos]
+    second = np.minimum(pos + 1, n - 1)
+    saddle = (sorted_keys[second] == end_key) & (second != pos)
+    left_turn = saddle & (direction[by_start[second]] == (direction + 3) % 4)
+    following[left_turn] = by_start[second[left_turn]]
+
+    # Ring id: the smallest edge index on each cycle, by pointer jumping
+    ring = np.arange(n)
+    jump = following
+    span = 1
+    while span < n:
+        np.minimum(ring, ring[jump], out=ring)
+        jump = jump[jump]
+        span *= 2
+    # Distance to the ring's last edge (the one leading back to its first)
+    index = np.arange(n)
+    successor = np.where(following == ring, index, following)
+    remaining = (successor != index).astype(np.int64)
+    span = 1
+    while span < n:
+        remaining = remaining + remaining[successor]
+        successor = successor[successor]
+        span *= 2
+    order = np.lexsort((-remaining, ring))
+    ring, direction, x, y = ring[order], direction[order], x[order], y[order]
+
+    first = np.flatnonzero(np.r_[True, ring[1:] != ring[:-1]])
+    last = np.r_[first[1:], n] - 1
+    previous = np.arange(n) - 1
+    previous[first] = last
+    corner = direction != direction[previous]
+    counts = np.add.reduceat(corner.astype(np.int64), first)
+    vx, vy = x[corner], y[corner]
+    # Shoelace area of every ring at once
+    starts = np.cumsum(counts) - counts
+    following = np.arange(len(vx)) + 1
+    following[starts + counts - 1] = starts
+    areas = np.add.reduceat(vx * vy[following] - vx[following] * vy, starts) / 2
+    rings = np.split(np.stack([vx, vy], axis=1), starts[1:])
+    inside = np.stack([x[first] + _INSIDE_X[direction[first]], y[first] + _INSIDE_Y[direction[first]]], axis=1)
+    return rings, areas, inside
+
+def ring_area(ring):
+    """Signed shoelace area of a closed ring in pixels (positive for outer rings)"""
+    x, y = ring[:, 0].astype(np.float64), ring[:, 1].astype(np.float64)
+    return float((x * np.roll(y, -1) - np.roll(x, -1) * y).sum()) / 2
+
+def simplify_rings(rings, tolerance=SIMPLIFY_TOLERANCE):
+    """Douglas-Peucker simplification of closed rings (first vertex not repeated)
+
+    Each ring is split at its first vertex and the vertex farthest from it.
+    All rings are then refined together, one level of the recursion per
+    pass: every unsettled chord finds its farthest vertex, and chords whose
+    farthest vertex is within ``tolerance`` are settled. Rings that would
+    collapse or flip orientation are returned unchanged.
+    """
+    if not rings:
+        return []
+    sizes = np.array([len(ring) for ring in rings]) + 1
+    closed = np.concatenate([np.vstack([ring, ring[:1]]) for ring in rings]).astype(np.float64)
+    first = np.cumsum(sizes) - sizes
+    ring_of = np.repeat(np.arange(len(rings)), sizes)
+    keep = np.zeros(len(closed), dtype=bool)
+    keep[first] = keep[first + sizes - 1] = True
+    reach = ((closed - closed[first[ring_of]]) ** 2).sum(axis=1)
+    keep[_group_argmax(reach, first)] = True
+
+    settled = keep.copy()
+    while tolerance > 0 and not settled.all():
+        kept = np.flatnonzero(keep)
+        open_points = np.flatnonzero(~settled)
+        chord = np.searchsorted(kept, open_points) - 1
+        a, b = closed[kept[chord]], closed[kept[chord + 1]]
+        span, offset = b - a, closed[open_points] - a
+        length = np.hypot(span[:, 0], span[:, 1])
+        distance = np.where(length > 0,
+                            np.abs(span[:, 0] * offset[:, 1] - span[:, 1] * offset[:, 0]) / np.maximum(length, 1e-12),
+                            np.hypot(offset[:, 0], offset[:, 1]))
+        groups = np.flatnonzero(np.r_[True, chord[1:] != chord[:-1]])
+        farthest = _group_argmax(distance, groups)
+        split = farthest[distance[farthest] > tolerance]
+        keep[open_points[split]] = True
+        # Chords with nothing beyond tolerance are final: settle their vertices
+        done = np.repeat(distance[farthest] <= tolerance, np.diff(np.r_[groups, len(chord)]))
+        settled[open_points[done]] = True
+        settled[open_points[split]] = True
+
+    simplified = []
+    for ring, start, size in zip(rings, first.tolist(), sizes.tolist()):
+        candidate = ring[keep[start:start + size - 1]]
+        area = ring_area(candidate) if len(candidate) >= 3 else 0.0
+        simplified.append(candidate if area * ring_area(ring) > 0 else ring)
+    return simplified
+
+def _group_argmax(values, starts):
+    """Index of the first maximum of ``values`` in each group beginning at ``starts``"""
+    peak = np.repeat(np.maximum.reduceat(values, starts), np.diff(np.r_[starts, len(values)]))
+    hits = np.flatnonzero(values == peak)
+    group = np.searchsorted(starts, hits, side='right') - 1
+    return hits[np.r_[True, group[1:] != group[:-1]]]
+
+def flood_features(alpha, bounds, gsd_m=DEFAULT_GSD_M, zones=None, threshold=MASK_ALPHA_THRESHOLD,
+                   tolerance=SIMPLIFY_TOLERANCE, min_pixels=MIN_FEATURE_PIXELS):
+    """GeoJSON FeatureCollection of the flooded regions of an overlay alpha
+
+    Each 8-connected region of ``alpha >= threshold`` becomes a Polygon
+    (with holes) traced by :func:`trace_rings`, simplified by
+    :func:`simplify_rings` and georeferenced into ``bounds`` (west, south,
+    east, north). Features carry a ``bbox`` for :class:`ZoneIndex` and
+    their area, mean intensity and centre; with the report's ``zones`` they
+    also list which zones drew them.
+    """
+    height, width = alpha.shape
+    mask = alpha >= threshold
+    rows, starts, ends, sums = band_runs(mask, alpha)
+    labels, count = label_runs(rows, starts, ends, width)
+    lengths = ends - starts
+    pixels = np.bincount(labels, lengths, minlength=count)
+    intensity = np.bincount(labels, sums, minlength=count)
+    center_x = np.bincount(labels, (starts + ends) / 2.0 * lengths, minlength=count)
+    center_y = np.bincount(labels, (rows + 0.5) * lengths, minlength=count)
+
+    zone_ids = [[] for _ in range(count)]
+    if zones:
+        # Topmost zone under each flooded pixel, grouped per region
+        zone_labels = PolygonSet([center_to_corner(zone['polygon']) for zone in zones]).labels(
+            (0, 0, width, height))
+        pixel = (np.repeat(rows * width + starts - np.cumsum(lengths) + lengths, lengths)
+                 + np.arange(int(lengths.sum())))
+        pairs = np.unique(np.repeat(labels, lengths) * (len(zones) + 1) + zone_labels.ravel()[pixel])
+        for region, zone in zip((pairs // (len(zones) + 1)).tolist(), (pairs % (len(zones) + 1)).tolist()):
+            if zone:
+                zone_ids[region].append(zone - 1)
+
+    rings, areas, inside = trace_rings(mask)
+    stride = width + 2
+    run_of = np.searchsorted(rows * stride + starts, inside[:, 1] * stride + inside[:, 0], side='right') - 1
+    ring_region = labels[run_of]
+    # Outer rings of exported regions and their holes, simplified in one batch
+    exported = np.flatnonzero((pixels[ring_region] >= min_pixels) & ((areas > 0) | (-areas >= min_pixels)))
+    simplified = simplify_rings([rings[i] for i in exported.tolist()], tolerance)
+    exteriors, holes = {}, {}
+    for i, ring in zip(exported.tolist(), simplified):
+        region = int(ring_region[i])
+        if areas[i] > 0:
+            exteriors[region] = ring
+        else:
+            holes.setdefault(region, []).append(ring)
+
+    def to_lnglat(ring):
+        lng, lat = pixel_to_lnglat(ring[:, 0], ring[:, 1], bounds, width, height)
+        # Image rings run clockwise on the map; GeoJSON wants outer rings
+        # counter-clockwise and holes clockwise, so every ring is reversed
+        coords = np.round(np.stack([lng, lat], axis=1)[::-1], COORD_DECIMALS).tolist()
+        return coords + coords[:1]
+
+    features = []
+    for region in np.argsort(-pixels, kind='stable').tolist():
+        if pixels[region] < min_pixels:
+            break
+        exterior = exteriors[region]
+        west, north = pixel_to_lnglat(exterior[:, 0].min(), exterior[:, 1].min(), bounds, width, height)
+        east, south = pixel_to_lnglat(exterior[:, 0].max(), exterior[:, 1].max(), bounds, width, height)
+        lng, lat = pixel_to_lnglat(center_x[region] / pixels[region], center_y[region] / pixels[region],
+                                   bounds, width, height)
+        properties = {
+            'pixels': int(pixels[region]),
+            'area_km2': round(float(pixels[region]) * pixel_area_km2(gsd_m), 4),
+            'mean_intensity': round(float(intensity[region]) / pixels[region] / 255 * 100, 1),
+            'lng': round(float(lng), COORD_DECIMALS),
+            'lat': round(float(lat), COORD_DECIMALS),
+        }
+        if zones:
+            ids = zone_ids[region]
+            properties['zones'] = ids
+            properties['severity'] = zones[ids[0]]['severity'] if ids else None
+            properties['confidence'] = max((zones[i]['confidence'] for i in ids), default=None)
+        features.append({
+            'type': 'Feature',
+            'id': len(features),
+            'bbox': [round(float(v), COORD_DECIMALS) for v in (west, south, east, north)],
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [to_lnglat(exterior)] + [to_lnglat(hole) for hole in holes.get(region, [])],
+            },
+            'properties': properties,
+        })
+    return {'type': 'FeatureCollection', 'bbox': [round(v, COORD_DECIMALS) for v in bounds],
+            'features': features}
+
+class ZoneIndex:
+    """Static packed R-tree over feature bounding boxes
+
+    Leaves are filled in Sort-Tile-Recursive order (vertical slices by x
+    centre, sorted by y within each slice), and every upper level groups
+    ``node_size`` consecutive nodes, so the tree is a list of (n, 4) box
+    arrays. A query walks it level by level with vectorized overlap tests.
+    """
+
+    def __init__(self, boxes, node_size=NODE_SIZE):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_size = node_size
+        n = len(boxes)
+        slices = max(1, math.ceil(math.sqrt(-(-n // node_size))))
+        by_x = np.argsort(boxes[:, 0] + boxes[:, 2], kind='stable')
+        slice_of = np.empty(n, dtype=np.int64)
+        slice_of[by_x] = np.arange(n) // (slices * node_size)
+        self.ids = np.lexsort((boxes[:, 1] + boxes[:, 3], slice_of))
+        level = boxes[self.ids]
+        self.levels = [level]
+        while len(level) > node_size:
+            starts = np.arange(0, len(level), node_size)
+            level = np.stack([np.minimum.reduceat(level[:, 0], starts), np.minimum.reduceat(level[:, 1], starts),
+                              np.maximum.reduceat(level[:, 2], starts), np.maximum.reduceat(level[:, 3], starts)],
+                             axis=1)
+            self.levels.append(level)
+
+    @classmethod
+    def from_geojson(cls, collection, node_size=NODE_SIZE):
+        """Index the ``bbox`` of every feature of a :func:`flood_features` collection"""
+        return cls([feature['bbox'] for feature in collection['features']], node_size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, bbox):
+        """Indices of the boxes intersecting ``bbox`` (west, south, east, north), ascending"""
+        west, south, east, north = bbox
+        nodes = np.arange(len(self.levels[-1]))
+        for depth in range(len(self.levels) - 1, -1, -1):
+            boxes = self.levels[depth][nodes]
+            nodes = nodes[(boxes[:, 0] <= east) & (boxes[:, 2] >= west)
+                          & (boxes[:, 1] <= north) & (boxes[:, 3] >= south)]
+            if depth:
+                nodes = (nodes[:, None] * self.node_size + np.arange(self.node_size)).ravel()
+                nodes = nodes[nodes < len(self.levels[depth - 1])]
+        return np.sort(self.ids[nodes])
+
+def region_summary(collection, ids):
+    """Zone count and flooded area of the features ``ids`` of a collection"""
+    features = collection['features']
+    return {
+        'zones': len(ids),
+        'flooded_area_km2': round(sum(features[i]['properties']['area_km2'] for i in ids), 4),
+        'flooded_pixels': sum(features[i]['properties']['pixels'] for i in ids),
+    }
+
+def main():
+    """Export the flood mask of an overlay as georeferenced GeoJSON polygons"""
+    from india_flood_simulation import get_city_info
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('overlay', help='RGBA flood overlay (alpha is the flood mask)')
+    parser.add_argument('--location', default='Mumbai, Maharashtra')
+    parser.add_argument('--gsd', type=float, default=DEFAULT_GSD_M, help='Ground sampling distance (m/pixel)')
+    parser.add_argument('--threshold', type=int, default=MASK_ALPHA_THRESHOLD, help='Alpha counted as flooded')
+    parser.add_argument('--tolerance', type=float, default=SIMPLIFY_TOLERANCE,
+                        help='Douglas-Peucker tolerance in pixels (0 keeps every corner)')
+    parser.add_argument('--min-pixels', type=int, default=MIN_FEATURE_PIXELS)
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('WEST', 'SOUTH', 'EAST', 'NORTH'),
+                        help='Also report the zones intersecting this box')
+    parser.add_argument('--output', default='flood_zones.geojson')
+    args = parser.parse_args()
+
+    city = get_city_info(args.location)
+    if city is None:
+        parser.error(f"Unknown location {args.location!r}")
+
+    print("🗺️  Flood Zone Vector Export")
+    print("=" * 50)
+    with Image.open(args.overlay) as img:
+        if 'A' not in img.getbands():
+            parser.error(f"{args.overlay} has no alpha channel to use as the flood mask")
+        alpha = overlay_alpha(img.convert('RGBA'))
+    bounds = scene_bounds(city['lat'], city['lng'], alpha.shape[1], alpha.shape[0], args.gsd)
+    print(f"1. Tracing flood mask ({alpha.shape[1]}x{alpha.shape[0]})...")
+    start = time.perf_counter()
+    collection = flood_features(alpha, bounds, args.gsd, threshold=args.threshold,
+                                tolerance=args.tolerance, min_pixels=args.min_pixels)
+    vertices = sum(len(ring) - 1 for feature in collection['features']
+                   for ring in feature['geometry']['coordinates'])
+    print(f"   {len(collection['features'])} zones, {vertices} vertices "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    atomic_write_json(collection, args.output, indent=None)
+    print(f"💾 GeoJSON saved to: {args.output}")
+
+    if args.bbox:
+        print("2. Querying zone index...")
+        index = ZoneIndex.from_geojson(collection)
+        start = time.perf_counter()
+        ids = index.query(args.bbox)
+        elapsed = (time.perf_counter() - start) * 1000
+        summary = region_summary(collection, ids)
+        print(f"   {summary['zones']} zones, {summary['flooded_area_km2']} km² in {elapsed:.3f} ms")
+
+if __name__ == "__main__":
+    main()
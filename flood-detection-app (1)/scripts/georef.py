@@ -0,0 +1,28 @@
+import math
+
+# Metres per degree of latitude on the WGS84 sphere approximation
+METERS_PER_DEGREE = 2 * math.pi * 6378137.0 / 360
+
+def scene_bounds(lat, lng, width, height, gsd_m):
+    """(west, south, east, north) in degrees of a north-up scene centred on lat/lng
+
+    Scenes are small enough that an equirectangular approximation around the
+    centre latitude is accurate to well under a pixel.
+    """
+    half_h = height * gsd_m / 2 / METERS_PER_DEGREE
+    half_w = width * gsd_m / 2 / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    return (lng - half_w, lat - half_h, lng + half_w, lat + half_h)
+
+def pixel_area_km2(gsd_m):
+    """Ground area of one square scene pixel"""
+    return gsd_m * gsd_m / 1e6
+
+def cell_area_km2(lat, cell_width_deg, cell_height_deg):
+    """Ground area of a lat/lng grid cell centred at ``lat``"""
+    return (cell_width_deg * METERS_PER_DEGREE * math.cos(math.radians(lat))
+            * cell_height_deg * METERS_PER_DEGREE / 1e6)
+
+def pixel_to_lnglat(x, y, bounds, width, height):
+    """Longitude/latitude of pixel-corner coordinates ``x``, ``y`` in a north-up scene"""
+    west, south, east, north = bounds
+    return west + x * ((east - west) / width), north - y * ((north - south) / height)
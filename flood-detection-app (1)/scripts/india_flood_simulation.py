@@ -1,69 +1,229 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageFont
 import numpy as np
-import random
 import json
+import os
+import time
 
-def create_india_satellite_image(width=800, height=600):
-    """Create a realistic satellite image of Indian terrain"""
-    # Create base image with varied terrain colors
-    img = Image.new('RGB', (width, height))
-    pixels = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    # Create terrain variation
-    for y in range(height):
-        for x in range(width):
-            # Base terrain color (brownish-green for Indian landscape)
-            base_r = 101 + random.randint(-20, 20)  # Brown component
-            base_g = 123 + random.randint(-30, 30)  # Green component  
-            base_b = 58 + random.randint(-15, 15)   # Minimal blue
-            
-            pixels[y, x] = [base_r, base_g, base_b]
-    
-    img = Image.fromarray(pixels)
-    draw = ImageDraw.Draw(img)
+from compositing import blend_image, image_to_array
+from encoding import encode_image
+from flood_stats import DEFAULT_GSD_M, compute_flood_statistics, overlay_alpha
+from flood_vectors import COORD_DECIMALS, flood_features
+from georef import pixel_area_km2, pixel_to_lnglat, scene_bounds
+from overlay_cache import OverlayCache, DEFAULT_CACHE_DIR
+from population import location_population, population_fingerprint
+from rasterize import PolygonSet, center_to_corner
+from seeding import make_rng, scene_seed, spawn_rngs
+from tracing import image_attrs, span, trace_from_env
+from water_detection import detect_water
+
+# Bump when terrain, detection or report logic changes so cached runs are invalidated
+PIPELINE_VERSION = 7
+
+# Indian cities with coordinates (mirrors app/api/detect-flood-india/route.ts)
+INDIAN_CITY_COORDS = {
+    'mumbai': {'lat': 19.076, 'lng': 72.8777, 'state': "Maharashtra", 'district': "Mumbai"},
+    'delhi': {'lat': 28.7041, 'lng': 77.1025, 'state': "Delhi", 'district': "New Delhi"},
+    'bangalore': {'lat': 12.9716, 'lng': 77.5946, 'state': "Karnataka", 'district': "Bangalore Urban"},
+    'chennai': {'lat': 13.0827, 'lng': 80.2707, 'state': "Tamil Nadu", 'district': "Chennai"},
+    'kolkata': {'lat': 22.5726, 'lng': 88.3639, 'state': "West Bengal", 'district': "Kolkata"},
+    'hyderabad': {'lat': 17.385, 'lng': 78.4867, 'state': "Telangana", 'district': "Hyderabad"},
+    'pune': {'lat': 18.5204, 'lng': 73.8567, 'state': "Maharashtra", 'district': "Pune"},
+    'ahmedabad': {'lat': 23.0225, 'lng': 72.5714, 'state': "Gujarat", 'district': "Ahmedabad"},
+    'jaipur': {'lat': 26.9124, 'lng': 75.7873, 'state': "Rajasthan", 'district': "Jaipur"},
+    'lucknow': {'lat': 26.8467, 'lng': 80.9462, 'state': "Uttar Pradesh", 'district': "Lucknow"},
+    'patna': {'lat': 25.5941, 'lng': 85.1376, 'state': "Bihar", 'district': "Patna"},
+    'bhopal': {'lat': 23.2599, 'lng': 77.4126, 'state': "Madhya Pradesh", 'district': "Bhopal"},
+}
+
+def get_city_info(location):
+    """Look up a "City, State" location in INDIAN_CITY_COORDS"""
+    return INDIAN_CITY_COORDS.get(location.lower().split(',')[0].strip())
+
+# Base terrain colour ranges (brownish-green for Indian landscape)
+TERRAIN_BASE_COLOR = (101, 123, 58)
+TERRAIN_COLOR_SPREAD = (20, 30, 15)
+
+RIVER_COLOR = (30, 60, 120)  # Dark blue
+URBAN_COLOR = (80, 80, 85)
+AGRI_COLOR = (85, 140, 70)
+FOREST_COLOR = (60, 100, 45)
+
+def _value_noise(width, height, cells, rng):
+    """Smooth value noise in [-1, 1] from a bilinearly upsampled random grid"""
+    grid_w = max(2, int(cells))
+    grid_h = max(2, int(round(cells * height / max(width, 1))))
+    grid = rng.uniform(-1.0, 1.0, size=(grid_h, grid_w)).astype(np.float32)
+    field = Image.fromarray(grid, mode='F').resize((width, height), Image.BILINEAR)
+    return np.asarray(field, dtype=np.float32)
+
+def generate_terrain_noise(width, height, rng, octaves=1, persistence=0.5, base_cells=8):
+    """Generate the base terrain colour field as an (height, width, 3) uint8 array
+
+    With a single octave every channel is independent uniform integer noise,
+    exactly the distribution of the original per-pixel ``random.randint`` loop.
+    Extra octaves blend in coarser value noise shared across channels, rescaled
+    so each channel keeps the same mean and range.
+    """
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+
+    if octaves <= 1:
+        for c, (base, spread) in enumerate(zip(TERRAIN_BASE_COLOR, TERRAIN_COLOR_SPREAD)):
+            pixels[..., c] = rng.integers(base - spread, base + spread + 1,
+                                          size=(height, width), dtype=np.uint8)
+        return pixels
+
+    # Coarse octaves first, finest octave (per-pixel noise) last
+    structure = np.zeros((height, width), dtype=np.float32)
+    amplitude = 1.0
+    total = 0.0
+    for octave in range(octaves - 1):
+        structure += amplitude * _value_noise(width, height, base_cells * (2 ** octave), rng)
+        total += amplitude
+        amplitude *= persistence
+
+    for c, (base, spread) in enumerate(zip(TERRAIN_BASE_COLOR, TERRAIN_COLOR_SPREAD)):
+        channel = rng.uniform(-1.0, 1.0, size=(height, width)).astype(np.float32)
+        channel *= amplitude
+        channel += structure
+        channel *= spread / (total + amplitude)
+        channel += base
+        np.clip(np.rint(channel, out=channel), base - spread, base + spread, out=channel)
+        pixels[..., c] = channel
+
+    return pixels
+
+def _clip_box(x0, y0, x1, y1, width, height):
+    """Clip an inclusive pixel box to the image, returning slices or None"""
+    x0, y0 = max(0, int(np.floor(x0))), max(0, int(np.floor(y0)))
+    x1, y1 = min(width - 1, int(np.ceil(x1))), min(height - 1, int(np.ceil(y1)))
+    if x0 > x1 or y0 > y1:
+        return None
+    return slice(y0, y1 + 1), slice(x0, x1 + 1)
+
+def paint_line(pixels, points, color, line_width):
+    """Paint a thick polyline by thresholding distance to each segment"""
+    height, width = pixels.shape[:2]
+    half = line_width / 2.0
+    for (ax, ay), (bx, by) in zip(points[:-1], points[1:]):
+        box = _clip_box(min(ax, bx) - half, min(ay, by) - half,
+                        max(ax, bx) + half, max(ay, by) + half, width, height)
+        if box is None:
+            continue
+        rows, cols = box
+        ys = np.arange(rows.start, rows.stop, dtype=np.float32)[:, None]
+        xs = np.arange(cols.start, cols.stop, dtype=np.float32)[None, :]
+        dx, dy = bx - ax, by - ay
+        length_sq = float(dx * dx + dy * dy) or 1.0
+        t = np.clip(((xs - ax) * dx + (ys - ay) * dy) / length_sq, 0.0, 1.0)
+        dist_sq = (xs - ax - t * dx) ** 2 + (ys - ay - t * dy) ** 2
+        pixels[rows, cols][dist_sq <= half * half] = color
+
+def paint_rectangle(pixels, box, color):
+    """Paint an inclusive [x0, y0, x1, y1] rectangle"""
+    height, width = pixels.shape[:2]
+    clipped = _clip_box(*box, width, height)
+    if clipped is not None:
+        pixels[clipped] = color
+
+def paint_ellipse(pixels, box, color):
+    """Paint an ellipse inscribed in an inclusive [x0, y0, x1, y1] box"""
+    height, width = pixels.shape[:2]
+    clipped = _clip_box(*box, width, height)
+    if clipped is None:
+        return
+    x0, y0, x1, y1 = box
+    cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    rx, ry = max((x1 - x0) / 2.0, 0.5), max((y1 - y0) / 2.0, 0.5)
+    rows, cols = clipped
+    ys = (np.arange(rows.start, rows.stop, dtype=np.float32)[:, None] - cy) / ry
+    xs = (np.arange(cols.start, cols.stop, dtype=np.float32)[None, :] - cx) / rx
+    pixels[rows, cols][xs * xs + ys * ys <= 1.0] = color
+
+def create_india_satellite_image(width=800, height=600, rng=None, octaves=1):
+    """Create a realistic satellite image of Indian terrain
+
+    ``rng`` may be a ``numpy.random.Generator`` or a seed; ``octaves`` > 1
+    adds multi-octave terrain structure on top of the per-pixel noise.
+    """
+    rng = make_rng(rng)
+    pixels = generate_terrain_noise(width, height, rng, octaves=octaves)
     
     # Add major geographical features
     
     # Rivers (Ganges, Yamuna, etc.)
-    river_color = (30, 60, 120)  # Dark blue
     # Ganges-like river
     river_points = [(0, height//3), (width//4, height//3 + 20), 
                    (width//2, height//3 - 10), (3*width//4, height//3 + 30), 
                    (width, height//3 + 10)]
-    for i in range(len(river_points)-1):
-        draw.line([river_points[i], river_points[i+1]], fill=river_color, width=8)
+    paint_line(pixels, river_points, RIVER_COLOR, 8)
     
     # Yamuna-like river
     yamuna_points = [(width//4, 0), (width//4 + 20, height//4), 
                     (width//4 + 10, height//2)]
-    for i in range(len(yamuna_points)-1):
-        draw.line([yamuna_points[i], yamuna_points[i+1]], fill=river_color, width=6)
+    paint_line(pixels, yamuna_points, RIVER_COLOR, 6)
     
     # Urban areas (darker, more structured)
-    urban_color = (80, 80, 85)
-    draw.rectangle([width//6, height//4, width//6 + 100, height//4 + 80], fill=urban_color)
-    draw.rectangle([2*width//3, height//2, 2*width//3 + 120, height//2 + 90], fill=urban_color)
+    paint_rectangle(pixels, [width//6, height//4, width//6 + 100, height//4 + 80], URBAN_COLOR)
+    paint_rectangle(pixels, [2*width//3, height//2, 2*width//3 + 120, height//2 + 90], URBAN_COLOR)
     
     # Agricultural areas (greener patches)
-    agri_color = (85, 140, 70)
-    draw.rectangle([width//3, height//6, width//3 + 150, height//6 + 100], fill=agri_color)
-    draw.rectangle([width//2, 2*height//3, width//2 + 180, 2*height//3 + 80], fill=agri_color)
+    paint_rectangle(pixels, [width//3, height//6, width//3 + 150, height//6 + 100], AGRI_COLOR)
+    paint_rectangle(pixels, [width//2, 2*height//3, width//2 + 180, 2*height//3 + 80], AGRI_COLOR)
     
     # Forests (darker green)
-    forest_color = (60, 100, 45)
-    draw.ellipse([width//8, height//2, width//8 + 120, height//2 + 100], fill=forest_color)
-    draw.ellipse([3*width//4, height//8, 3*width//4 + 100, height//8 + 120], fill=forest_color)
+    paint_ellipse(pixels, [width//8, height//2, width//8 + 120, height//2 + 100], FOREST_COLOR)
+    paint_ellipse(pixels, [3*width//4, height//8, 3*width//4 + 100, height//8 + 120], FOREST_COLOR)
     
-    return img
+    return Image.fromarray(pixels)
 
-def simulate_flood_detection(base_image, flood_severity='moderate'):
-    """Apply ML-simulated flood detection overlay"""
-    width, height = base_image.size
+def simulate_flood_detection(base_image, flood_severity='moderate', gsd_m=DEFAULT_GSD_M, population=None,
+                             detection='simulated', bounds=None, rng=None):
+    """Apply ML-simulated flood detection overlay
+
+    Returns ``(result, flood_zones, stats)`` with ``stats`` measured on the
+    drawn overlay at ``gsd_m`` metres per pixel; a ``population`` grid adds
+    the people under the flood mask. ``detection='spectral'`` classifies
+    water in ``base_image`` instead of drawing random zones from ``rng`` (a
+    ``numpy.random.Generator`` or seed). With the
+    scene's ``bounds`` (west, south, east, north) each zone gets its
+    ``lat``/``lng`` and ``stats['flood_vectors']`` holds the flood mask as a
+    GeoJSON FeatureCollection (see :mod:`flood_vectors`).
+    """
+    if detection == 'spectral':
+        overlay, water_zones, water = detect_water(base_image)
+        flood_zones = [{
+            'center': zone['center'],
+            'severity': flood_severity,
+            'area_km2': round(zone['pixels'] * pixel_area_km2(gsd_m), 1),  # Refined from the mask
+            'confidence': zone['confidence'],
+            'polygon': zone['polygon']
+        } for zone in water_zones]
+    else:
+        overlay, flood_zones = draw_simulated_flood_zones(*base_image.size, flood_severity, rng)
+        water = None
+    
+    stats = compute_flood_statistics(overlay, [zone['polygon'] for zone in flood_zones], gsd_m,
+                                     population=population)
+    if water is not None:
+        stats['water_detection'] = water
+    if bounds is not None:
+        for zone in flood_zones:
+            lng, lat = pixel_to_lnglat(zone['center'][0] + 0.5, zone['center'][1] + 0.5, bounds, *base_image.size)
+            zone['lat'], zone['lng'] = round(lat, COORD_DECIMALS), round(lng, COORD_DECIMALS)
+        stats['flood_vectors'] = flood_features(overlay_alpha(overlay), bounds, gsd_m, flood_zones)
     
-    # Create flood overlay
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
+    # Combine base image with flood overlay
+    result = image_to_array(base_image)
+    blend_image(result, overlay)
     
+    return Image.fromarray(result), flood_zones, stats
+
+def draw_simulated_flood_zones(width, height, flood_severity='moderate', rng=None):
+    """Draw random flood zones near low-lying areas; returns ``(overlay, flood_zones)``
+
+    Every zone parameter is drawn from ``rng`` in one bulk call per quantity.
+    """
+    rng = make_rng(rng)
     # Define flood parameters based on severity
     if flood_severity == 'severe':
         flood_areas = 8
@@ -78,57 +238,64 @@ def simulate_flood_detection(base_image, flood_severity='moderate'):
         opacity_range = (60, 100)
         size_multiplier = 0.7
     
-    # Generate flood zones
-    flood_zones = []
-    for i in range(flood_areas):
-        # Focus floods near rivers and low-lying areas (bottom 40% of image)
-        center_x = random.randint(50, width - 50)
-        center_y = random.randint(int(height * 0.6), height - 50)
-        
-        # Flood area size
-        radius_x = int((50 + random.randint(0, 100)) * size_multiplier)
-        radius_y = int((40 + random.randint(0, 80)) * size_multiplier)
-        
-        # Flood color with varying opacity
-        opacity = random.randint(*opacity_range)
-        flood_color = (255, 0, 0, opacity)  # Red with transparency
-        
-        # Draw irregular flood shape
-        points = []
-        num_points = 8
-        for j in range(num_points):
-            angle = (2 * np.pi * j) / num_points
-            # Add some randomness to make it look natural
-            r_x = radius_x + random.randint(-20, 20)
-            r_y = radius_y + random.randint(-15, 15)
-            x = center_x + int(r_x * np.cos(angle))
-            y = center_y + int(r_y * np.sin(angle))
-            points.append((x, y))
-        
-        draw.polygon(points, fill=flood_color)
-        
-        # Store flood zone data
-        flood_zones.append({
-            'center': (center_x, center_y),
-            'severity': flood_severity,
-            'area_km2': round((radius_x * radius_y * 3.14159) / 10000, 1),  # Rough conversion
-            'confidence': round(0.7 + random.random() * 0.25, 2)
-        })
+    # Focus floods near rivers and low-lying areas (bottom 40% of image)
+    center_x = rng.integers(50, width - 50, flood_areas, endpoint=True)
+    center_y = rng.integers(int(height * 0.6), height - 50, flood_areas, endpoint=True)
     
-    # Combine base image with flood overlay
-    result = base_image.copy()
-    result.paste(overlay, (0, 0), overlay)
+    # Flood area size
+    radius_x = ((50 + rng.integers(0, 100, flood_areas, endpoint=True)) * size_multiplier).astype(int)
+    radius_y = ((40 + rng.integers(0, 80, flood_areas, endpoint=True)) * size_multiplier).astype(int)
     
-    return result, flood_zones
+    # Flood color with varying opacity
+    opacity = rng.integers(*opacity_range, flood_areas, endpoint=True)
+    confidence = np.round(0.7 + rng.random(flood_areas) * 0.25, 2)
+    
+    # Irregular flood shapes: 8 points per zone with some randomness to look natural
+    num_points = 8
+    angle = 2 * np.pi * np.arange(num_points) / num_points
+    r_x = radius_x[:, None] + rng.integers(-20, 20, (flood_areas, num_points), endpoint=True)
+    r_y = radius_y[:, None] + rng.integers(-15, 15, (flood_areas, num_points), endpoint=True)
+    xs = center_x[:, None] + (r_x * np.cos(angle)).astype(int)
+    ys = center_y[:, None] + (r_y * np.sin(angle)).astype(int)
+    
+    # Store flood zone data
+    flood_zones = [{
+        'center': (cx, cy),
+        'severity': flood_severity,
+        'area_km2': round((rx * ry * 3.14159) / 10000, 1),  # Rough, refined from the mask
+        'confidence': conf,
+        'polygon': list(zip(x, y))
+    } for cx, cy, rx, ry, conf, x, y in zip(center_x.tolist(), center_y.tolist(), radius_x.tolist(),
+                                            radius_y.tolist(), confidence.tolist(), xs.tolist(), ys.tolist())]
+    flood_colors = [(255, 0, 0, alpha) for alpha in opacity.tolist()]  # Red with transparency
+    
+    # Create flood overlay: all zones in one batched rasterizer pass
+    polygons = PolygonSet([center_to_corner(zone['polygon']) for zone in flood_zones])
+    overlay = Image.fromarray(polygons.paint(flood_colors, (0, 0, width, height)), 'RGBA')
+    return overlay, flood_zones
+
+def generate_analysis_report(location, date, flood_zones, stats=None):
+    """Generate flood analysis report
 
-def generate_analysis_report(location, date, flood_zones):
-    """Generate flood analysis report"""
-    total_area = sum(zone['area_km2'] for zone in flood_zones)
-    avg_confidence = sum(zone['confidence'] for zone in flood_zones) / len(flood_zones)
+    With ``stats`` the areas come from the rendered mask, so overlapping
+    zones are counted once and zones clipped at the image edge shrink.
+    """
+    if stats is not None:
+        flood_zones = [dict(zone, area_km2=zone_stats['area_km2'],
+                            **{k: v for k, v in zone_stats.items() if k not in ('zone', 'area_km2')})
+                       for zone, zone_stats in zip(flood_zones, stats['zones'])]
+        total_area = stats['flooded_area_km2']
+    else:
+        total_area = sum(zone['area_km2'] for zone in flood_zones)
+    avg_confidence = sum(zone['confidence'] for zone in flood_zones) / len(flood_zones) if flood_zones else 0
     
-    # Estimate affected population (rough calculation for Indian context)
-    population_density = 400  # people per km² (India average)
-    affected_population = int(total_area * population_density * 0.6)  # 60% exposure rate
+    if stats is not None and 'population_in_flood' in stats:
+        # People under the flood mask, from the population raster
+        affected_population = int(stats['population_in_flood'] * 0.6)  # 60% exposure rate
+    else:
+        # Estimate affected population (rough calculation for Indian context)
+        population_density = 400  # people per km² (India average)
+        affected_population = int(total_area * population_density * 0.6)  # 60% exposure rate
     
     report = {
         'location': location,
@@ -149,41 +316,132 @@ def generate_analysis_report(location, date, flood_zones):
             'Set up temporary relief camps in safe zones'
         ]
     }
+    if stats is not None:
+        report['pixel_statistics'] = {k: v for k, v in stats.items() if k != 'zones'}
     
     return report
 
+def run_flood_simulation(location, date, flood_severity='moderate', rng=None, gsd_m=DEFAULT_GSD_M,
+                         population_raster=None, detection='simulated'):
+    """Generate imagery, detect floods and build the report (steps 1-3)
+
+    ``rng`` (a seed or ``numpy.random.Generator``) drives every random draw.
+    Returns ``(satellite_img, flood_result, report, vectors)``; ``vectors``
+    is the GeoJSON of the flood zones, or None for an unknown location.
+    """
+    # Terrain and flood zones draw from independent child streams of the scene seed
+    terrain_rng, flood_rng = spawn_rngs(rng, 2)
+    
+    # Step 1: Create satellite image
+    print("1. Generating satellite imagery...")
+    with span('create_india_satellite_image') as sp:
+        satellite_img = create_india_satellite_image(rng=terrain_rng)
+        sp.set(**image_attrs(satellite_img))
+    
+    # Step 2: Apply flood detection
+    print("2. Running ML flood detection...")
+    population = None
+    city = get_city_info(location)
+    bounds = scene_bounds(city['lat'], city['lng'], *satellite_img.size, gsd_m) if city else None
+    if population_raster:
+        with span('scene_population'):
+            population = location_population(population_raster, location, *satellite_img.size, gsd_m)
+    with span('simulate_flood_detection', severity=flood_severity) as sp:
+        flood_result, flood_zones, stats = simulate_flood_detection(satellite_img, flood_severity, gsd_m, population,
+                                                                    detection, bounds, flood_rng)
+        vectors = stats.pop('flood_vectors', None)
+        sp.set(zones=len(flood_zones), flooded_pixels=stats['flooded_pixels'], **image_attrs(flood_result))
+    
+    # Step 3: Generate analysis report
+    print("3. Generating analysis report...")
+    with span('report'):
+        report = generate_analysis_report(location, date, flood_zones, stats)
+    
+    return satellite_img, flood_result, report, vectors
+
+def run_cached_flood_simulation(location, date, flood_severity='moderate', seed=None, cache=None,
+                                gsd_m=DEFAULT_GSD_M, population_raster=None, detection='simulated'):
+    """Run the simulation or serve its PNGs and report from ``cache``
+
+    Returns ``(files, report, cache_hit)`` where ``files`` maps
+    ``'satellite.png'`` and ``'overlay.png'`` to PNG bytes, plus
+    ``'flood_zones.geojson'`` for known locations. Unseeded runs bypass
+    the cache. The report's ``processing_time`` is the measured time of this call.
+    """
+    start = time.perf_counter()
+    key = None
+    if cache is not None and seed is not None:
+        with span('cache_lookup') as sp:
+            key = cache.make_key(None, flood_severity, seed, PIPELINE_VERSION,
+                                 location=location, date=date, gsd_m=gsd_m, detection=detection,
+                                 population=population_fingerprint(population_raster))
+            hit = cache.get(key)
+            sp.set(hit=hit is not None)
+        if hit is not None:
+            print("♻️  Serving imagery and report from cache")
+            files, report = hit
+            report = dict(report, processing_time=f'{time.perf_counter() - start:.3f}s')
+            return files, report, True
+    
+    satellite_img, flood_result, report, vectors = run_flood_simulation(
+        location, date, flood_severity, rng=seed, gsd_m=gsd_m, population_raster=population_raster,
+        detection=detection)
+    
+    with span('encode') as sp:
+        files = {'satellite.png': encode_image(satellite_img, 'png'),
+                 'overlay.png': encode_image(flood_result, 'png')}
+        if vectors is not None:
+            files['flood_zones.geojson'] = json.dumps(vectors, separators=(',', ':')).encode()
+        sp.set(output_bytes=sum(len(data) for data in files.values()))
+    report['processing_time'] = f'{time.perf_counter() - start:.3f}s'
+    if key is not None:
+        with span('cache_store'):
+            cache.put(key, files, report)
+    return files, report, False
+
 def main():
     """Main flood detection simulation"""
+    from report_store import ReportStore, DEFAULT_STORE_DIR, run_id
     # Configuration
     location = "Mumbai, Maharashtra"
     date = "2024-01-15"
     flood_severity = 'moderate'  # mild, moderate, severe
+    detection = 'simulated'  # or 'spectral' to classify water in the imagery
+    seed = scene_seed(location, date, flood_severity)
+    cache = OverlayCache(os.environ.get('FLOOD_CACHE_DIR', DEFAULT_CACHE_DIR))
+    population_raster = os.environ.get('FLOOD_POPULATION_RASTER')
+    report_store = os.environ.get('FLOOD_REPORT_STORE', DEFAULT_STORE_DIR)
     
     print(f"🛰️  India Flood Detection System")
     print(f"📍 Location: {location}")
     print(f"📅 Date: {date}")
     print(f"⚠️  Severity: {flood_severity}")
     print("-" * 50)
+    trace_from_env()
     
-    # Step 1: Create satellite image
-    print("1. Generating satellite imagery...")
-    satellite_img = create_india_satellite_image()
-    
-    # Step 2: Apply flood detection
-    print("2. Running ML flood detection...")
-    flood_result, flood_zones = simulate_flood_detection(satellite_img, flood_severity)
-    
-    # Step 3: Generate analysis report
-    print("3. Generating analysis report...")
-    report = generate_analysis_report(location, date, flood_zones)
+    with span('run_cached_flood_simulation', location=location, severity=flood_severity):
+        files, report, cache_hit = run_cached_flood_simulation(location, date, flood_severity, seed, cache,
+                                                               population_raster=population_raster,
+                                                               detection=detection)
     
     # Step 4: Save results
     print("4. Saving results...")
-    satellite_img.save('static/india_satellite_original.png')
-    flood_result.save('static/india_flood_overlay.png')
-    
-    with open('static/flood_analysis_report.json', 'w') as f:
-        json.dump(report, f, indent=2)
+    with span('save_output'):
+        with open('static/india_satellite_original.png', 'wb') as f:
+            f.write(files['satellite.png'])
+        with open('static/india_flood_overlay.png', 'wb') as f:
+            f.write(files['overlay.png'])
+        
+        with open('static/flood_analysis_report.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        if 'flood_zones.geojson' in files:
+            with open('static/flood_zones.geojson', 'wb') as f:
+                f.write(files['flood_zones.geojson'])
+        # Columnar copy for cross-run aggregation (see report_store.py); a
+        # cache hit is a run the store already holds
+        if not cache_hit:
+            ReportStore(report_store).append(report, flood_severity,
+                                             run_id('india', location, date, flood_severity, detection, seed))
     
     # Step 5: Display results
     print("\n📊 ANALYSIS RESULTS:")
@@ -191,11 +449,15 @@ def main():
     print(f"👥 Estimated Affected Population: {report['summary']['estimated_affected_population']:,}")
     print(f"🎯 Average Confidence: {report['summary']['average_confidence']*100:.1f}%")
     print(f"⚠️  Risk Level: {report['summary']['risk_level']}")
+    print(f"⏱️  Processing Time: {report['processing_time']}")
     
     print(f"\n💾 Files saved:")
     print(f"   • static/india_satellite_original.png")
     print(f"   • static/india_flood_overlay.png") 
     print(f"   • static/flood_analysis_report.json")
+    if 'flood_zones.geojson' in files:
+        print(f"   • static/flood_zones.geojson")
+    print(f"   • {report_store}/ (report store)")
     
     print(f"\n🚨 FLOOD ALERT for {location}:")
     if report['summary']['risk_level'] == 'HIGH':
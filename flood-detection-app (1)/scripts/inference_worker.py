@@ -0,0 +1,532 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+import argparse
+import base64
+import collections
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from job_manager import JobManager, report_output, set_progress_sink
+
+MAX_BODY_BYTES = 1 << 20
+PNG_COMPRESS_LEVEL = 1  # responses are transient; favour latency over size
+# Parsed zone collections (and their spatial indexes) kept per worker
+ZONE_INDEX_ENTRIES = 32
+# Background jobs may run far longer than a synchronous request
+JOB_TIMEOUT_S = 3600
+SSE_KEEPALIVE_S = 15
+# Numbered steps each job type prints (see job_manager.STEP_PATTERN)
+JOB_STEPS = {'detect-flood': None, 'generate-flood-overlay': 5, 'report': 3}
+
+_thread_state = threading.local()
+
+class _ThreadStdout(io.TextIOBase):
+    """Process-wide stdout that routes output by the thread writing it
+
+    ``contextlib.redirect_stdout`` swaps ``sys.stdout`` for every thread, so
+    under ``--threads`` overlapping calls restored each other's streams.
+    This proxy is installed once per worker (see :func:`warm_up`) and routes
+    each write by the calling thread instead: a background job's output
+    becomes its progress (see :func:`job_manager.report_output`), quiet
+    threads are dropped and everything else reaches the real stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if report_output(text) or getattr(_thread_state, 'quiet', False):
+            return len(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+def _install_stdout():
+    if not isinstance(sys.stdout, _ThreadStdout):
+        sys.stdout = _ThreadStdout(sys.stdout)
+
+@contextlib.contextmanager
+def _quiet():
+    """Swallow the pipeline's progress prints on this thread inside worker calls
+
+    Only marks the calling thread; ``sys.stdout`` itself is left alone
+    (see :class:`_ThreadStdout`).
+    """
+    previous = getattr(_thread_state, 'quiet', False)
+    _thread_state.quiet = True
+    try:
+        yield
+    finally:
+        _thread_state.quiet = previous
+
+def _png_bytes(img):
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+def _data_url(img):
+    return 'data:image/png;base64,' + base64.b64encode(_png_bytes(img)).decode('ascii')
+
+_cache = None
+
+def warm_up(cache_dir=None, cache_bytes=None, progress=None):
+    """Import the pipeline modules once per worker and touch their hot paths
+
+    ``progress`` is the queue background jobs publish their steps to.
+    """
+    global _cache
+    set_progress_sink(progress)
+    _install_stdout()
+    import generate_flood_overlay
+    import india_flood_simulation
+    import simulate_flood_detection
+    from overlay_cache import OverlayCache, DEFAULT_MAX_BYTES
+    if cache_dir:
+        _cache = OverlayCache(cache_dir, cache_bytes or DEFAULT_MAX_BYTES)
+    with _quiet():
+        india_flood_simulation.create_india_satellite_image(64, 64)
+        _png_bytes(simulate_flood_detection.create_satellite_image())
+
+def _detection_mode(body):
+    detection = body.get('detection', 'simulated')
+    if detection not in ('simulated', 'spectral'):
+        raise ValueError(f"Unknown detection mode {detection!r}")
+    return detection
+
+def detect_flood(location, date, detection='simulated'):
+    """Run simulate_ml_inference and return both images as data URLs"""
+    import simulate_flood_detection
+    with _quiet():
+        original, overlay = simulate_flood_detection.simulate_ml_inference(location, date, detection)
+    return {'originalImage': _data_url(original), 'overlayImage': _data_url(overlay)}
+
+def generate_overlay(base_image, location, date, severity, detection='simulated'):
+    """Run the overlay pipeline and return PNG bytes, the report and whether it was cached"""
+    import generate_flood_overlay
+    from seeding import scene_seed
+    seed = scene_seed(location, date, severity)
+    with _quiet():
+        return generate_flood_overlay.create_cached_flood_map(
+            base_image, location, severity, seed, _cache,
+            population_raster=os.environ.get('FLOOD_POPULATION_RASTER'), detection=detection)
+
+def _overlay_json(png, report, cached):
+    report = dict(report, cached=cached)
+    report['overlayImage'] = 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+    return report
+
+def overlay_report(base_image, location, date, severity, detection='simulated'):
+    """:func:`generate_overlay` as one JSON-ready report, the image as a data URL"""
+    return _overlay_json(*generate_overlay(base_image, location, date, severity, detection))
+
+def flood_report(location, date, severity, include_images=False, detection='simulated'):
+    """Run the India simulation and return its report"""
+    import india_flood_simulation
+    from seeding import scene_seed
+    seed = scene_seed(location, date, severity)
+    with _quiet():
+        files, report, cached = india_flood_simulation.run_cached_flood_simulation(
+            location, date, severity, seed, _cache,
+            population_raster=os.environ.get('FLOOD_POPULATION_RASTER'), detection=detection)
+    report = dict(report, cached=cached)
+    if include_images:
+        for key, name in (('originalImage', 'satellite.png'), ('overlayImage', 'overlay.png')):
+            report[key] = 'data:image/png;base64,' + base64.b64encode(files[name]).decode('ascii')
+    return report
+
+_zone_indexes = collections.OrderedDict()
+_zone_lock = threading.Lock()
+
+def flood_zones(location, date, severity, bbox=None, detection='simulated'):
+    """GeoJSON flood zones of the India simulation, optionally only those intersecting ``bbox``
+
+    The parsed collection and its :class:`flood_vectors.ZoneIndex` stay in
+    this worker, so repeated map and district queries for a scene only walk
+    the index instead of rerunning the pipeline or rescanning every zone.
+    Locations without coordinates cannot be georeferenced: they get an
+    empty collection with ``georeferenced`` false, without running the
+    pipeline, so callers can fall back to their own estimates.
+    """
+    import india_flood_simulation
+    from flood_vectors import ZoneIndex, region_summary
+    from seeding import scene_seed
+    if india_flood_simulation.get_city_info(location) is None:
+        return {'type': 'FeatureCollection', 'features': [], 'georeferenced': False,
+                'summary': region_summary({'features': []}, [])}
+    key = (location, date, severity, detection)
+    with _zone_lock:
+        entry = _zone_indexes.get(key)
+        if entry is not None:
+            _zone_indexes.move_to_end(key)
+    if entry is None:
+        seed = scene_seed(location, date, severity)
+        with _quiet():
+            files, _, _ = india_flood_simulation.run_cached_flood_simulation(
+                location, date, severity, seed, _cache,
+                population_raster=os.environ.get('FLOOD_POPULATION_RASTER'), detection=detection)
+        collection = json.loads(files['flood_zones.geojson'])
+        entry = (collection, ZoneIndex.from_geojson(collection))
+        with _zone_lock:
+            _zone_indexes[key] = entry
+            while len(_zone_indexes) > ZONE_INDEX_ENTRIES:
+                _zone_indexes.popitem(last=False)
+    collection, index = entry
+    ids = index.query(bbox).tolist() if bbox else list(range(len(index)))
+    return {
+        'type': 'FeatureCollection',
+        'bbox': list(bbox) if bbox else collection['bbox'],
+        'features': [collection['features'][i] for i in ids],
+        'georeferenced': True,
+        'summary': region_summary(collection, ids),
+    }
+
+class QueueFull(Exception):
+    """Raised when the worker pool and its queue are both saturated"""
+
+class BoundedWorkerPool:
+    """Executor with a fixed number of workers and a bounded wait queue
+
+    ``submit`` fails fast with :class:`QueueFull` instead of letting requests
+    pile up without limit, which lets the HTTP layer apply backpressure.
+    """
+
+    def __init__(self, workers=None, queue_size=None, use_processes=True, cache_dir=None, cache_bytes=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        if use_processes:
+            # Workers publish background-job progress back to this process
+            self.progress = multiprocessing.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up,
+                                                 initargs=(cache_dir, cache_bytes, self.progress))
+            # Start every worker process now rather than on the first requests
+            for future in [self._executor.submit(time.sleep, 0) for _ in range(self.workers)]:
+                future.result()
+        else:
+            self.progress = queue.SimpleQueue()
+            warm_up(cache_dir, cache_bytes, self.progress)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull()
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.workers),
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+    """JSON-over-HTTP front end for the flood pipeline"""
+
+    server_version = 'FloodInferenceWorker/1.0'
+    routes = {
+        '/detect-flood': '_handle_detect_flood',
+        '/generate-flood-overlay': '_handle_generate_overlay',
+        '/report': '_handle_report',
+        '/zones': '_handle_zones',
+        '/jobs': '_handle_submit_job',
+    }
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok', **self.server.pool.stats(), 'jobs': self.server.jobs.stats()})
+            return
+        parts = path.strip('/').split('/')
+        job = self.server.jobs.get(parts[1]) if parts[0] == 'jobs' and len(parts) in (2, 3) else None
+        if job is None:
+            self._send_json(404, {'error': f'Unknown endpoint or job {self.path}'})
+        elif len(parts) == 2:
+            self._send_json(200, job.snapshot())
+        elif parts[2] == 'events':
+            self._stream_job_events(job)
+        else:
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        start = time.perf_counter()
+        try:
+            getattr(self, handler)(body, start)
+        except QueueFull:
+            self._send_json(503, {'error': 'Worker queue is full'}, headers={'Retry-After': '1'})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error': f'Bad request: {e}'})
+        except Exception as e:
+            self._send_json(500, {'error': f'Processing failed: {e}'})
+
+    def _handle_detect_flood(self, body, start):
+        result = self._run(detect_flood, body['location'], body['date'], _detection_mode(body))
+        result['metadata'] = {
+            'location': body['location'],
+            'date': body['date'],
+            'processingTime': f'{time.perf_counter() - start:.3f}s',
+        }
+        self._send_json(200, result)
+
+    def _handle_generate_overlay(self, body, start):
+        base_image = self.server.resolve_image(body.get('baseImage'))
+        severity = body.get('severity', 'moderate')
+        png, report, cached = self._run(generate_overlay, base_image, body.get('location', ''),
+                                        body.get('date', ''), severity, _detection_mode(body))
+        if self.query.get('format') == ['json']:
+            report = _overlay_json(png, report, cached)
+            report['processingTime'] = f'{time.perf_counter() - start:.3f}s'
+            self._send_json(200, report)
+        else:
+            self._send(200, png, 'image/png', {
+                'Cache-Control': 'no-cache',
+                'X-Flood-Cache': 'hit' if cached else 'miss',
+                'X-Processing-Time': f'{time.perf_counter() - start:.3f}s',
+            })
+
+    def _handle_report(self, body, start):
+        report = self._run(flood_report, body['location'], body['date'],
+                           body.get('severity', 'moderate'), bool(body.get('includeImages')),
+                           _detection_mode(body))
+        report['processingTime'] = f'{time.perf_counter() - start:.3f}s'
+        self._send_json(200, report)
+
+    def _handle_zones(self, body, start):
+        bbox = body.get('bbox')
+        if bbox is not None:
+            bbox = [float(v) for v in bbox]
+            if len(bbox) != 4:
+                raise ValueError('bbox must be [west, south, east, north]')
+        zones = self._run(flood_zones, body['location'], body['date'], body.get('severity', 'moderate'),
+                          bbox, _detection_mode(body))
+        zones['processingTime'] = f'{time.perf_counter() - start:.3f}s'
+        self._send_json(200, zones)
+
+    def _job_call(self, body):
+        """The worker function and arguments a ``/jobs`` request runs"""
+        kind = body.get('type')
+        detection = _detection_mode(body)
+        severity = body.get('severity', 'moderate')
+        if kind == 'detect-flood':
+            return detect_flood, (body['location'], body['date'], detection)
+        if kind == 'generate-flood-overlay':
+            return overlay_report, (self.server.resolve_image(body.get('baseImage')), body.get('location', ''),
+                                    body.get('date', ''), severity, detection)
+        if kind == 'report':
+            return flood_report, (body['location'], body['date'], severity, bool(body.get('includeImages')),
+                                  detection)
+        raise ValueError(f"Unknown job type {kind!r}; choose from {', '.join(JOB_STEPS)}")
+
+    def _handle_submit_job(self, body, start):
+        """Start a pipeline run in the background and answer at once with its job id
+
+        Identical requests (same type, location, date, severity and options)
+        made while one is still running join that job instead of starting
+        another computation.
+        """
+        fn, args = self._job_call(body)
+        kind = body['type']
+        job, coalesced = self.server.jobs.submit(kind, (kind,) + args, fn, *args, total_steps=JOB_STEPS[kind])
+        status = dict(job.snapshot(), coalesced=coalesced,
+                      statusUrl=f'/jobs/{job.id}', eventsUrl=f'/jobs/{job.id}/events')
+        self._send_json(202, status, headers={'Location': status['statusUrl']})
+
+    def _stream_job_events(self, job):
+        """Server-sent events: one ``progress`` event per step, then ``done`` or ``failed``
+
+        Reconnecting clients resume after the ``Last-Event-ID`` they saw.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        last_id = self.headers.get('Last-Event-ID', '')
+        index = int(last_id) + 1 if last_id.isdigit() else 0
+        try:
+            while True:
+                events = job.wait_events(index, timeout=SSE_KEEPALIVE_S)
+                for event in events:
+                    final = event['state'] in ('done', 'failed')
+                    payload = job.snapshot() if final else event
+                    self.wfile.write(f"id: {index}\nevent: {event['state'] if final else 'progress'}\n"
+                                     f"data: {json.dumps(payload)}\n\n".encode())
+                    index += 1
+                if not events:
+                    if job.done:
+                        break
+                    self.wfile.write(b': keep-alive\n\n')
+                self.wfile.flush()
+                if job.done and index >= len(job.events):
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _run(self, fn, *args):
+        return self.server.pool.submit(fn, *args).result(timeout=self.server.request_timeout)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError('Request body too large')
+        raw = self.rfile.read(length) if length else b'{}'
+        try:
+            body = json.loads(raw or b'{}')
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON: {e}')
+        if not isinstance(body, dict):
+            raise ValueError('Request body must be a JSON object')
+        return body
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+class _WorkerServerMixin:
+    daemon_threads = True
+
+    def configure(self, pool, image_root, request_timeout, quiet, job_timeout=JOB_TIMEOUT_S):
+        self.pool = pool
+        self.jobs = JobManager(pool, pool.progress, job_timeout)
+        self.image_root = os.path.realpath(image_root)
+        self.request_timeout = request_timeout
+        self.quiet = quiet
+
+    def resolve_image(self, path):
+        """Resolve a requested base image, refusing paths outside image_root"""
+        if not path:
+            return os.path.join(self.image_root, 'mumbai_satellite.webp')
+        resolved = os.path.realpath(os.path.join(self.image_root, path.lstrip('/')))
+        if os.path.commonpath([resolved, self.image_root]) != self.image_root:
+            raise ValueError(f'Base image {path!r} is outside {self.image_root}')
+        return resolved
+
+class WorkerHTTPServer(_WorkerServerMixin, ThreadingHTTPServer):
+    """Threaded TCP server; handler threads only wait on the bounded pool"""
+
+class WorkerUnixServer(_WorkerServerMixin, ThreadingMixIn, UnixStreamServer):
+    """Threaded HTTP server listening on a Unix domain socket"""
+
+def create_server(pool, host='127.0.0.1', port=8765, unix_socket=None,
+                  image_root='public', request_timeout=120, quiet=False, job_timeout=JOB_TIMEOUT_S):
+    """Build a TCP or Unix-socket server bound to ``pool``, with a job manager for ``/jobs``"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = WorkerUnixServer(unix_socket, WorkerRequestHandler)
+    else:
+        server = WorkerHTTPServer((host, port), WorkerRequestHandler)
+    server.configure(pool, image_root, request_timeout, quiet, job_timeout)
+    return server
+
+def main():
+    """Long-lived flood inference worker"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='Pool size (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Requests allowed to wait for a worker (default: 4 x workers)')
+    parser.add_argument('--threads', action='store_true', help='Use a thread pool instead of processes')
+    parser.add_argument('--image-root', default='public', help='Directory base images are served from')
+    parser.add_argument('--cache-dir', help='Serve repeated requests from this overlay cache')
+    parser.add_argument('--cache-bytes', type=int, default=None, help='Cache size budget in bytes')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--job-timeout', type=float, default=JOB_TIMEOUT_S,
+                        help='Timeout in seconds for background jobs submitted to /jobs')
+    parser.add_argument('--quiet', action='store_true', help='Disable access logging')
+    args = parser.parse_args()
+
+    print("🛰️  Flood Inference Worker")
+    print("=" * 50)
+    print("1. Starting worker pool and loading pipeline modules...")
+    pool = BoundedWorkerPool(args.workers, args.queue_size, use_processes=not args.threads,
+                             cache_dir=args.cache_dir, cache_bytes=args.cache_bytes)
+    server = create_server(pool, args.host, args.port, args.unix_socket,
+                           args.image_root, args.timeout, args.quiet, args.job_timeout)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"2. Serving on {where} ({pool.workers} workers, queue {pool.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down...")
+    finally:
+        server.server_close()
+        server.jobs.shutdown()
+        pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import asyncio
+import re
+import threading
+import time
+import uuid
+
+# Finished jobs (and their results) stay available to polling clients this long
+JOB_RETENTION_S = 600
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+# The pipelines' numbered progress prints, e.g. "2. Running ML flood detection..."
+STEP_PATTERN = re.compile(r'^(\d+)\.\s+(.*?)\.*$')
+
+_job = threading.local()
+_progress_sink = None
+
+def set_progress_sink(sink):
+    """Queue this process publishes ``(job_id, event)`` progress tuples to"""
+    global _progress_sink
+    _progress_sink = sink
+
+def publish_progress(**event):
+    """Publish a progress event for the job running on this thread, if any"""
+    job_id = getattr(_job, 'id', None)
+    if job_id is not None and _progress_sink is not None:
+        _progress_sink.put((job_id, event))
+
+def report_output(text):
+    """Turn output printed on this thread into job progress; False if no job runs here
+
+    Lines such as ``3. Generating analysis report...`` printed while a job
+    runs are published as that job's current step. The worker's stdout
+    proxy routes each thread's writes here, so jobs never touch
+    ``sys.stdout`` itself.
+    """
+    if getattr(_job, 'id', None) is None:
+        return False
+    *lines, _job.buffer = (_job.buffer + text).split('\n')
+    for line in lines:
+        match = STEP_PATTERN.match(line.strip())
+        if match:
+            publish_progress(state='running', step=int(match.group(1)), message=match.group(2))
+    return True
+
+def run_job(job_id, fn, *args):
+    """Call ``fn(*args)`` as job ``job_id`` (in the worker), publishing its progress"""
+    _job.id, _job.buffer = job_id, ''
+    publish_progress(state='running', message='Started')
+    try:
+        return fn(*args)
+    finally:
+        _job.id = None
+
+class Job:
+    """One submitted pipeline call: its state, progress events and eventual result"""
+
+    def __init__(self, job_id, kind, key, total_steps=None):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.total_steps = total_steps
+        self.state = 'queued'
+        self.step = 0
+        self.message = 'Queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self._changed = threading.Condition()
+        self._record()
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed')
+
+    def update(self, **changes):
+        """Apply a progress or completion event; events after completion are dropped"""
+        with self._changed:
+            if self.done:
+                return
+            for name, value in changes.items():
+                setattr(self, name, value)
+            if self.done:
+                self.finished = time.time()
+            self._record()
+            self._changed.notify_all()
+
+    def _record(self):
+        self.events.append({
+            'state': self.state,
+            'step': self.step,
+            'totalSteps': self.total_steps,
+            'message': self.message,
+            'elapsed': round(time.time() - self.created, 3),
+        })
+
+    def snapshot(self):
+        """JSON-ready status, with the result once the job is done"""
+        with self._changed:
+            status = {
+                'jobId': self.id,
+                'type': self.kind,
+                'state': self.state,
+                'step': self.step,
+                'totalSteps': self.total_steps,
+                'message': self.message,
+                'elapsed': round((self.finished or time.time()) - self.created, 3),
+            }
+            if self.state == 'done':
+                status['result'] = self.result
+            if self.error is not None:
+                status['error'] = self.error
+            return status
+
+    def wait_events(self, start, timeout=None):
+        """Events from index ``start`` on, waiting up to ``timeout`` seconds for a new one"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > start or self.done, timeout)
+            return self.events[start:]
+
+class JobManager:
+    """Pipeline calls run as background jobs, driven by an asyncio loop on its own thread
+
+    ``submit`` hands the call to the worker pool and returns a :class:`Job`
+    at once; a coroutine on the loop awaits the pool future, applies the
+    timeout and records the outcome, and finished jobs are forgotten after
+    ``retention`` seconds. A call whose key matches a job still in flight
+    is not run again: the caller joins the existing job. Progress the
+    workers publish (see :func:`run_job`) is drained from ``progress``.
+    """
+
+    def __init__(self, pool, progress, timeout=None, retention=JOB_RETENTION_S):
+        self.pool = pool
+        self.timeout = timeout
+        self.retention = retention
+        self.submitted = 0
+        self.coalesced = 0
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._progress = progress
+        self._loop = asyncio.new_event_loop()
+        self._threads = [
+            threading.Thread(target=self._loop.run_forever, name='job-loop', daemon=True),
+            threading.Thread(target=self._drain_progress, name='job-progress', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind, key, fn, *args, total_steps=None):
+        """Start ``fn(*args)`` as a job, or join the in-flight job with the same ``key``
+
+        Returns ``(job, coalesced)``. Errors from the pool's ``submit`` (such
+        as a full queue) propagate without creating a job.
+        """
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                self.coalesced += 1
+                return self._jobs[job_id], True
+            job = Job(uuid.uuid4().hex, kind, key, total_steps)
+            future = self.pool.submit(run_job, job.id, fn, *args)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+            self.submitted += 1
+        asyncio.run_coroutine_threadsafe(self._finish(job, future), self._loop)
+        return job, False
+
+    async def _finish(self, job, future):
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            job.update(state='failed', message='Failed', error=f'Timed out after {self.timeout}s')
+        except Exception as e:
+            job.update(state='failed', message='Failed', error=f'Processing failed: {e}')
+        else:
+            job.update(state='done', message='Done', result=result)
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) == job.id:
+                    del self._in_flight[job.key]
+            self._loop.call_later(self.retention, self._forget, job.id)
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _drain_progress(self):
+        while True:
+            item = self._progress.get()
+            if item is None:
+                return
+            job_id, event = item
+            job = self.get(job_id)
+            if job is not None:
+                job.update(**event)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'jobs': len(self._jobs),
+                'in_flight': len(self._in_flight),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+            }
+
+    def shutdown(self):
+        """Stop the loop and the progress thread (the pool is shut down separately)"""
+        self._progress.put(None)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        for thread in self._threads:
+            thread.join()
+        self._loop.close()
@@ -0,0 +1,162 @@
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction runs unlocked
+    fcntl = None
+
+DEFAULT_CACHE_DIR = '.cache/flood'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+ORPHAN_GRACE_SECONDS = 300
+
+_file_digests = {}
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, memoized on (path, size, mtime)"""
+    st = os.stat(path)
+    memo_key = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = _file_digests[memo_key] = h.hexdigest()
+    return digest
+
+class OverlayCache:
+    """Content-addressed on-disk cache of rendered overlays and their reports
+
+    An entry is a set of ``<key>.<name>`` artifact files plus a ``<key>.json``
+    manifest holding the report. Artifacts are written first and the
+    manifest last, each via temp file + rename, so an entry is visible only
+    once complete. Hits refresh the manifest mtime, which eviction uses as
+    the LRU clock; eviction holds an exclusive lock so concurrent worker
+    processes do not race each other while trimming to ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(base_image=None, severity=None, seed=None, version=None, **extra):
+        """Hash of base image bytes, severity, seed, parameter version and extras"""
+        parts = {
+            'base_image': file_digest(base_image) if base_image and os.path.exists(base_image) else base_image,
+            'severity': severity,
+            'seed': seed,
+            'version': version,
+            **extra,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key, name='json'):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.{name}')
+
+    def get(self, key):
+        """Return ``(files, report)`` for a complete entry, or None on a miss"""
+        manifest_path = self._path(key)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            files = {}
+            for name in manifest['files']:
+                with open(self._path(key, name), 'rb') as f:
+                    files[name] = f.read()
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(manifest_path)
+        return files, manifest['report']
+
+    def put(self, key, files, report, evict=True):
+        """Store named artifact bytes plus the report, then trim to budget
+
+        Callers storing many small entries in a row can pass ``evict=False``
+        and call :meth:`evict` once at the end.
+        """
+        for name, data in files.items():
+            atomic_write_bytes(data, self._path(key, name))
+        atomic_write_json({
+            'files': sorted(files),
+            'report': report,
+            'bytes': sum(len(d) for d in files.values()),
+            'created': time.time(),
+        }, self._path(key), indent=None)
+        if evict:
+            self.evict()
+
+    def _entries(self):
+        """Return (last_access, total_bytes, paths) for every evictable entry
+
+        Artifacts without a manifest belong to a put still in progress and
+        are skipped until they are older than ORPHAN_GRACE_SECONDS, after
+        which they are treated as leftovers from a crashed writer.
+        """
+        groups = {}
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.'):
+                    continue  # in-flight temp file
+                key, _, name = entry.name.partition('.')
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                group = groups.setdefault(key, {'access': None, 'newest': 0.0, 'bytes': 0, 'paths': []})
+                group['bytes'] += st.st_size
+                group['paths'].append(entry.path)
+                group['newest'] = max(group['newest'], st.st_mtime)
+                if name == 'json':
+                    group['access'] = st.st_mtime
+
+        entries = []
+        orphan_cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for group in groups.values():
+            if group['access'] is None:
+                if group['newest'] > orphan_cutoff:
+                    continue
+                group['access'] = 0.0
+            entries.append((group['access'], group['bytes'], group['paths']))
+        return entries
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def evict(self):
+        """Delete least recently used entries until under ``max_bytes``"""
+        with self._lock():
+            entries = sorted(self._entries(), key=lambda e: e[0])
+            total = sum(size for _, size, _ in entries)
+            for _, size, paths in entries:
+                if total <= self.max_bytes:
+                    break
+                # Manifest first so readers stop seeing the entry immediately
+                for path in sorted(paths, key=lambda p: not p.endswith('.json')):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                total -= size
+        return total
+
+    def stats(self):
+        entries = self._entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes}
@@ -0,0 +1,195 @@
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # bands -> PNG colour type (L, LA, RGB, RGBA)
+
+def write_chunk(f, chunk_type, data=b''):
+    """Write a single length-prefixed, CRC-terminated PNG chunk"""
+    f.write(struct.pack('>I', len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+class StreamingPNGWriter:
+    """Write an 8-bit PNG one band of rows at a time
+
+    Rows are deflated as they arrive, so only the current band (plus zlib's
+    window) is ever held in memory regardless of the final image height.
+    """
+
+    def __init__(self, path, width, height, bands=4, compress_level=6, idat_size=1 << 20):
+        if bands not in COLOR_TYPES:
+            raise ValueError(f"Unsupported band count: {bands}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.bands = bands
+        self.rows_written = 0
+        self.idat_size = idat_size
+        self._pending = []
+        self._pending_size = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        write_chunk(self._file, b'IHDR', struct.pack(
+            '>IIBBBBB', width, height, 8, COLOR_TYPES[bands], 0, 0, 0))
+
+    def write_rows(self, rows):
+        """Append an (n, width, bands) uint8 array of scanlines"""
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.ndim == 2:
+            rows = rows[..., None]
+        n = rows.shape[0]
+        if rows.shape[1:] != (self.width, self.bands):
+            raise ValueError(f"Expected rows of shape (n, {self.width}, {self.bands}), got {rows.shape}")
+        if self.rows_written + n > self.height:
+            raise ValueError("More rows written than declared image height")
+
+        # Filter type 0 (None) prefix byte on every scanline
+        filtered = np.zeros((n, self.width * self.bands + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows.reshape(n, -1)
+        self._emit(self._compressor.compress(filtered.tobytes()))
+        self.rows_written += n
+
+    def _emit(self, data):
+        if not data:
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= self.idat_size:
+            self._flush_idat()
+
+    def _flush_idat(self):
+        if self._pending:
+            write_chunk(self._file, b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def close(self):
+        """Finish the zlib stream and write the trailing chunks"""
+        if self._file is None:
+            return
+        if self.rows_written != self.height:
+            self._file.close()
+            self._file = None
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written")
+        self._emit(self._compressor.flush())
+        self._flush_idat()
+        write_chunk(self._file, b'IEND')
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+
+def deflate_rows(rows, compress_level=6):
+    """One complete zlib stream of (n, width, bands) uint8 scanlines, filter type None"""
+    rows = np.asarray(rows, dtype=np.uint8)
+    if rows.ndim == 2:
+        rows = rows[..., None]
+    filtered = np.zeros((rows.shape[0], rows.shape[1] * rows.shape[2] + 1), dtype=np.uint8)
+    filtered[:, 1:] = rows.reshape(rows.shape[0], -1)
+    return zlib.compress(filtered.tobytes(), compress_level)
+
+class StreamingAPNGWriter:
+    """Write an animated PNG one frame at a time
+
+    The frame count is declared up front in ``acTL``, so every frame is
+    written as soon as it arrives and nothing accumulates across frames.
+    Frames after the first may cover only a sub-rectangle of the canvas
+    (the region that changed); the rest of the previous frame is kept.
+    Frames can be deflated elsewhere (e.g. on worker threads) with
+    :func:`deflate_rows` and handed over as bytes.
+    """
+
+    def __init__(self, path, width, height, frames, bands=4, delay_ms=500, plays=0,
+                 compress_level=6, idat_size=1 << 20):
+        if bands not in COLOR_TYPES:
+            raise ValueError(f"Unsupported band count: {bands}")
+        if frames < 1:
+            raise ValueError("An animation needs at least one frame")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.bands = bands
+        self.delay_ms = delay_ms
+        self.compress_level = compress_level
+        self.idat_size = idat_size
+        self.frames_written = 0
+        self._sequence = 0
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        write_chunk(self._file, b'IHDR', struct.pack(
+            '>IIBBBBB', width, height, 8, COLOR_TYPES[bands], 0, 0, 0))
+        write_chunk(self._file, b'acTL', struct.pack('>II', frames, plays))
+
+    def write_frame(self, pixels, offset=(0, 0)):
+        """Append an (h, w, bands) uint8 frame placed at ``offset`` (x, y) on the canvas"""
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        if pixels.ndim == 2:
+            pixels = pixels[..., None]
+        if pixels.shape[2] != self.bands:
+            raise ValueError(f"Expected {self.bands} bands, got {pixels.shape[2]}")
+        box = (offset[0], offset[1], offset[0] + pixels.shape[1], offset[1] + pixels.shape[0])
+        self.write_deflated(deflate_rows(pixels, self.compress_level), box)
+
+    def write_deflated(self, data, box=None):
+        """Append a frame already deflated by :func:`deflate_rows`, covering ``box`` (x0, y0, x1, y1)"""
+        x0, y0, x1, y1 = box or (0, 0, self.width, self.height)
+        if self.frames_written == self.frames:
+            raise ValueError("More frames written than declared in acTL")
+        if not (0 <= x0 < x1 <= self.width and 0 <= y0 < y1 <= self.height):
+            raise ValueError(f"Frame box {(x0, y0, x1, y1)} is outside the {self.width}x{self.height} canvas")
+        if self.frames_written == 0 and (x0, y0, x1, y1) != (0, 0, self.width, self.height):
+            raise ValueError("The first frame must cover the whole canvas")
+
+        # Dispose none, blend source: the frame replaces its rectangle and the
+        # rest of the canvas carries over from the previous frame
+        write_chunk(self._file, b'fcTL', struct.pack(
+            '>IIIIIHHBB', self._next_sequence(), x1 - x0, y1 - y0, x0, y0,
+            self.delay_ms, 1000, 0, 0))
+        for start in range(0, len(data), self.idat_size):
+            piece = data[start:start + self.idat_size]
+            if self.frames_written == 0:
+                write_chunk(self._file, b'IDAT', piece)
+            else:
+                write_chunk(self._file, b'fdAT', struct.pack('>I', self._next_sequence()) + piece)
+        self.frames_written += 1
+
+    def _next_sequence(self):
+        sequence = self._sequence
+        self._sequence += 1
+        return sequence
+
+    def close(self):
+        """Write the trailing chunk once every declared frame is in"""
+        if self._file is None:
+            return
+        if self.frames_written != self.frames:
+            self._file.close()
+            self._file = None
+            raise ValueError(f"Only {self.frames_written} of {self.frames} frames were written")
+        write_chunk(self._file, b'IEND')
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
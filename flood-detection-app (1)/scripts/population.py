@@ -0,0 +1,219 @@
+import numpy as np
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from atomic_io import atomic_output
+from georef import cell_area_km2, pixel_area_km2, scene_bounds
+from raster_io import open_raster
+
+DEFAULT_GRID_CACHE_DIR = '.cache/population'
+# Resampled scene grids kept in memory (LRU); older ones reload from the .npz cache
+SCENE_GRID_ENTRIES = 4
+
+# GeoTIFF tags for north-up EPSG:4326 rasters (WorldPop, GPW and friends)
+MODEL_PIXEL_SCALE_TAG = 33550
+MODEL_TIEPOINT_TAG = 33922
+GDAL_NODATA_TAG = 42113
+
+class PopulationRaster:
+    """Population raster georeferenced in lat/lng degrees
+
+    ``.npy`` rasters are memory-mapped and take their bounds from a
+    ``<name>.json`` sidecar (``{"bounds": [west, south, east, north]}``, plus
+    optional ``units`` and ``nodata``). GeoTIFFs use their tiepoint and
+    pixel-scale tags and are memory-mapped when stored uncompressed. Values
+    are people/km² (``units='density'``) or people per cell (``'count'``).
+    """
+
+    def __init__(self, path, units=None):
+        self.path = path
+        sidecar = os.path.splitext(path)[0] + '.json'
+        meta = {}
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                meta = json.load(f)
+
+        if path.endswith('.npy'):
+            self.array = np.load(path, mmap_mode='r')
+            bounds = meta['bounds']
+            self.nodata = meta.get('nodata')
+        else:
+            self.array, bounds, self.nodata = self._open_geotiff(path)
+            self.nodata = meta.get('nodata', self.nodata)
+
+        self.units = units or meta.get('units', 'density')
+        if self.units not in ('density', 'count'):
+            raise ValueError(f"Unknown population units {self.units!r}")
+        self.height, self.width = self.array.shape[:2]
+        self.bounds = tuple(float(b) for b in bounds)
+        west, south, east, north = self.bounds
+        self.res_x = (east - west) / self.width
+        self.res_y = (north - south) / self.height
+
+    def _open_geotiff(self, path):
+        raster = open_raster(path)
+        tags = raster.tags
+        if MODEL_PIXEL_SCALE_TAG not in tags or MODEL_TIEPOINT_TAG not in tags:
+            raise ValueError(f"{path} has no GeoTIFF tiepoint/pixel-scale tags")
+        scale_x, scale_y = tags[MODEL_PIXEL_SCALE_TAG][:2]
+        i, j, _, x, y = tags[MODEL_TIEPOINT_TAG][:5]
+        west, north = x - i * scale_x, y + j * scale_y
+        bounds = (west, north - raster.height * scale_y, west + raster.width * scale_x, north)
+        nodata = tags.get(GDAL_NODATA_TAG)
+        if nodata is not None:
+            nodata = float(str(nodata).strip('\x00 '))
+        # Uncompressed strips and tiles come back as a view of the file
+        return raster.read(0), bounds, nodata
+
+class ScenePopulation:
+    """A population raster resampled onto a scene's pixel grid
+
+    Nearest-neighbour resampling of a north-up raster onto a north-up scene
+    is separable, so the warp is kept as one source row per scene row and
+    one source column per scene column over a cropped density window. Tiles
+    of people-per-pixel are expanded on demand; no scene-sized grid is ever
+    materialised, which keeps the cached form a few kilobytes.
+    """
+
+    def __init__(self, density, rows, cols, pixel_km2):
+        self.density = density
+        self.rows = rows
+        self.cols = cols
+        self.pixel_km2 = pixel_km2
+
+    def read(self, box=None):
+        """People per scene pixel inside ``box`` (x0, y0, x1, y1) as float32"""
+        x0, y0, x1, y1 = box or (0, 0, len(self.cols), len(self.rows))
+        people = self.density[np.ix_(self.rows[y0:y1], self.cols[x0:x1])]
+        people *= np.float32(self.pixel_km2)
+        return people
+
+    def save(self, path):
+        with atomic_output(path) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, density=self.density, rows=self.rows, cols=self.cols,
+                         pixel_km2=np.float64(self.pixel_km2))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['density'], data['rows'], data['cols'], float(data['pixel_km2']))
+
+def resample_to_scene(raster, bounds, width, height, gsd_m):
+    """Warp ``raster`` onto a width x height scene covering ``bounds``
+
+    Only the raster window under the scene is read from disk.
+    """
+    west, south, east, north = bounds
+    xs = west + (np.arange(width) + 0.5) * ((east - west) / width)
+    ys = north - (np.arange(height) + 0.5) * ((north - south) / height)
+    cols = np.floor((xs - raster.bounds[0]) / raster.res_x).astype(np.int64)
+    rows = np.floor((raster.bounds[3] - ys) / raster.res_y).astype(np.int64)
+    col_ok = (cols >= 0) & (cols < raster.width)
+    row_ok = (rows >= 0) & (rows < raster.height)
+
+    if col_ok.any() and row_ok.any():
+        c0, c1 = int(cols[col_ok].min()), int(cols[col_ok].max()) + 1
+        r0, r1 = int(rows[row_ok].min()), int(rows[row_ok].max()) + 1
+        window = np.array(raster.array[r0:r1, c0:c1], dtype=np.float32)
+        invalid = ~np.isfinite(window) | (window < 0)
+        if raster.nodata is not None:
+            invalid |= window == np.float32(raster.nodata)
+        window[invalid] = 0
+        if raster.units == 'count':
+            lats = raster.bounds[3] - (np.arange(r0, r1) + 0.5) * raster.res_y
+            areas = np.array([cell_area_km2(lat, raster.res_x, raster.res_y) for lat in lats])
+            window /= areas.astype(np.float32)[:, None]
+    else:
+        c0 = r0 = 0
+        window = np.zeros((0, 0), dtype=np.float32)
+
+    # One trailing zero row/column catches scene pixels outside the raster
+    h, w = window.shape
+    density = np.zeros((h + 1, w + 1), dtype=np.float32)
+    density[:h, :w] = window
+    rows = np.where(row_ok, rows - r0, h).astype(np.int32)
+    cols = np.where(col_ok, cols - c0, w).astype(np.int32)
+    return ScenePopulation(density, rows, cols, pixel_area_km2(gsd_m))
+
+def population_fingerprint(raster_path):
+    """Cheap identity of a raster file for cache keys (None when unset)"""
+    if not raster_path:
+        return None
+    st = os.stat(raster_path)
+    return [os.path.realpath(raster_path), st.st_size, st.st_mtime_ns]
+
+_scene_grids = OrderedDict()
+_scene_grid_lock = threading.Lock()
+
+def scene_population(raster_path, lat, lng, width, height, gsd_m,
+                     cache_dir=DEFAULT_GRID_CACHE_DIR, units=None):
+    """Population on the grid of a scene centred on lat/lng, cached per extent
+
+    The last :data:`SCENE_GRID_ENTRIES` grids are memoized in-process and
+    every grid is stored under ``cache_dir`` keyed on the raster file, scene
+    extent and resolution, so repeated runs over the same city neither
+    reload nor re-warp the raster.
+    """
+    bounds = scene_bounds(lat, lng, width, height, gsd_m)
+    key = hashlib.sha256(json.dumps([
+        population_fingerprint(raster_path), units,
+        [round(b, 9) for b in bounds], width, height, gsd_m,
+    ]).encode()).hexdigest()
+
+    with _scene_grid_lock:
+        grid = _scene_grids.get(key)
+        if grid is not None:
+            _scene_grids.move_to_end(key)
+            return grid
+    path = os.path.join(cache_dir, f'{key}.npz') if cache_dir else None
+    if path and os.path.exists(path):
+        grid = ScenePopulation.load(path)
+    else:
+        grid = resample_to_scene(PopulationRaster(raster_path, units), bounds, width, height, gsd_m)
+        if path:
+            grid.save(path)
+    with _scene_grid_lock:
+        _scene_grids[key] = grid
+        while len(_scene_grids) > SCENE_GRID_ENTRIES:
+            _scene_grids.popitem(last=False)
+    return grid
+
+def location_population(raster_path, location, width, height, gsd_m, cache_dir=DEFAULT_GRID_CACHE_DIR):
+    """:func:`scene_population` for a "City, State" location, or None if unknown"""
+    from india_flood_simulation import get_city_info
+    city = get_city_info(location)
+    if city is None:
+        print(f"⚠️  No coordinates for {location}; using constant population density")
+        return None
+    return scene_population(raster_path, city['lat'], city['lng'], width, height, gsd_m, cache_dir)
+
+def main():
+    """Resample a population raster onto a city scene and report its total"""
+    from india_flood_simulation import get_city_info
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('raster', help='Population GeoTIFF or .npy with a .json bounds sidecar')
+    parser.add_argument('--location', default='Mumbai, Maharashtra')
+    parser.add_argument('--size', default='1600x900', help='Scene WIDTHxHEIGHT')
+    parser.add_argument('--gsd', type=float, default=10.0, help='Ground sampling distance (m/pixel)')
+    parser.add_argument('--units', choices=['density', 'count'], default=None)
+    parser.add_argument('--cache-dir', default=DEFAULT_GRID_CACHE_DIR)
+    args = parser.parse_args()
+
+    city = get_city_info(args.location)
+    if city is None:
+        parser.error(f"Unknown location {args.location!r}")
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    grid = scene_population(args.raster, city['lat'], city['lng'], width, height, args.gsd,
+                            args.cache_dir, args.units)
+    total = float(grid.read().sum(dtype=np.float64))
+    print(f"📍 {args.location}: {width}x{height} px at {args.gsd} m/px")
+    print(f"👥 Population in scene: {int(round(total)):,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+from PIL import Image
+import numpy as np
+import argparse
+import os
+import re
+
+# PIL raw modes we can map straight onto the file bytes: (dtype, bands, band order)
+RAW_LAYOUTS = {
+    'L': ('u1', 1, None), 'RGB': ('u1', 3, None), 'RGBA': ('u1', 4, None),
+    'RGBX': ('u1', 4, [0, 1, 2]), 'BGR': ('u1', 3, [2, 1, 0]),
+    'BGRA': ('u1', 4, [2, 1, 0, 3]), 'BGRX': ('u1', 4, [2, 1, 0]),
+    'I;16': ('<u2', 1, None), 'I;16B': ('>u2', 1, None), 'I;16N': ('=u2', 1, None),
+    'I;16S': ('<i2', 1, None), 'I;16BS': ('>i2', 1, None),
+    'I;32S': ('<i4', 1, None), 'I;32BS': ('>i4', 1, None),
+    'F;32F': ('<f4', 1, None), 'F;32BF': ('>f4', 1, None), 'F;64F': ('<f8', 1, None),
+    'RGB;16L': ('<u2', 3, None), 'RGB;16B': ('>u2', 3, None), 'RGB;16N': ('=u2', 3, None),
+    'RGBA;16L': ('<u2', 4, None), 'RGBA;16B': ('>u2', 4, None), 'RGBA;16N': ('=u2', 4, None),
+}
+
+# PIL modes whose pixels numpy can take as they are when a file must be decoded
+ARRAY_MODES = ('L', 'RGB', 'RGBA', 'I;16', 'I;16B', 'I;16L', 'I', 'F')
+
+# ENVI "data type" codes
+ENVI_DTYPES = {1: 'u1', 2: 'i2', 3: 'i4', 4: 'f4', 5: 'f8', 12: 'u2', 13: 'u4', 14: 'i8', 15: 'u8'}
+ENVI_DATA_EXTENSIONS = ('', '.img', '.dat', '.bin', '.raw', '.bsq', '.bil', '.bip')
+
+# Files read through this layer rather than PIL
+RASTER_EXTENSIONS = ('.npy', '.hdr') + ENVI_DATA_EXTENSIONS[1:]
+
+# TIFF ExtraSamples tag and its associated/unassociated alpha values
+TIFF_EXTRA_SAMPLES = 338
+TIFF_ALPHA_SAMPLES = (1, 2)
+# Non-8-bit bands are stretched for display between these percentiles of
+# about this many samples spread over the whole raster
+DISPLAY_PERCENTILES = (2, 98)
+DISPLAY_SAMPLES = 1_000_000
+
+class Raster:
+    """Multi-band raster read window by window, without decoding all of it
+
+    ``.npy`` stacks, ENVI/raw binaries and uncompressed TIFF strips or tiles
+    (8/16/32-bit, any band count PIL understands) are memory-mapped; other
+    files fall back to a one-off full decode. Pixels are held as segments:
+    ``(box, array, order)`` with ``array`` a (rows, cols, bands) view of the
+    file and ``order`` the logical-to-stored band order (None = as stored).
+    ``alpha`` is the index of the band the format marks as alpha, if any.
+    """
+
+    def __init__(self, path, segments, width, height, count, dtype, band_names=None, tags=None,
+                 mapped=True, alpha=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.count = count
+        self.dtype = np.dtype(dtype)
+        self.band_names = list(band_names) if band_names else None
+        self.tags = tags or {}
+        self.mapped = mapped
+        self.alpha = alpha
+        self._segments = segments
+        self._limits = {}
+
+    @property
+    def shape(self):
+        return self.height, self.width, self.count
+
+    @property
+    def zero_copy(self):
+        """True when whole-raster reads are views of the file"""
+        return self.mapped and len(self._segments) == 1 and self._segments[0][2] is None
+
+    def band_index(self, band):
+        """Position of a band given by index or by name"""
+        if isinstance(band, str):
+            names = [name.lower() for name in self.band_names or ()]
+            if band.lower() not in names:
+                raise KeyError(f"{self.path} has no band named {band!r}")
+            return names.index(band.lower())
+        if not -self.count <= band < self.count:
+            raise IndexError(f"Band {band} out of range for {self.count} bands")
+        return band % self.count
+
+    def _stored(self, band, order):
+        """Stored band selector for ``band`` (None, index/name or list) in one segment"""
+        if band is None:
+            return slice(None) if order is None else list(order)
+        if isinstance(band, (list, tuple)):
+            bands = [self.band_index(b) for b in band]
+            if order is None and bands == list(range(bands[0], bands[-1] + 1)):
+                return slice(bands[0], bands[-1] + 1)
+            return [b if order is None else order[b] for b in bands]
+        b = self.band_index(band)
+        return b if order is None else order[b]
+
+    def read(self, band=None, window=None):
+        """Pixels of ``band`` inside ``window`` (x0, y0, x1, y1)
+
+        ``band`` is an index or name (returns rows x cols), a list of them,
+        or None for every band (rows x cols x bands). Windows inside one
+        memory-mapped segment come back as read-only views of the file;
+        anything else is assembled into a new array.
+        """
+        x0, y0, x1, y1 = window or (0, 0, self.width, self.height)
+        if not (0 <= x0 <= x1 <= self.width and 0 <= y0 <= y1 <= self.height):
+            raise ValueError(f"Window {window} outside the {self.width}x{self.height} raster")
+
+        out = None
+        for (sx0, sy0, sx1, sy1), array, order in self._segments:
+            ix0, iy0 = max(x0, sx0), max(y0, sy0)
+            ix1, iy1 = min(x1, sx1), min(y1, sy1)
+            if ix0 >= ix1 or iy0 >= iy1:
+                continue
+            src = array[iy0 - sy0:iy1 - sy0, ix0 - sx0:ix1 - sx0][..., self._stored(band, order)]
+            if (ix0, iy0, ix1, iy1) == (x0, y0, x1, y1):
+                return src
+            if out is None:
+                out = np.zeros((y1 - y0, x1 - x0) + src.shape[2:], dtype=src.dtype)
+            out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = src
+        if out is None:
+            bands = () if isinstance(band, (int, str)) else (
+                len(band) if band is not None else self.count,)
+            out = np.zeros((y1 - y0, x1 - x0) + bands, dtype=self.dtype)
+        return out
+
+    def display_limits(self, band):
+        """(low, high) sample values of ``band`` stretched to 0 and 255 for display
+
+        Percentiles of a subsample of the whole raster, cached, so every
+        window of it is stretched alike.
+        """
+        b = self.band_index(band)
+        if b not in self._limits:
+            step = max(1, int(np.sqrt(self.width * self.height / DISPLAY_SAMPLES)))
+            samples = np.concatenate([array[::step, ::step][..., self._stored(b, order)].ravel()
+                                      for _, array, order in self._segments])
+            self._limits[b] = stretch_limits(samples)
+        return self._limits[b]
+
+    def read_rgba(self, window=None, bands=None):
+        """8-bit RGBA pixels of ``window`` for display and compositing
+
+        ``bands`` picks the red, green and blue (and optionally alpha)
+        bands; by default the first three, plus :attr:`alpha` when the file
+        marks one. Single-band rasters become gray and a missing blue band
+        stays 0. Non-8-bit colour bands are stretched with
+        :meth:`display_limits`; an alpha band is scaled from its type's range.
+        """
+        if bands is None:
+            bands = [b for b in range(self.count) if b != self.alpha][:3]
+            if self.alpha is not None:
+                bands.append(self.alpha)
+        colour, alpha = list(bands[:3]), (bands[3] if len(bands) > 3 else None)
+        limits = None if self.dtype == np.uint8 else [self.display_limits(b) for b in colour]
+        pixels = to_uint8(self.read(colour, window), limits)
+        rgba = np.zeros(pixels.shape[:2] + (4,), dtype=np.uint8)
+        if pixels.shape[2] == 1:
+            rgba[..., :3] = pixels
+        else:
+            rgba[..., :pixels.shape[2]] = pixels
+        if alpha is None:
+            rgba[..., 3] = 255
+        else:
+            rgba[..., 3] = to_uint8(self.read(alpha, window), [type_limits(self.dtype)])
+        return rgba
+
+def type_limits(dtype):
+    """Full sample range of ``dtype``: its integer limits, or 0-1 for floats"""
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'ui':
+        return float(np.iinfo(dtype).min), float(np.iinfo(dtype).max)
+    return 0.0, 1.0
+
+def stretch_limits(samples):
+    """Display (low, high) for one band's samples: their 2nd and 98th percentiles"""
+    samples = samples[np.isfinite(samples)] if samples.dtype.kind == 'f' else samples
+    if not samples.size:
+        return type_limits(samples.dtype)
+    low, high = (float(v) for v in np.percentile(samples, DISPLAY_PERCENTILES))
+    if high <= low:
+        # A flat band keeps its level against 0 (and reflectance 1 for floats)
+        low, high = min(low, 0.0), max(high, 1.0 if samples.dtype.kind == 'f' else 0.0)
+        if high <= low:
+            high = low + 1.0
+    return low, high
+
+def to_uint8(pixels, limits=None):
+    """Stretch samples linearly to 8 bits; uint8 pixels are returned as they are
+
+    ``limits`` holds each band's (low, high), mapped to 0 and 255; by default
+    :func:`stretch_limits` of ``pixels`` themselves. ``pixels`` are
+    (rows, cols) for one band or (rows, cols, bands).
+    """
+    if pixels.dtype == np.uint8:
+        return pixels
+    bands = pixels.reshape(pixels.shape[:2] + (-1,))
+    if limits is None:
+        limits = [stretch_limits(bands[..., b].ravel()) for b in range(bands.shape[2])]
+    low, high = np.asarray(limits, dtype=np.float32).T
+    scaled = (bands.astype(np.float32) - low) * (255.0 / (high - low))
+    np.nan_to_num(scaled, copy=False, nan=0.0)
+    np.clip(scaled, 0, 255, out=scaled)
+    np.rint(scaled, out=scaled)
+    return scaled.astype(np.uint8).reshape(pixels.shape)
+
+def _file_view(mm, offset, shape, strides, dtype):
+    """Strided view of a file-wide byte memmap; no data is copied"""
+    return np.ndarray(shape, dtype=dtype, buffer=mm, offset=offset, strides=strides)
+
+def open_npy(path):
+    array = np.load(path, mmap_mode='r')
+    if array.ndim == 2:
+        array = array[..., None]
+    height, width, count = array.shape
+    return Raster(path, [((0, 0, width, height), array, None)], width, height, count, array.dtype)
+
+def open_raw(path, width, height, count=1, dtype='u1', interleave='bip', offset=0, band_names=None):
+    """Memory-map a headerless binary raster
+
+    ``interleave`` is ``bip`` (band-interleaved by pixel), ``bil`` (by line)
+    or ``bsq`` (band sequential); every layout reads back as (rows, cols,
+    bands) views.
+    """
+    dtype = np.dtype(dtype)
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    size = dtype.itemsize
+    if interleave == 'bip':
+        shape, strides = (height, width, count), (width * count * size, count * size, size)
+    elif interleave == 'bil':
+        shape, strides = (height, width, count), (width * count * size, size, width * size)
+    elif interleave == 'bsq':
+        shape, strides = (height, width, count), (width * size, size, width * height * size)
+    else:
+        raise ValueError(f"Unknown interleave {interleave!r}; use bip, bil or bsq")
+    if offset + width * height * count * size > len(mm):
+        raise ValueError(f"{path} is smaller than a {width}x{height}x{count} {dtype} raster")
+    array = _file_view(mm, offset, shape, strides, dtype)
+    return Raster(path, [((0, 0, width, height), array, None)], width, height, count, dtype, band_names)
+
+def read_envi_header(path):
+    """Fields of an ENVI ``.hdr`` file; ``{...}`` lists become Python lists"""
+    with open(path) as f:
+        text = f.read()
+    if not text.lstrip().startswith('ENVI'):
+        raise ValueError(f"{path} is not an ENVI header")
+    fields = {}
+    for key, value in re.findall(r'^\s*([^=\n]+?)\s*=\s*(\{[^}]*\}|[^\n]*)', text, re.M):
+        value = value.strip()
+        if value.startswith('{'):
+            value = [item.strip() for item in value[1:-1].split(',') if item.strip()]
+        fields[key.lower()] = value
+    return fields
+
+def _envi_paths(path):
+    """(header, data) paths for either half of an ENVI pair, or None"""
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == '.hdr':
+        for data_ext in ENVI_DATA_EXTENSIONS:
+            if os.path.exists(stem + data_ext):
+                return path, stem + data_ext
+        raise FileNotFoundError(f"No data file next to {path}")
+    for header in (stem + '.hdr', path + '.hdr'):
+        if os.path.exists(header):
+            return header, path
+    return None
+
+def open_envi(header_path, data_path):
+    fields = read_envi_header(header_path)
+    dtype = np.dtype(ENVI_DTYPES[int(fields['data type'])])
+    if dtype.itemsize > 1:
+        dtype = dtype.newbyteorder('>' if int(fields.get('byte order', 0)) else '<')
+    raster = open_raw(data_path, int(fields['samples']), int(fields['lines']), int(fields.get('bands', 1)),
+                      dtype, fields.get('interleave', 'bsq').lower(), int(fields.get('header offset', 0)),
+                      fields.get('band names'))
+    names = [name.lower() for name in raster.band_names or ()]
+    if 'alpha' in names:
+        raster.alpha = names.index('alpha')
+    return raster
+
+def _map_raw_tiles(path, img):
+    """Segments for uncompressed TIFF/PPM/BMP strips and tiles, or None"""
+    if not img.tile:
+        return None
+    layout = None
+    blocks = []
+    for tile in img.tile:
+        decoder, extents, offset, args = tile[:4]
+        rawmode = args[0] if isinstance(args, tuple) else args
+        if decoder != 'raw' or rawmode not in RAW_LAYOUTS or layout not in (None, RAW_LAYOUTS[rawmode]):
+            return None
+        layout = RAW_LAYOUTS[rawmode]
+        stride = args[1] if isinstance(args, tuple) and len(args) > 1 else 0
+        orientation = args[2] if isinstance(args, tuple) and len(args) > 2 else 1
+        blocks.append((extents, offset, stride, orientation))
+
+    dtype, bands, order = layout
+    dtype = np.dtype(dtype)
+    pixel = bands * dtype.itemsize
+    x0, y0, x1, _ = blocks[0][0]
+    row_bytes = blocks[0][2] or (x1 - x0) * pixel
+    # Full-width strips stored back to back map as one segment, so whole-band
+    # reads of a striped TIFF stay views of the file
+    if all((bx0, bx1) == (x0, x1) and orient > 0 and (stride or (x1 - x0) * pixel) == row_bytes
+           and offset == blocks[0][1] + (by0 - y0) * row_bytes
+           for (bx0, by0, bx1, _), offset, stride, orient in blocks):
+        blocks = [((x0, y0, x1, blocks[-1][0][3]), blocks[0][1], row_bytes, 1)]
+
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    segments = []
+    for (bx0, by0, bx1, by1), offset, stride, orientation in blocks:
+        w, h = bx1 - bx0, by1 - by0
+        stride = stride or w * pixel
+        if offset + (h - 1) * stride + w * pixel > len(mm):
+            return None
+        array = _file_view(mm, offset, (h, w, bands), (stride, pixel, dtype.itemsize), dtype)
+        if orientation < 0:
+            array = array[::-1]
+        segments.append(((bx0, by0, bx1, by1), array, order))
+    return segments, layout
+
+def _image_alpha(img, tags, count):
+    """Index of the alpha band of a PIL-opened file, or None
+
+    PIL's RGBA mode marks one; otherwise a TIFF ExtraSamples entry saying
+    associated or unassociated alpha does. Other extra bands (NIR and the
+    like) are not alpha.
+    """
+    if img.mode == 'RGBA':
+        return count - 1
+    extra = tags.get(TIFF_EXTRA_SAMPLES)
+    extra = [] if extra is None else list(extra) if isinstance(extra, (tuple, list)) else [extra]
+    for i, kind in enumerate(extra):
+        if kind in TIFF_ALPHA_SAMPLES and count - len(extra) + i >= 0:
+            return count - len(extra) + i
+    return None
+
+def open_image(path):
+    """Memory-map an uncompressed PIL-readable file, or decode it once"""
+    img = Image.open(path)
+    width, height = img.size
+    tags = dict(img.tag_v2) if hasattr(img, 'tag_v2') else {}
+    mapped = _map_raw_tiles(path, img)
+    if mapped is not None:
+        segments, (dtype, bands, order) = mapped
+        count = len(order) if order is not None else bands
+        alpha = _image_alpha(img, tags, count)
+        img.close()
+        return Raster(path, segments, width, height, count, dtype, tags=tags, alpha=alpha)
+
+    print(f"⚠️  {os.path.basename(path)} is compressed; decoding it fully")
+    if img.mode not in ARRAY_MODES:
+        img = img.convert('RGBA')
+    array = np.asarray(img)
+    if array.ndim == 2:
+        array = array[..., None]
+    alpha = _image_alpha(img, tags, array.shape[2])
+    img.close()
+    return Raster(path, [((0, 0, width, height), array, None)], width, height, array.shape[2],
+                  array.dtype, tags=tags, mapped=False, alpha=alpha)
+
+def open_raster(path, **raw):
+    """Open any supported raster: ``.npy``, ENVI (``.hdr`` + data), raw, or a PIL format
+
+    Headerless binaries need their layout as keyword arguments (see
+    :func:`open_raw`).
+    """
+    if raw:
+        return open_raw(path, **raw)
+    if path.lower().endswith('.npy'):
+        return open_npy(path)
+    envi = _envi_paths(path)
+    if envi is not None:
+        return open_envi(*envi)
+    return open_image(path)
+
+def is_raster_path(path):
+    """True for files only this layer can read (PIL cannot)"""
+    return path.lower().endswith(RASTER_EXTENSIONS) or _envi_paths(path) is not None
+
+def main():
+    """Describe a raster and optionally export a window as an RGBA PNG"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('raster', help='.npy stack, ENVI .hdr/data file, TIFF or any PIL image')
+    parser.add_argument('--window', nargs=4, type=int, metavar=('X0', 'Y0', 'X1', 'Y1'))
+    parser.add_argument('--bands', nargs='+', help='Display bands by index or name (red green blue)')
+    parser.add_argument('--output', help='Save the window as an RGBA PNG here')
+    args = parser.parse_args()
+
+    raster = open_raster(args.raster)
+    print(f"🛰️  {args.raster}")
+    print(f"📏 {raster.width}x{raster.height}, {raster.count} band(s) of {raster.dtype}")
+    if raster.band_names:
+        print(f"🏷️  Bands: {', '.join(raster.band_names)}")
+    layout = 'memory-mapped' if raster.mapped else 'decoded'
+    print(f"🧩 {len(raster._segments)} segment(s), {layout}, zero-copy reads: {raster.zero_copy}")
+    if args.output:
+        bands = [int(b) if b.isdigit() else b for b in args.bands] if args.bands else None
+        window = tuple(args.window) if args.window else None
+        Image.fromarray(raster.read_rgba(window, bands), 'RGBA').save(args.output)
+        print(f"💾 Window saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import os
+
+TILE_SIZE = 1024
+ELLIPSE_VERTICES = 32
+
+class PolygonSet:
+    """Polygons flattened into edge arrays for batched scanline rasterization
+
+    Vertices are in pixel-corner coordinates: pixel (col, row) is covered
+    when its centre (col + 0.5, row + 0.5) lies inside the polygon (even-odd
+    rule, top/left edges inclusive). Coverage is decided per pixel, so any
+    window or tiling of the scene gives exactly the same pixels.
+    """
+
+    def __init__(self, polygons=(), xy=None, sizes=None):
+        """Build from a list of point lists, or from flat ``xy`` vertices plus
+        per-polygon vertex counts ``sizes`` (cheapest for vector sources)"""
+        if xy is None:
+            sizes = [len(points) for points in polygons]
+            if polygons and all(isinstance(points, np.ndarray) for points in polygons):
+                xy = np.concatenate([points.reshape(-1, 2) for points in polygons])
+            else:
+                xy = list(itertools.chain.from_iterable(polygons))
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        self.count = len(sizes)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1])) if self.count else sizes
+        # Each vertex's edge runs to the next vertex of its polygon, wrapping around
+        following = np.arange(1, len(xy) + 1)
+        following[starts + sizes - 1] = starts
+        x0, y0 = np.ascontiguousarray(xy.T)
+        x1, y1 = x0[following], y0[following]
+        sloped = np.flatnonzero(y0 != y1)
+        self.edge_polygon = np.repeat(np.arange(self.count), sizes)[sloped]
+        self.edge_x = x0[sloped]
+        self.edge_y = y0[sloped]
+        self.edge_slope = (x1[sloped] - self.edge_x) / (y1[sloped] - self.edge_y)
+        # First and last pixel row each edge crosses (exclusive end)
+        self.edge_row0 = np.ceil(np.minimum(self.edge_y, y1[sloped]) - 0.5).astype(np.int64)
+        self.edge_row1 = np.ceil(np.maximum(self.edge_y, y1[sloped]) - 0.5).astype(np.int64)
+        counts = np.bincount(self.edge_polygon, minlength=self.count)
+        self.edge_start = np.concatenate(([0], np.cumsum(counts)[:-1])) if self.count else counts
+        self.edge_count = counts
+
+        if self.count:
+            self.bbox = np.stack([np.minimum.reduceat(x0, starts), np.minimum.reduceat(y0, starts),
+                                  np.maximum.reduceat(x0, starts), np.maximum.reduceat(y0, starts)], axis=1)
+        else:
+            self.bbox = np.zeros((0, 4))
+
+    def __len__(self):
+        return self.count
+
+    def tile_index(self, box, tile_size=TILE_SIZE):
+        """Uniform-grid spatial index: polygons touching each tile of ``box``
+
+        Returns ``{(tx, ty): polygon indices in draw order}`` for the tiles of
+        ``box`` (x0, y0, x1, y1) that any polygon's bounding box reaches.
+        """
+        x0, y0, x1, y1 = box
+        if not self.count:
+            return {}
+        cols = -(-(x1 - x0) // tile_size)
+        rows = -(-(y1 - y0) // tile_size)
+        # Pixel columns/rows each bbox can cover, as tile ranges clipped to the box
+        tx0 = np.clip((np.floor(self.bbox[:, 0] - 0.5) - x0) // tile_size, 0, cols).astype(np.int64)
+        ty0 = np.clip((np.floor(self.bbox[:, 1] - 0.5) - y0) // tile_size, 0, rows).astype(np.int64)
+        tx1 = np.clip((np.ceil(self.bbox[:, 2]) - x0) // tile_size + 1, 0, cols).astype(np.int64)
+        ty1 = np.clip((np.ceil(self.bbox[:, 3]) - y0) // tile_size + 1, 0, rows).astype(np.int64)
+        spans_x, spans_y = np.maximum(tx1 - tx0, 0), np.maximum(ty1 - ty0, 0)
+        per_polygon = spans_x * spans_y
+        polygon = np.repeat(np.arange(self.count), per_polygon)
+        k = np.arange(len(polygon)) - np.repeat(np.cumsum(per_polygon) - per_polygon, per_polygon)
+        tile = (ty0[polygon] + k // spans_x[polygon]) * cols + tx0[polygon] + k % spans_x[polygon]
+        order = np.lexsort((polygon, tile))
+        tile, polygon = tile[order], polygon[order]
+        keys, first = np.unique(tile, return_index=True)
+        return {(int(t % cols), int(t // cols)): ids
+                for t, ids in zip(keys, np.split(polygon, first[1:]))}
+
+    def spans(self, ids, box):
+        """Covered pixel runs of polygons ``ids`` inside ``box``
+
+        Returns ``(rows, starts, ends, polygon)`` arrays in box coordinates,
+        sorted by polygon then row. Every crossing of a pixel-centre row with
+        an edge is computed at once; sorting the crossings per polygon and
+        row and pairing them gives the even-odd runs.
+        """
+        x0, y0, x1, y1 = box
+        width, height = x1 - x0, y1 - y0
+        counts = self.edge_count[ids]
+        edges = (np.repeat(self.edge_start[ids] - np.cumsum(counts) + counts, counts)
+                 + np.arange(int(counts.sum())))
+        rank = np.repeat(np.arange(len(ids)), counts)
+        row0 = np.maximum(self.edge_row0[edges], y0)
+        crossings = np.maximum(np.minimum(self.edge_row1[edges], y1) - row0, 0)
+        # Scene row and edge of every crossing; the crossing arrays are the
+        # bulk of the work, so they are updated in place
+        row = np.repeat(row0 - np.cumsum(crossings) + crossings, crossings)
+        row += np.arange(len(row))
+        edge = np.repeat(edges, crossings)
+        x = row + 0.5
+        x -= self.edge_y[edge]
+        x *= self.edge_slope[edge]
+        x += self.edge_x[edge]
+        # Round each crossing to the first pixel column whose centre is right
+        # of it, in scene coordinates so every tiling agrees, then clamp to
+        # the box (crossings off it only matter for parity)
+        x -= 0.5
+        np.ceil(x, out=x)
+        x -= x0
+        np.clip(x, 0, width, out=x)
+        # One integer key (polygon, row and column bit fields) orders them;
+        # crossings on the same column pair up the same whichever way the
+        # sort ties them
+        row_bits, column_bits = (height - 1).bit_length(), width.bit_length()
+        key = np.repeat((rank << row_bits) - y0, crossings)
+        key += row
+        key <<= column_bits
+        np.add(key, x, out=key, casting='unsafe')
+        key.sort()
+        # Groups of one polygon and row always hold an even number of crossings
+        group = key[0::2] >> column_bits
+        starts = key[0::2] & ((1 << column_bits) - 1)
+        ends = key[1::2] & ((1 << column_bits) - 1)
+        keep = ends > starts
+        group = group[keep]
+        return group & ((1 << row_bits) - 1), starts[keep], ends[keep], ids[group >> row_bits]
+
+    def fill_tile(self, ids, box, table=None):
+        """Pixels of ``box`` drawn with polygons ``ids``: labels, or ``table[label]`` when given
+
+        A label is 1 + the topmost polygon covering the pixel, 0 elsewhere;
+        later polygons are drawn over earlier ones, so each pixel takes the
+        largest label of the runs covering it. The run ends cut the tile
+        (flattened row by row) into segments. Each run covers a range of
+        segments, split into two overlapping power-of-two blocks whose maxima
+        are pushed down level by level; every segment is then written out in
+        one pass. The cost follows the number of runs, not their length.
+        Returns None when no polygon covers the box.
+        """
+        rows, starts, ends, polygon = self.spans(ids, box)
+        if not len(rows):
+            return None
+        x0, y0, x1, y1 = box
+        shape = (y1 - y0, x1 - x0)
+        labels = (polygon + 1).astype(np.uint16 if self.count < 65535 else np.uint32)
+        count = len(labels)
+        bounds = np.concatenate((rows * shape[1] + starts, rows * shape[1] + ends, [0, shape[0] * shape[1]]))
+        # Sorting (bound, index) bit fields (cheaper than an argsort) gives
+        # the bounds in order along with where each one landed
+        n = len(bounds)
+        index_bits = n.bit_length()
+        bounds <<= index_bits
+        bounds += np.arange(n)
+        bounds.sort()
+        order = bounds & ((1 << index_bits) - 1)
+        bounds >>= index_bits
+        # Segment i runs from bounds[i] to bounds[i + 1]; run k covers segments first[k]:last[k]
+        position = np.empty_like(order)
+        position[order] = np.arange(n)
+        first, last = position[:count], position[count:2 * count]
+        levels = np.frexp(last - first)[1] - 1
+        top = int(levels.max())
+        segments = len(bounds) - 1
+        blocks = np.zeros((top + 1) * segments, dtype=labels.dtype)
+        np.maximum.at(blocks, levels * segments + first, labels)
+        np.maximum.at(blocks, levels * segments + last - (1 << levels), labels)
+        blocks = blocks.reshape(top + 1, segments)
+        for level in range(top, 0, -1):
+            half = 1 << (level - 1)
+            coarse, fine = blocks[level], blocks[level - 1]
+            np.maximum(fine, coarse, out=fine)
+            np.maximum(fine[half:], coarse[:-half], out=fine[half:])
+        values = blocks[0] if table is None else table[blocks[0]]
+        return np.repeat(values, np.diff(bounds), axis=0).reshape(shape + values.shape[1:])
+
+    def _render(self, box, tile_size, workers, out, table=None):
+        """Fill ``out`` tile by tile with labels, or with ``table[label]`` when given
+
+        Tiles no polygon reaches are never touched, so they cost nothing
+        beyond the (lazily zeroed) output allocation.
+        """
+        x0, y0, x1, y1 = box
+
+        def fill(item):
+            (tx, ty), ids = item
+            tile = (x0 + tx * tile_size, y0 + ty * tile_size,
+                    min(x0 + (tx + 1) * tile_size, x1), min(y0 + (ty + 1) * tile_size, y1))
+            block = self.fill_tile(ids, tile, table)
+            # Tiles are disjoint, so threads never write the same pixels
+            if block is not None:
+                out[tile[1] - y0:tile[3] - y0, tile[0] - x0:tile[2] - x0] = block
+
+        tiles = list(self.tile_index(box, tile_size).items())
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(tiles) < 2:
+            for item in tiles:
+                fill(item)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rasterize') as pool:
+                list(pool.map(fill, tiles))
+        return out
+
+    def labels(self, box, tile_size=TILE_SIZE, workers=None):
+        """Label raster of ``box``: 1 + index of the topmost covering polygon, 0 elsewhere
+
+        Polygons are bucketed into tiles by :meth:`tile_index` and the tiles
+        are filled in parallel on a thread pool (numpy releases the GIL in
+        the sort and fill kernels).
+        """
+        x0, y0, x1, y1 = box
+        out = np.zeros((y1 - y0, x1 - x0), dtype=np.uint16 if self.count < 65535 else np.uint32)
+        return self._render(box, tile_size, workers, out)
+
+    def paint(self, fills, box, tile_size=TILE_SIZE, workers=None):
+        """Rasterize with one fill per polygon: ``(N,)`` alphas or ``(N, C)`` colours
+
+        Returns a uint8 array of shape (rows, cols) or (rows, cols, C);
+        uncovered pixels are 0.
+        """
+        x0, y0, x1, y1 = box
+        fills = np.asarray(fills, dtype=np.uint8)
+        table = np.zeros((self.count + 1,) + fills.shape[1:], dtype=np.uint8)
+        table[1:] = fills
+        out = np.zeros((y1 - y0, x1 - x0) + fills.shape[1:], dtype=np.uint8)
+        return self._render(box, tile_size, workers, out, table)
+
+def center_to_corner(points):
+    """ImageDraw-style vertices (integers at pixel centres) in this module's pixel-corner frame"""
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2) + 0.5
+
+def ellipse_polygon(box, vertices=ELLIPSE_VERTICES):
+    """Polygon approximating the ellipse ImageDraw draws in the inclusive pixel ``box``"""
+    x0, y0, x1, y1 = box
+    cx, cy = (x0 + x1 + 1) / 2.0, (y0 + y1 + 1) / 2.0
+    rx, ry = (x1 + 1 - x0) / 2.0, (y1 + 1 - y0) / 2.0
+    angles = np.arange(vertices) * (2 * np.pi / vertices)
+    return np.stack([cx + rx * np.cos(angles), cy + ry * np.sin(angles)], axis=1)
+
+def rasterize_polygons(polygons, fills, box, tile_size=TILE_SIZE, workers=None):
+    """One-shot :meth:`PolygonSet.paint` of a list of point lists"""
+    return PolygonSet(polygons).paint(fills, box, tile_size, workers)
@@ -0,0 +1,402 @@
+import numpy as np
+import argparse
+import contextlib
+import csv
+import json
+import os
+
+from atomic_io import atomic_output, atomic_write_json
+from india_flood_simulation import get_city_info
+from seeding import scene_seed
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends run unlocked
+    fcntl = None
+
+DEFAULT_STORE_DIR = 'static/report_store'
+# Bump when the record layouts change; stores with another version are refused
+STORE_VERSION = 2
+SEVERITIES = ('mild', 'moderate', 'severe')
+RISK_LEVELS = ('LOW', 'MODERATE', 'HIGH')
+UNKNOWN = 255
+GROUP_FIELDS = ('state', 'district', 'location', 'date', 'severity')
+PERIODS = {'day': 'D', 'month': 'M', 'year': 'Y'}
+
+# One fixed-width record per report; labels are ids into labels.jsonl
+REPORT_DTYPE = np.dtype([
+    ('run', '<u8'),  # run_id() of the run that produced it; 0 = unknown
+    ('date', '<M8[D]'),
+    ('location', '<u4'),
+    ('state', '<u4'),
+    ('district', '<u4'),
+    ('severity', 'u1'),
+    ('risk_level', 'u1'),
+    ('zones', '<u4'),
+    ('zone_start', '<u8'),  # first row of this report's zones in zones.bin
+    ('flooded_area_km2', '<f8'),
+    ('affected_population', '<i8'),
+    ('average_confidence', '<f4'),
+    ('flooded_pixels', '<i8'),
+])
+
+ZONE_DTYPE = np.dtype([
+    ('report', '<u8'),  # row of the owning report
+    ('center_x', '<i4'),
+    ('center_y', '<i4'),
+    ('lat', '<f8'),
+    ('lng', '<f8'),
+    ('area_km2', '<f4'),
+    ('overlap_km2', '<f4'),
+    ('pixels', '<i8'),
+    ('confidence', '<f4'),
+    ('mean_intensity', '<f4'),
+    ('severity', 'u1'),
+    ('clipped', '?'),
+])
+
+def _code(value, names):
+    return names.index(value) if value in names else UNKNOWN
+
+def run_id(*parts):
+    """64-bit identity of a pipeline run, e.g. (pipeline, location, date, severity, seed)
+
+    Reruns of the same run get the same id, so :meth:`ReportStore.latest`
+    counts them once. Never 0, which marks reports of unknown runs.
+    """
+    return scene_seed(*parts) or 1
+
+def location_labels(location):
+    """``(state, district)`` of a "City, State" location, from INDIAN_CITY_COORDS when known"""
+    city = get_city_info(location)
+    if city is not None:
+        return city['state'], city['district']
+    district, _, state = (part.strip() for part in location.partition(','))
+    return state or 'Unknown', district or 'Unknown'
+
+class ZoneRecord:
+    """One flood zone as a compact record, the Python-side view of a ``ZONE_DTYPE`` row"""
+    __slots__ = ZONE_DTYPE.names
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_zone(cls, zone, report_row, severity=None):
+        """Record of a report's zone dict (India or overlay pipeline)"""
+        center = zone.get('center') or (-1, -1)
+        return cls(report_row, center[0], center[1], zone.get('lat', np.nan), zone.get('lng', np.nan),
+                   zone.get('area_km2', zone.get('area', np.nan)), zone.get('overlap_km2', np.nan),
+                   zone.get('pixels', -1), zone.get('confidence', np.nan), zone.get('mean_intensity', np.nan),
+                   _code(zone.get('severity', severity), SEVERITIES), bool(zone.get('clipped', False)))
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row.tolist())
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def as_dict(self):
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record['severity'] = SEVERITIES[self.severity] if self.severity < len(SEVERITIES) else None
+        return record
+
+    def __repr__(self):
+        return f"ZoneRecord(report={self.report}, area_km2={self.area_km2:.3f}, lat={self.lat}, lng={self.lng})"
+
+def _read_records(path, dtype, count=None):
+    """Read-only memory map of the whole records in ``path`` (empty when there are none)"""
+    rows = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    rows = rows if count is None else min(rows, count)
+    if not rows:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+class ReportStore:
+    """Append-only columnar store of flood report summaries and their zones
+
+    Reports and zones are fixed-width NumPy structured records in
+    ``reports.bin`` and ``zones.bin``; locations, states and districts are
+    dictionary-encoded through ``labels.jsonl``. Reading is a memory map,
+    so aggregating thousands of runs never parses JSON. Appends hold an
+    exclusive lock and write zones before their report: a report row is
+    the commit point, and a torn append is trimmed off by the next one.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.reports_path = os.path.join(directory, 'reports.bin')
+        self.zones_path = os.path.join(directory, 'zones.bin')
+        self.labels_path = os.path.join(directory, 'labels.jsonl')
+        self.labels = []
+        self._label_ids = {}
+        self._labels_offset = 0
+        self._check_schema()
+
+    def _check_schema(self):
+        schema = {'version': STORE_VERSION, 'reports': REPORT_DTYPE.descr, 'zones': ZONE_DTYPE.descr}
+        path = os.path.join(self.directory, 'schema.json')
+        if not os.path.exists(path):
+            atomic_write_json(schema, path)
+            return
+        with open(path) as f:
+            stored = json.load(f)
+        if stored != json.loads(json.dumps(schema)):
+            raise ValueError(f"Report store {self.directory} has schema version {stored.get('version')}, "
+                             f"expected {STORE_VERSION}")
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync_labels(self):
+        """Pick up labels other writers appended since the last read"""
+        if not os.path.exists(self.labels_path):
+            return
+        with open(self.labels_path, 'rb') as f:
+            f.seek(self._labels_offset)
+            data = f.read()
+        # Only whole lines count; a torn last line is rewritten by the next append
+        data = data[:data.rfind(b'\n') + 1]
+        for line in data.splitlines():
+            label = json.loads(line)
+            self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        self._labels_offset += len(data)
+
+    def _label_id(self, label, new_labels):
+        """Id of ``label``, numbering unseen ones in ``new_labels`` (label -> id) after the stored ones"""
+        label_id = self._label_ids.get(label, new_labels.get(label))
+        if label_id is None:
+            label_id = new_labels[label] = len(self.labels) + len(new_labels)
+        return label_id
+
+    def _repair(self):
+        """Trim torn records and zones whose report was never committed; returns the row counts"""
+        for path, dtype in ((self.reports_path, REPORT_DTYPE), (self.zones_path, ZONE_DTYPE)):
+            if os.path.exists(path) and os.path.getsize(path) % dtype.itemsize:
+                os.truncate(path, os.path.getsize(path) // dtype.itemsize * dtype.itemsize)
+        if os.path.exists(self.labels_path) and os.path.getsize(self.labels_path) > self._labels_offset:
+            os.truncate(self.labels_path, self._labels_offset)
+        reports = _read_records(self.reports_path, REPORT_DTYPE)
+        zone_count = int(reports['zone_start'][-1] + reports['zones'][-1]) if len(reports) else 0
+        if os.path.exists(self.zones_path) and os.path.getsize(self.zones_path) > zone_count * ZONE_DTYPE.itemsize:
+            os.truncate(self.zones_path, zone_count * ZONE_DTYPE.itemsize)
+        return len(reports), zone_count
+
+    def append(self, report, severity=None, run=None):
+        """Append one report dict; returns its row"""
+        return self.extend([report], [severity], [run])[0]
+
+    def extend(self, reports, severities=None, runs=None):
+        """Append report dicts (India or overlay pipeline) under one lock; returns their rows
+
+        ``runs`` holds each report's :func:`run_id` (or None when unknown).
+        """
+        reports = list(reports)
+        severities = list(severities) if severities is not None else [None] * len(reports)
+        runs = list(runs) if runs is not None else [None] * len(reports)
+        with self._lock():
+            self._sync_labels()
+            first_report, first_zone = self._repair()
+            new_labels = {}
+            rows = np.zeros(len(reports), dtype=REPORT_DTYPE)
+            zones = []
+            for i, (report, severity, run) in enumerate(zip(reports, severities, runs)):
+                report_zones = report.get('flood_zones', [])
+                severity = severity or (report_zones[0].get('severity') if report_zones else None)
+                summary = report.get('summary') or report.get('flood_summary', {})
+                pixels = report.get('pixel_statistics', {}).get('flooded_pixels', -1)
+                location = report.get('location') or 'Unknown'
+                state, district = location_labels(location)
+                rows[i] = (
+                    run or 0, np.datetime64(report['analysis_date'], 'D') if report.get('analysis_date') else np.datetime64('NaT'),
+                    self._label_id(location, new_labels), self._label_id(state, new_labels),
+                    self._label_id(district, new_labels), _code(severity, SEVERITIES),
+                    _code(summary.get('risk_level'), RISK_LEVELS), len(report_zones), first_zone + len(zones),
+                    summary.get('total_flooded_area_km2', np.nan), summary.get('estimated_affected_population', 0),
+                    summary.get('average_confidence', np.nan), pixels,
+                )
+                zones.extend(ZoneRecord.from_zone(zone, first_report + i, severity).as_tuple()
+                             for zone in report_zones)
+
+            if new_labels:
+                with open(self.labels_path, 'ab') as f:
+                    f.write(''.join(json.dumps(label) + '\n' for label in new_labels).encode())
+                self._sync_labels()
+            # Zones first: the report rows are what make them visible
+            with open(self.zones_path, 'ab') as f:
+                f.write(np.array(zones, dtype=ZONE_DTYPE).tobytes())
+            with open(self.reports_path, 'ab') as f:
+                f.write(rows.tobytes())
+        return list(range(first_report, first_report + len(reports)))
+
+    def reports(self):
+        """All committed report records as a read-only structured array"""
+        return _read_records(self.reports_path, REPORT_DTYPE)
+
+    def latest(self):
+        """Committed reports with reruns collapsed: the last row of each run id
+
+        Reports of unknown runs (id 0) are all kept.
+        """
+        reports = self.reports()
+        run = reports['run']
+        keep = run == 0
+        ids, last = np.unique(run[::-1], return_index=True)
+        keep[len(run) - 1 - last[ids != 0]] = True
+        return reports[keep]
+
+    def zones(self):
+        """Zone records of every committed report"""
+        reports = self.reports()
+        zone_count = int(reports['zone_start'][-1] + reports['zones'][-1]) if len(reports) else 0
+        return _read_records(self.zones_path, ZONE_DTYPE, zone_count)
+
+    def zone_records(self, row):
+        """:class:`ZoneRecord` objects of the report at ``row``"""
+        report = self.reports()[row]
+        start = int(report['zone_start'])
+        return [ZoneRecord.from_row(zone) for zone in self.zones()[start:start + int(report['zones'])]]
+
+    def label_names(self, ids):
+        """Label strings for an array of label ids"""
+        self._sync_labels()
+        return np.asarray(self.labels, dtype=object)[ids]
+
+    def __len__(self):
+        return len(self.reports())
+
+def aggregate(store, by=('state', 'district', 'date'), period='day', reports=None):
+    """Roll up flooded area, affected population and risk levels by ``by`` fields
+
+    The key columns are folded into one int64 whose ``np.unique`` gives
+    every report its group; the sums, counts and maxima are then
+    ``bincount``/``maximum.at`` reductions over that index, so the cost
+    does not depend on how many groups there are. ``period`` buckets dates
+    by day, month or year. Reruns count once (see :meth:`ReportStore.latest`)
+    unless ``reports`` are given. Returns a list of row dicts ordered by the
+    key columns (labels in the order they were first stored, dates ascending).
+    """
+    reports = store.latest() if reports is None else reports
+    if not len(reports):
+        return []
+    columns = []
+    for field in by:
+        if field == 'date':
+            columns.append(reports['date'].astype(f'M8[{PERIODS[period]}]').astype(np.int64))
+        else:
+            columns.append(reports[field].astype(np.int64))
+    # Dense codes per column folded into one int64 key: a 1-D unique is far
+    # cheaper than a row-wise one
+    codes = [np.unique(column, return_inverse=True) for column in columns]
+    key = np.ravel_multi_index([inverse.reshape(-1) for _, inverse in codes], [len(values) for values, _ in codes])
+    _, first, group = np.unique(key, return_index=True, return_inverse=True)
+    group = group.reshape(-1)
+    count = len(first)
+
+    area = np.nan_to_num(reports['flooded_area_km2'])
+    confidence = reports['average_confidence'].astype(np.float64)
+    known_confidence = ~np.isnan(confidence)
+    risk = reports['risk_level'].astype(np.int64)
+    known_risk = risk != UNKNOWN
+    totals = {
+        'reports': np.bincount(group, minlength=count),
+        'zones': np.bincount(group, weights=reports['zones'], minlength=count),
+        'flooded_area_km2': np.bincount(group, weights=area, minlength=count),
+        'affected_population': np.bincount(group, weights=reports['affected_population'], minlength=count),
+    }
+    confidence_sum = np.bincount(group, weights=np.where(known_confidence, confidence, 0.0), minlength=count)
+    confidence_count = np.bincount(group, weights=known_confidence, minlength=count)
+    risk_counts = np.bincount(group[known_risk] * len(RISK_LEVELS) + risk[known_risk],
+                              minlength=count * len(RISK_LEVELS)).reshape(count, len(RISK_LEVELS))
+    max_area = np.full(count, -np.inf)
+    np.maximum.at(max_area, group, area)
+
+    labels = {}
+    for field in by:
+        values = reports[field][first]
+        if field == 'date':
+            labels[field] = [None if np.isnat(d) else str(d) for d in values.astype(f'M8[{PERIODS[period]}]')]
+        elif field == 'severity':
+            labels[field] = [SEVERITIES[v] if v < len(SEVERITIES) else None for v in values.tolist()]
+        else:
+            labels[field] = store.label_names(values).tolist()
+
+    rows = []
+    for g in range(count):
+        row = {field: labels[field][g] for field in by}
+        highest = np.flatnonzero(risk_counts[g])
+        row.update({
+            'reports': int(totals['reports'][g]),
+            'zones': int(totals['zones'][g]),
+            'flooded_area_km2': round(float(totals['flooded_area_km2'][g]), 3),
+            'max_flooded_area_km2': round(float(max_area[g]), 3),
+            'affected_population': int(totals['affected_population'][g]),
+            'average_confidence': (round(float(confidence_sum[g] / confidence_count[g]), 3)
+                                   if confidence_count[g] else None),
+            'risk_level': RISK_LEVELS[highest[-1]] if len(highest) else None,
+            **{f'{level.lower()}_risk_reports': int(n) for level, n in zip(RISK_LEVELS, risk_counts[g])},
+        })
+        rows.append(row)
+    return rows
+
+def _load_report_files(paths):
+    for path in paths:
+        with open(path) as f:
+            yield json.load(f)
+
+def main():
+    """Columnar store of flood reports: append report JSON files, aggregate by region and date"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--store', default=os.environ.get('FLOOD_REPORT_STORE', DEFAULT_STORE_DIR))
+    commands = parser.add_subparsers(dest='command', required=True)
+    append = commands.add_parser('append', help='Append flood_analysis_report / batch *_report.json files')
+    append.add_argument('reports', nargs='+')
+    append.add_argument('--severity', choices=SEVERITIES, help='Severity when the reports have no zones')
+    rollup = commands.add_parser('aggregate', help='Roll up area, population and risk by region and date')
+    rollup.add_argument('--by', nargs='+', default=['state', 'district', 'date'], choices=GROUP_FIELDS)
+    rollup.add_argument('--period', default='day', choices=list(PERIODS), help='Date bucket size')
+    rollup.add_argument('--output', help='Write the rows to this .json or .csv file')
+    args = parser.parse_args()
+
+    store = ReportStore(args.store)
+    if args.command == 'append':
+        print(f"📥 Appending {len(args.reports)} reports to {args.store}...")
+        rows = store.extend(_load_report_files(args.reports), [args.severity] * len(args.reports))
+        print(f"✅ Stored as rows {rows[0]}-{rows[-1]} ({len(store)} reports in store)")
+        return rows
+
+    print(f"📊 Aggregating {len(store)} reports ({len(store.latest())} distinct runs) "
+          f"by {', '.join(args.by)} ({args.period})...")
+    rows = aggregate(store, args.by, args.period)
+    if args.output and args.output.lower().endswith('.csv'):
+        with atomic_output(args.output) as tmp_path:
+            with open(tmp_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(args.by))
+                writer.writeheader()
+                writer.writerows(rows)
+    elif args.output:
+        atomic_write_json(rows, args.output)
+    for row in rows[:50]:
+        key = ' / '.join(str(row[field]) for field in args.by)
+        print(f"   {key:<48} {row['reports']:>5} runs {row['flooded_area_km2']:>10.1f} km² "
+              f"{row['affected_population']:>12,} people  {row['risk_level']}")
+    if len(rows) > 50:
+        print(f"   ... {len(rows) - 50} more groups")
+    if args.output:
+        print(f"\n💾 Aggregates saved to: {args.output}")
+    return rows
+
+if __name__ == "__main__":
+    main()
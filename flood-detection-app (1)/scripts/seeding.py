@@ -0,0 +1,28 @@
+import hashlib
+
+import numpy as np
+
+def scene_seed(*parts, base_seed=0):
+    """Deterministic 64-bit seed for a scene, e.g. (location, date, severity)
+
+    Derived by hashing rather than from run order, so the same scene gets the
+    same seed in any process and under any worker count.
+    """
+    key = '|'.join(str(p) for p in (base_seed,) + parts)
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+
+def make_rng(rng=None):
+    """``numpy.random.Generator`` from a seed, SeedSequence or Generator (passed through)
+
+    None gives a fresh unseeded generator, so unseeded runs stay random.
+    """
+    return np.random.default_rng(rng)
+
+def spawn_rngs(rng, count):
+    """``count`` independent child generators of a seed or Generator
+
+    Each pipeline stage (or tile, or worker) draws from its own stream, so
+    changing how much one of them consumes never shifts the others, and no
+    two ever share state.
+    """
+    return make_rng(rng).spawn(count)
@@ -3,10 +3,13 @@ import numpy as np
 import io
 import base64
 
-def create_satellite_image():
+from compositing import blend_image, image_to_array
+from tracing import image_attrs, span, trace_from_env
+from water_detection import detect_water
+
+def create_satellite_image(width=600, height=400):
     """Create a simulated satellite image"""
     # Create a landscape-like image
-    width, height = 600, 400
     img = Image.new('RGB', (width, height), color='lightblue')
     draw = ImageDraw.Draw(img)
     
@@ -15,50 +18,59 @@ def create_satellite_image():
     draw.rectangle([0, height//2, width, height], fill='darkgreen')
     
     # Brown areas (urban/dry land)
-    draw.rectangle([100, height//2, 300, height-50], fill='saddlebrown')
-    draw.rectangle([400, height//2, 550, height-30], fill='saddlebrown')
+    draw.rectangle([width//6, height//2, width//2, height - height//8], fill='saddlebrown')
+    draw.rectangle([width*2//3, height//2, width*11//12, height - height*3//40], fill='saddlebrown')
     
     # Blue areas (existing water bodies)
-    draw.ellipse([50, height//3, 150, height//2], fill='darkblue')
-    draw.ellipse([450, height//4, 580, height//2], fill='darkblue')
+    draw.ellipse([width//12, height//3, width//4, height//2], fill='darkblue')
+    draw.ellipse([width*3//4, height//4, width*29//30, height//2], fill='darkblue')
     
     return img
 
-def apply_flood_overlay(base_image):
+def apply_flood_overlay(base_image, detection='simulated'):
     """Apply flood detection overlay to the base image"""
     width, height = base_image.size
     
-    # Create overlay for flooded areas (bottom 30% with some random patches)
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-    
-    # Main flood area (bottom 30%)
-    flood_start = int(height * 0.7)
-    draw.rectangle([0, flood_start, width, height], fill=(255, 0, 0, 100))
-    
-    # Additional flood patches
-    draw.ellipse([100, height//2, 250, flood_start + 20], fill=(255, 0, 0, 80))
-    draw.ellipse([350, height//2 + 30, 500, flood_start + 10], fill=(255, 0, 0, 90))
+    if detection == 'spectral':
+        # Classify water in the image itself
+        overlay, _, _ = detect_water(base_image)
+    else:
+        # Create overlay for flooded areas (bottom 30% with some random patches)
+        overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        
+        # Main flood area (bottom 30%)
+        flood_start = int(height * 0.7)
+        draw.rectangle([0, flood_start, width, height], fill=(255, 0, 0, 100))
+        
+        # Additional flood patches
+        draw.ellipse([width//6, height//2, width*5//12, flood_start + height//20], fill=(255, 0, 0, 80))
+        draw.ellipse([width*7//12, height//2 + height*3//40, width*5//6, flood_start + height//40],
+                     fill=(255, 0, 0, 90))
     
     # Combine base image with overlay
-    result = base_image.copy()
-    result.paste(overlay, (0, 0), overlay)
+    result = image_to_array(base_image)
+    blend_image(result, overlay)
     
-    return result
+    return Image.fromarray(result)
 
-def simulate_ml_inference(location, date):
+def simulate_ml_inference(location, date, detection='simulated'):
     """Simulate the ML inference pipeline"""
     print(f"Processing flood detection for {location} on {date}")
     print("Loading satellite imagery...")
     
     # Create base satellite image
-    satellite_img = create_satellite_image()
+    with span('create_satellite_image') as sp:
+        satellite_img = create_satellite_image()
+        sp.set(**image_attrs(satellite_img))
     
     print("Running ML model inference...")
     print("Detecting water bodies and flood patterns...")
     
     # Apply flood detection overlay
-    result_img = apply_flood_overlay(satellite_img)
+    with span('apply_flood_overlay') as sp:
+        result_img = apply_flood_overlay(satellite_img, detection)
+        sp.set(**image_attrs(result_img))
     
     print("Analysis complete!")
     print("Detected flood areas in bottom 30% of region")
@@ -70,6 +82,7 @@ def simulate_ml_inference(location, date):
 if __name__ == "__main__":
     location = "Houston, TX"
     date = "2024-01-15"
+    trace_from_env()
     
     original, overlay = simulate_ml_inference(location, date)
     
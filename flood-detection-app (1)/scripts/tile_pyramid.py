@@ -0,0 +1,255 @@
+from PIL import Image
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+
+from atomic_io import atomic_save_image, atomic_write_json
+from georef import scene_bounds
+from tiled_overlay import WindowedImage
+
+TILE_SIZE = 256
+# Web Mercator ground resolution at zoom 0 on the equator, metres/pixel
+MERCATOR_RESOLUTION = 2 * math.pi * 6378137.0 / TILE_SIZE
+TILE_COMPRESS_LEVEL = 6
+MANIFEST_NAME = 'manifest.json'
+TILEJSON_NAME = 'tilejson.json'
+
+def lng_to_tile_x(lng, zoom):
+    """Fractional XYZ tile column of a longitude"""
+    return (lng + 180.0) / 360.0 * (1 << zoom)
+
+def lat_to_tile_y(lat, zoom):
+    """Fractional XYZ tile row of a latitude"""
+    lat_rad = math.radians(lat)
+    return (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * (1 << zoom)
+
+def native_zoom(lat, gsd_m):
+    """Smallest zoom whose pixels are no coarser than the scene's"""
+    return max(0, math.ceil(math.log2(MERCATOR_RESOLUTION * math.cos(math.radians(lat)) / gsd_m)))
+
+def location_slug(location):
+    """Directory name for a "City, State" location"""
+    return re.sub(r'[^a-z0-9]+', '-', location.lower()).strip('-')
+
+def downsample_tile(children):
+    """Merge a 2x2 grid of child tiles (None = transparent) into one parent tile
+
+    Averages in premultiplied alpha so flood edges do not pick up dark
+    fringes from transparent neighbours.
+    """
+    block = np.zeros((2 * TILE_SIZE, 2 * TILE_SIZE, 4), dtype=np.uint32)
+    for (dy, dx), child in children.items():
+        if child is not None:
+            block[dy * TILE_SIZE:(dy + 1) * TILE_SIZE, dx * TILE_SIZE:(dx + 1) * TILE_SIZE] = child
+    block[..., :3] *= block[..., 3:4]
+    sums = block.reshape(TILE_SIZE, 2, TILE_SIZE, 2, 4).sum(axis=(1, 3))
+
+    alpha = sums[..., 3]
+    tile = np.empty((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    safe = np.maximum(alpha, 1)[..., None]
+    tile[..., :3] = (sums[..., :3] + safe // 2) // safe
+    tile[..., 3] = (alpha + 2) // 4
+    return tile
+
+class ScenePyramid:
+    """XYZ (Web Mercator) tiles of a north-up scene with known lat/lng bounds
+
+    Tiles at ``max_zoom`` are resampled straight from the scene; every lower
+    zoom is built from its four children, so each level reuses the one below
+    instead of going back to the scene. Tiles are produced depth-first, so
+    memory holds at most four tiles per zoom level at any time.
+    """
+
+    def __init__(self, reader, bounds, min_zoom, max_zoom):
+        self.reader = reader
+        self.bounds = bounds
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._ranges = {}
+
+    def tile_range(self, zoom):
+        """Inclusive (x0, y0, x1, y1) range of tiles touching the scene"""
+        if zoom in self._ranges:
+            return self._ranges[zoom]
+        west, south, east, north = self.bounds
+        n = (1 << zoom) - 1
+        self._ranges[zoom] = (
+            max(0, int(lng_to_tile_x(west, zoom))), max(0, int(lat_to_tile_y(north, zoom))),
+            min(n, int(lng_to_tile_x(east, zoom))), min(n, int(lat_to_tile_y(south, zoom))))
+        return self._ranges[zoom]
+
+    def _in_range(self, zoom, x, y):
+        x0, y0, x1, y1 = self.tile_range(zoom)
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def render_native(self, x, y):
+        """Nearest-neighbour resample of the scene into one max-zoom tile"""
+        zoom = self.max_zoom
+        west, south, east, north = self.bounds
+        width, height = self.reader.width, self.reader.height
+        world = TILE_SIZE << zoom
+        offsets = np.arange(TILE_SIZE) + 0.5
+
+        # Longitude is linear in tile x and latitude depends only on tile y,
+        # so the warp separates into one index vector per axis
+        lngs = (x * TILE_SIZE + offsets) / world * 360.0 - 180.0
+        lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y * TILE_SIZE + offsets) / world))))
+        cols = np.floor((lngs - west) / (east - west) * width).astype(np.int64)
+        rows = np.floor((north - lats) / (north - south) * height).astype(np.int64)
+        col_ok = np.flatnonzero((cols >= 0) & (cols < width))
+        row_ok = np.flatnonzero((rows >= 0) & (rows < height))
+        if col_ok.size == 0 or row_ok.size == 0:
+            return None
+
+        cols, rows = cols[col_ok], rows[row_ok]
+        c0, r0 = int(cols.min()), int(rows.min())
+        window = self.reader.read((c0, r0, int(cols.max()) + 1, int(rows.max()) + 1))
+        tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+        tile[np.ix_(row_ok, col_ok)] = window[np.ix_(rows - r0, cols - c0)]
+        return tile if tile[..., 3].any() else None
+
+    def build(self, emit):
+        """Produce every non-transparent tile, calling ``emit(z, x, y, tile)``"""
+        x0, y0, x1, y1 = self.tile_range(self.min_zoom)
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                self._build(self.min_zoom, x, y, emit)
+
+    def _build(self, zoom, x, y, emit):
+        if zoom == self.max_zoom:
+            tile = self.render_native(x, y)
+        else:
+            children = {}
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    cx, cy = 2 * x + dx, 2 * y + dy
+                    children[dy, dx] = (self._build(zoom + 1, cx, cy, emit)
+                                        if self._in_range(zoom + 1, cx, cy) else None)
+            tile = None
+            if any(child is not None for child in children.values()):
+                tile = downsample_tile(children)
+                if not tile[..., 3].any():
+                    tile = None
+        if tile is not None:
+            emit(zoom, x, y, tile)
+        return tile
+
+def _write_tile(path, tile, previous_hash):
+    """Encode one tile unless its pixels match the previous run; returns (hash, written)"""
+    digest = hashlib.sha1(tile.tobytes()).hexdigest()
+    if digest == previous_hash and os.path.exists(path):
+        return digest, False
+    atomic_save_image(Image.fromarray(tile, 'RGBA'), path, 'PNG', compress_level=TILE_COMPRESS_LEVEL)
+    return digest, True
+
+def build_tile_pyramid(image_path, output_dir, lat, lng, gsd_m, min_zoom=None, max_zoom=None,
+                       workers=None, url_prefix=None, name=None):
+    """Export ``image_path`` as a 256px XYZ tile pyramid under ``output_dir``
+
+    The scene is placed north-up around lat/lng at ``gsd_m`` metres/pixel.
+    Fully transparent tiles are skipped. Tiles are PNG-encoded on a thread
+    pool while later tiles are still being resampled, and a manifest of
+    tile hashes lets re-runs rewrite only tiles whose pixels changed (and
+    delete tiles that became transparent). Returns the TileJSON dict.
+    """
+    reader = WindowedImage(image_path)
+    bounds = scene_bounds(lat, lng, reader.width, reader.height, gsd_m)
+    if max_zoom is None:
+        max_zoom = native_zoom(lat, gsd_m)
+    if min_zoom is None:
+        # Deep enough that the whole scene spans about one tile
+        levels = max(0, math.ceil(math.log2(max(reader.width, reader.height) / TILE_SIZE)))
+        min_zoom = max(0, max_zoom - levels)
+    min_zoom = min(min_zoom, max_zoom)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f).get('tiles', {})
+
+    workers = workers or os.cpu_count() or 1
+    pending = []
+    hashes = {}
+    written = 0
+
+    def collect(entry):
+        nonlocal written
+        key, future = entry
+        hashes[key], changed = future.result()
+        written += changed
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def emit(zoom, x, y, tile):
+            key = f'{zoom}/{x}/{y}'
+            path = os.path.join(output_dir, str(zoom), str(x), f'{y}.png')
+            pending.append((key, pool.submit(_write_tile, path, tile, previous.get(key))))
+            # Bound the tiles waiting to be encoded
+            while len(pending) > workers * 4:
+                collect(pending.pop(0))
+
+        ScenePyramid(reader, bounds, min_zoom, max_zoom).build(emit)
+        for entry in pending:
+            collect(entry)
+
+    removed = 0
+    for key in set(previous) - set(hashes):
+        zoom, x, y = key.split('/')
+        path = os.path.join(output_dir, zoom, x, f'{y}.png')
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    name = name or os.path.basename(os.path.normpath(output_dir))
+    url_prefix = url_prefix or f'/tiles/{name}'
+    tilejson = {
+        'tilejson': '2.2.0',
+        'name': name,
+        'format': 'png',
+        'scheme': 'xyz',
+        'tiles': [f'{url_prefix}/{{z}}/{{x}}/{{y}}.png'],
+        'bounds': [round(b, 7) for b in bounds],
+        'center': [lng, lat, min_zoom],
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+    }
+    atomic_write_json({'tiles': hashes, 'source': image_path, 'gsd_m': gsd_m}, manifest_path, indent=None)
+    atomic_write_json(tilejson, os.path.join(output_dir, TILEJSON_NAME))
+
+    print(f"🗺️  Tiles z{min_zoom}-{max_zoom}: {len(hashes)} non-empty, {written} written, "
+          f"{len(hashes) - written} unchanged, {removed} removed")
+    return tilejson
+
+def main():
+    """Export a composited flood map as an XYZ tile pyramid for the map view"""
+    from flood_stats import DEFAULT_GSD_M
+    from india_flood_simulation import get_city_info
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('image', help='Composited scene (PNG, PPM, .npy, ...)')
+    parser.add_argument('--location', default='Mumbai, Maharashtra')
+    parser.add_argument('--output-dir', help='Default: public/tiles/<location slug>')
+    parser.add_argument('--gsd', type=float, default=DEFAULT_GSD_M, help='Ground sampling distance (m/pixel)')
+    parser.add_argument('--min-zoom', type=int, default=None)
+    parser.add_argument('--max-zoom', type=int, default=None, help='Default: native resolution of the scene')
+    parser.add_argument('--workers', type=int, default=None, help='Encoder threads (default: CPU count)')
+    args = parser.parse_args()
+
+    city = get_city_info(args.location)
+    if city is None:
+        parser.error(f"Unknown location {args.location!r}")
+    output_dir = args.output_dir or os.path.join('public', 'tiles', location_slug(args.location))
+
+    print("🛰️  Flood Map Tile Pyramid Export")
+    print("=" * 50)
+    tilejson = build_tile_pyramid(args.image, output_dir, city['lat'], city['lng'], args.gsd,
+                                  args.min_zoom, args.max_zoom, args.workers)
+    print(f"💾 TileJSON saved to: {os.path.join(output_dir, TILEJSON_NAME)} ({tilejson['tiles'][0]})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+
+from atomic_io import atomic_output, atomic_write_json
+
+# Set to a file path to trace a script run; ``.jsonl`` writes one span per
+# line, anything else a Chrome trace (chrome://tracing, Perfetto)
+TRACE_ENV = 'FLOOD_TRACE'
+
+_tracer = None
+
+class _NullSpan:
+    """Shared stand-in returned by :func:`span` while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """One timed pipeline step; ``set`` attaches counts (pixels, bytes, cache hits)"""
+    __slots__ = ('tracer', 'name', 'attrs', 'id', 'parent', 'start_ns', 'tid')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.id = next(self.tracer._ids)
+        self.parent = stack[-1].id if stack else None
+        self.tid = threading.get_ident()
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        self.tracer._stack().pop()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer._record(self, end_ns)
+        return False
+
+class Tracer:
+    """Collects finished spans from every thread of this process"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self._origin_ns = time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span, end_ns):
+        event = {
+            'name': span.name,
+            'id': span.id,
+            'parent': span.parent,
+            'start_ms': round((span.start_ns - self._origin_ns) / 1e6, 3),
+            'duration_ms': round((end_ns - span.start_ns) / 1e6, 3),
+            'pid': self.pid,
+            'tid': span.tid,
+            'attrs': span.attrs,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def write_jsonl(self, path):
+        with atomic_output(path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                for event in self.events:
+                    f.write(json.dumps(event) + '\n')
+
+    def write_chrome_trace(self, path):
+        trace = {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [{
+                'name': event['name'],
+                'cat': 'flood',
+                'ph': 'X',
+                'ts': round(event['start_ms'] * 1000, 1),
+                'dur': round(event['duration_ms'] * 1000, 1),
+                'pid': event['pid'],
+                'tid': event['tid'],
+                'args': event['attrs'],
+            } for event in self.events],
+        }
+        atomic_write_json(trace, path, indent=None)
+
+    def write(self, path):
+        """Write the spans as JSON lines (``.jsonl``) or a Chrome trace"""
+        if path.endswith('.jsonl'):
+            self.write_jsonl(path)
+        else:
+            self.write_chrome_trace(path)
+
+    def close(self):
+        """Stop tracing and write the spans to ``path``, once"""
+        global _tracer
+        if _tracer is self:
+            _tracer = None
+        if self.path:
+            path, self.path = self.path, None
+            self.write(path)
+            print(f"🧭 Trace saved to: {path} ({len(self.events)} spans)")
+
+def span(name, **attrs):
+    """Context manager timing one step; nearly free while tracing is disabled"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, attrs)
+
+def enable_tracing(path=None):
+    """Start collecting spans in this process and return the :class:`Tracer`"""
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+def trace_from_env():
+    """Enable tracing when ``FLOOD_TRACE`` names an output file
+
+    The trace is written when the process exits. Returns the tracer, or
+    None when tracing stays off.
+    """
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    tracer = enable_tracing(path)
+    atexit.register(tracer.close)
+    return tracer
+
+def image_attrs(img):
+    """Pixel count and buffer size of a PIL image, for span attributes"""
+    width, height = img.size
+    return {'pixels': width * height, 'bytes': width * height * len(img.getbands())}
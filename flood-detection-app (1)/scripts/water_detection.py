@@ -0,0 +1,353 @@
+from PIL import Image
+import numpy as np
+import argparse
+import time
+
+from raster_io import Raster, is_raster_path, open_raster
+
+DETECTION_MODES = ('simulated', 'spectral')
+
+# Normalized difference (a - b) / (a + b) of two bands per index. Water
+# reflects green (and, in RGB imagery, blue) far more than NIR, SWIR or red.
+WATER_INDICES = {
+    'rgb': ('blue', 'red'),
+    'ndwi': ('green', 'nir'),
+    'mndwi': ('green', 'swir'),
+}
+# Band positions in the last axis of the source (R, G, B, NIR, SWIR order)
+DEFAULT_BANDS = {'red': 0, 'green': 1, 'blue': 2, 'nir': 3, 'swir': 4}
+
+DEFAULT_CHUNK_ROWS = 512
+# Index values in [-1, 1] are quantized to this many levels for Otsu and
+# stored as one byte per pixel between the two passes
+INDEX_LEVELS = 256
+# Otsu splits any two-mode histogram, water or not; open water has a
+# clearly positive index, so the threshold never drops below this
+MIN_WATER_INDEX = 0.1
+MORPHOLOGY_RADIUS = 2
+MIN_ZONE_PIXELS = 200
+MAX_ZONES = 12
+WATER_COLOR = (255, 0, 0)
+ALPHA_RANGE = (90, 170)
+
+def _read_rows(source, y0, y1):
+    """Rows y0:y1 of a PIL image, :class:`raster_io.Raster` or array as float32"""
+    if isinstance(source, Image.Image):
+        return np.asarray(source.crop((0, y0, source.width, y1)), dtype=np.float32)
+    if isinstance(source, Raster):
+        return np.asarray(source.read(window=(0, y0, source.width, y1)), dtype=np.float32)
+    return np.asarray(source[y0:y1], dtype=np.float32)
+
+def quantized_index(chunk, index='rgb', bands=None):
+    """Water index of a pixel chunk, quantized to uint8 levels over [-1, 1]"""
+    bands = dict(DEFAULT_BANDS, **(bands or {}))
+    a_name, b_name = WATER_INDICES[index]
+    a = chunk[..., bands[a_name]]
+    b = chunk[..., bands[b_name]]
+    total = a + b
+    diff = a - b
+    # Black (no-signal) pixels get index 0, not NaN
+    np.divide(diff, total, out=diff, where=total > 0)
+    diff[total <= 0] = 0
+    diff += 1.0
+    diff *= (INDEX_LEVELS - 1) / 2.0
+    np.clip(np.rint(diff, out=diff), 0, INDEX_LEVELS - 1, out=diff)
+    return diff.astype(np.uint8)
+
+def level_to_index(level):
+    return level * 2.0 / (INDEX_LEVELS - 1) - 1.0
+
+def index_to_level(value):
+    return int(np.floor((value + 1.0) * (INDEX_LEVELS - 1) / 2.0))
+
+def otsu_threshold(histogram):
+    """Level maximising between-class variance; pixels above it are water"""
+    histogram = histogram.astype(np.float64)
+    levels = np.arange(len(histogram), dtype=np.float64)
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    if total == 0:
+        return len(histogram) - 1
+    cum_mean = np.cumsum(histogram * levels)
+    background = weight[:-1]
+    foreground = total - background
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_b = cum_mean[:-1] / background
+        mean_f = (cum_mean[-1] - cum_mean[:-1]) / foreground
+        between = background * foreground * (mean_b - mean_f) ** 2
+    between[~np.isfinite(between)] = -1
+    return int(np.argmax(between))
+
+def _window_reduce(mask, radius, axis, op, pad_value):
+    """``op`` (OR/AND) of ``mask`` over a (2 * radius + 1) window along ``axis``"""
+    pad = [(0, 0)] * mask.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(mask, pad, constant_values=pad_value)
+    size = mask.shape[axis]
+    out = padded.take(np.arange(size), axis=axis)
+    window = [slice(None)] * mask.ndim
+    for shift in range(1, 2 * radius + 1):
+        window[axis] = slice(shift, shift + size)
+        op(out, padded[tuple(window)], out=out)
+    return out
+
+def dilate(mask, radius):
+    """Binary dilation by a square, as two separable window passes"""
+    for axis in (0, 1):
+        mask = _window_reduce(mask, radius, axis, np.logical_or, False)
+    return mask
+
+def erode(mask, radius):
+    """Binary erosion by a square; the image border does not erode"""
+    for axis in (0, 1):
+        mask = _window_reduce(mask, radius, axis, np.logical_and, True)
+    return mask
+
+def clean_mask(mask, radius=MORPHOLOGY_RADIUS):
+    """Opening (drops specks) then closing (fills pinholes and cracks)"""
+    if radius <= 0:
+        return mask
+    mask = dilate(erode(mask, radius), radius)
+    return erode(dilate(mask, radius), radius)
+
+def band_runs(mask, values, y0=0):
+    """Horizontal runs of a mask band and the sum of ``values`` over each
+
+    Returns ``(rows, starts, ends, sums)`` arrays (ends exclusive, rows
+    offset by ``y0``), ready to concatenate across bands.
+    """
+    width = mask.shape[1]
+    padded = np.zeros((mask.shape[0], width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    # Starts and ends alternate along each zero-padded row, so one scan finds
+    # both; flatnonzero + divmod is several times faster than 2-D nonzero
+    rows, cols = np.divmod(np.flatnonzero(np.diff(padded, axis=1)), width + 1)
+    rows, starts, ends = rows[0::2], cols[0::2], cols[1::2]
+    if len(rows) == 0:
+        return rows + y0, starts, ends, np.zeros(0, dtype=np.int64)
+    # reduceat over interleaved [start, end) offsets sums each run
+    flat = np.append(values.ravel(), values.dtype.type(0))
+    bounds = np.empty(2 * len(rows), dtype=np.int64)
+    bounds[0::2] = rows * width + starts
+    bounds[1::2] = rows * width + ends
+    sums = np.add.reduceat(flat, bounds, dtype=np.int64)[0::2]
+    return rows + y0, starts, ends, sums
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def label_runs(rows, starts, ends, width):
+    """8-connected component label of each run (runs sorted by row, then start)
+
+    Overlapping runs in consecutive rows are found with two binary searches
+    per run; only the union-find over those pairs is a Python loop, and it
+    is proportional to the number of runs rather than pixels.
+    """
+    n = len(rows)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), 0
+    stride = width + 2
+    key_start = rows * stride + starts
+    key_end = rows * stride + ends
+    prev = (rows - 1) * stride
+    lo = np.searchsorted(key_end, prev + starts, side='left')
+    hi = np.searchsorted(key_start, prev + ends, side='right')
+    counts = np.maximum(hi - lo, 0)
+    below = np.repeat(np.arange(n), counts)
+    above = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    parent = list(range(n))
+    for a, b in zip(above.tolist(), below.tolist()):
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    roots = np.array([_find(parent, i) for i in range(n)])
+    _, labels = np.unique(roots, return_inverse=True)
+    return labels, int(labels.max()) + 1
+
+def _convex_hull(points):
+    """Monotone-chain convex hull of (x, y) points, counter-clockwise"""
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+
+    def half(seq):
+        hull = []
+        for p in seq:
+            while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1])
+                                      - (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull
+
+    lower, upper = half(points), half(reversed(points))
+    return lower[:-1] + upper[:-1]
+
+def _zone_polygon(rows, starts, ends):
+    """Hull of one component's pixel corners, from its per-row extents"""
+    first = int(rows.min())
+    span = int(rows.max()) - first + 1
+    left = np.full(span, np.iinfo(np.int64).max)
+    right = np.full(span, -1)
+    np.minimum.at(left, rows - first, starts)
+    np.maximum.at(right, rows - first, ends)
+    present = np.flatnonzero(right >= 0)
+    ys = present + first
+    xl, xr = left[present], right[present]
+    points = [(int(x), int(y)) for x, y in zip(np.concatenate([xl, xl, xr, xr]),
+                                               np.concatenate([ys, ys + 1, ys, ys + 1]))]
+    return _convex_hull(points)
+
+def mask_components(runs, width, min_pixels=MIN_ZONE_PIXELS, max_components=MAX_ZONES):
+    """Largest 8-connected components of a mask given as :func:`band_runs` arrays
+
+    Returns ``(components, count)``: up to ``max_components`` dicts with
+    ``center``, ``pixels``, ``bbox``, ``polygon`` and ``mean`` (the run
+    values averaged over the component), largest first, and the total
+    number of components.
+    """
+    rows, starts, ends, sums = runs
+    labels, count = label_runs(rows, starts, ends, width)
+    lengths = ends - starts
+    pixels = np.bincount(labels, lengths, minlength=count)
+    components = []
+    for label in np.argsort(-pixels, kind='stable')[:max_components]:
+        if pixels[label] < min_pixels:
+            break
+        selected = labels == label
+        r, s, e, n = rows[selected], starts[selected], ends[selected], lengths[selected]
+        area = float(pixels[label])
+        components.append({
+            'center': (int(round(float(((s + e - 1) / 2.0 * n).sum()) / area)),
+                       int(round(float((r * n).sum()) / area))),
+            'pixels': int(area),
+            'bbox': (int(s.min()), int(r.min()), int(e.max()) - 1, int(r.max())),
+            'polygon': _zone_polygon(r, s, e),
+            'mean': float(sums[selected].sum()) / area,
+        })
+    return components, count
+
+def concat_runs(bands):
+    """Join per-band :func:`band_runs` results into one set of run arrays"""
+    if not bands:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(4))
+    return tuple(np.concatenate(parts) for parts in zip(*bands))
+
+def detect_water(source, index='rgb', bands=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 radius=MORPHOLOGY_RADIUS, min_zone_pixels=MIN_ZONE_PIXELS, max_zones=MAX_ZONES):
+    """Classify water in a PIL image, :class:`raster_io.Raster` or (height, width, bands) array
+
+    Pass 1 computes the quantized water index band by band and its
+    histogram; Otsu's method picks the threshold (floored at
+    ``MIN_WATER_INDEX``). Pass 2 thresholds each
+    band with a halo of neighbouring rows, so the morphological clean-up
+    matches a whole-scene run exactly, and collects the mask's runs for
+    connected-component labelling. Memory beyond the output overlay is one
+    byte per pixel plus one band.
+
+    Returns ``(overlay, zones, info)``: an RGBA overlay whose alpha grows
+    with the index margin above the threshold, the largest connected water
+    bodies as dicts (``center``, ``pixels``, ``bbox``, ``polygon``,
+    ``mean_index``, ``opacity``, ``confidence``), and a summary of the
+    classification.
+    """
+    if isinstance(source, Image.Image):
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGB')
+        width, height = source.size
+    else:
+        height, width = source.shape[:2]
+    chunk_rows = chunk_rows or height or 1
+
+    levels = np.empty((height, width), dtype=np.uint8)
+    histogram = np.zeros(INDEX_LEVELS, dtype=np.int64)
+    for y0 in range(0, height, chunk_rows):
+        y1 = min(y0 + chunk_rows, height)
+        levels[y0:y1] = quantized_index(_read_rows(source, y0, y1), index, bands)
+        histogram += np.bincount(levels[y0:y1].ravel(), minlength=INDEX_LEVELS)
+    threshold = max(otsu_threshold(histogram), index_to_level(MIN_WATER_INDEX))
+
+    # Opening and closing are four passes of ``radius`` rows each
+    halo = 4 * radius
+    low, high = ALPHA_RANGE
+    scale = (high - low) / max(INDEX_LEVELS - 1 - threshold, 1)
+    overlay = np.zeros((height, width, 4), dtype=np.uint8)
+    overlay[..., :3] = WATER_COLOR
+    bands_runs = []
+    for y0 in range(0, height, chunk_rows):
+        y1 = min(y0 + chunk_rows, height)
+        h0, h1 = max(0, y0 - halo), min(height, y1 + halo)
+        mask = clean_mask(levels[h0:h1] > threshold, radius)[y0 - h0:y1 - h0]
+        chunk = levels[y0:y1]
+
+        alpha = chunk.astype(np.float32)
+        alpha -= threshold
+        alpha *= scale
+        alpha += low
+        np.clip(alpha, low, high, out=alpha)
+        alpha[~mask] = 0
+        overlay[y0:y1, :, 3] = alpha
+
+        bands_runs.append(band_runs(mask, chunk, y0))
+
+    runs = concat_runs(bands_runs)
+    zones, count = mask_components(runs, width, min_zone_pixels, max_zones)
+    for zone in zones:
+        mean_level = zone.pop('mean')
+        margin = (mean_level - threshold) / max(INDEX_LEVELS - 1 - threshold, 1)
+        zone['mean_index'] = round(level_to_index(mean_level), 3)
+        zone['opacity'] = int(round(min(high, low + (mean_level - threshold) * scale)))
+        zone['confidence'] = round(min(0.99, 0.5 + 0.5 * margin), 2)
+
+    water_pixels = int((runs[2] - runs[1]).sum())
+    info = {
+        'method': 'spectral',
+        'index': index,
+        'threshold': round(level_to_index(threshold + 0.5), 3),
+        'water_pixels': water_pixels,
+        'water_fraction': round(water_pixels / max(width * height, 1), 4),
+        'water_bodies': count,
+    }
+    return Image.fromarray(overlay, 'RGBA'), zones, info
+
+def main():
+    """Classify water in an image or band stack and save the mask"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('image', help='RGB image, (height, width, bands) .npy stack or ENVI product')
+    parser.add_argument('--index', default='rgb', choices=list(WATER_INDICES))
+    parser.add_argument('--bands', nargs='*', default=[], metavar='NAME=POS',
+                        help='Band positions, e.g. green=1 nir=3')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--radius', type=int, default=MORPHOLOGY_RADIUS, help='Morphology radius (px)')
+    parser.add_argument('--output', help='Save the water overlay (RGBA PNG) here')
+    args = parser.parse_args()
+
+    bands = {name: int(pos) for name, pos in (item.split('=') for item in args.bands)}
+    if is_raster_path(args.image):
+        source = open_raster(args.image)
+        # ENVI band names such as "green" or "nir" locate the bands themselves
+        named = {name.lower(): pos for pos, name in enumerate(source.band_names or ())}
+        bands = dict({name: named[name] for name in DEFAULT_BANDS if name in named}, **bands)
+    else:
+        source = Image.open(args.image)
+
+    print("💧 Spectral Water Detection")
+    print("=" * 50)
+    start = time.perf_counter()
+    overlay, zones, info = detect_water(source, args.index, bands, args.chunk_rows, args.radius)
+    elapsed = time.perf_counter() - start
+    print(f"📐 Index {info['index']}: Otsu threshold {info['threshold']}")
+    print(f"🌊 Water: {info['water_pixels']:,} px ({info['water_fraction']:.1%}), "
+          f"{info['water_bodies']} bodies, {len(zones)} zones")
+    for zone in zones:
+        print(f"   • {zone['pixels']:>10,} px at {zone['center']} (confidence {zone['confidence']})")
+    print(f"⏱️  {overlay.width}x{overlay.height} classified in {elapsed:.2f}s")
+    if args.output:
+        overlay.save(args.output)
+        print(f"💾 Overlay saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()